@@ -103,6 +103,7 @@ const App = () => {
   const [startTime, setStartTime] = useState(Date.now());
   const [capturedFiles, setCapturedFiles] = useState([]);
   const [recordingStatus, setRecordingStatus] = useState(false);
+  const [recordingJobId, setRecordingJobId] = useState(null);
 
   const isValidUrl = (url) => {
     try {
@@ -143,7 +144,8 @@ const App = () => {
           'Accept': 'application/json'
         },
         body: JSON.stringify({ 
-          url: formattedUrl
+          url: formattedUrl,
+          include_base64: true
         }),
         mode: 'cors'
       });
@@ -210,48 +212,52 @@ const App = () => {
     }
   };
 
-// Modify checkRecordingStatus
-const checkRecordingStatus = async () => {
-  try {
-    const response = await fetchWithRetry(`${API_URL}/recording-status`);
-    const data = await response.json();
-    // setRecordingStatus(data.isRecording); // This state seems unused, can remove
-
-    // Check if the app thinks it's recording BUT the server says it's not
-    if (isRecording && !data.isRecording) {
-      console.log('Polling detected recording has stopped on the server.');
-      setIsRecording(false); // Update app state FIRST
-      // *** IMPORTANT CHANGE HERE: Call the new fetch function ***
-      await fetchCompletedRecording();
-    }
-    // Optional: Handle state mismatch where server is recording but app isn't
-    else if (!isRecording && data.isRecording) {
-       console.warn('Server is recording, but app state is not. Syncing app state.');
-       setIsRecording(true);
-    }
+// Wait for recording lifecycle events pushed by the server (long-poll fallback for SSE).
+// Each request blocks until something happens, so completion is seen immediately.
+const watchRecordingEvents = async (jobId, isCancelled) => {
+  let lastEventId = 0;
+  while (!isCancelled()) {
+    try {
+      const response = await fetchWithRetry(
+        `${API_URL}/recording-events/${jobId}/poll?after=${lastEventId}`
+      );
+      const data = await response.json();
+
+      for (const event of data.events) {
+        lastEventId = event.id;
+        if (event.event === 'progress') {
+          console.log(`Recording progress: ${event.data.frames} frames at ${event.data.fps} fps`);
+        } else if (event.event === 'failed') {
+          throw new Error(event.data.error || 'Recording failed on the server.');
+        }
+      }
 
-  } catch (error) {
-    console.error('Error checking recording status:', error);
-    // Decide how to handle polling errors, maybe stop polling after too many failures
-    // Alert.alert('Error', 'Could not check recording status. Please check connection.');
-    // setIsRecording(false); // Safer to assume stopped on error? Maybe not.
+      if (data.done && !isCancelled()) {
+        console.log('Server reported the recording has finished.');
+        setIsRecording(false); // Update app state FIRST
+        await fetchCompletedRecording();
+        return;
+      }
+    } catch (error) {
+      console.error('Error watching recording events:', error);
+      if (!isCancelled()) {
+        setIsRecording(false);
+        Alert.alert('Error', error.message || 'Lost track of the recording. Please check server status.');
+      }
+      return;
+    }
   }
 };
 
-// Keep the useEffect hook as is
 useEffect(() => {
-  let interval;
-  if (isRecording) {
-    // Check immediately when recording starts, then interval
-    checkRecordingStatus();
-    interval = setInterval(checkRecordingStatus, 5000); // Poll slightly less frequently? e.g., 5s
+  let cancelled = false;
+  if (isRecording && recordingJobId) {
+    watchRecordingEvents(recordingJobId, () => cancelled);
   }
   return () => {
-    if (interval) {
-      clearInterval(interval);
-    }
+    cancelled = true;
   };
-}, [isRecording]); // Dependency array is correct
+}, [isRecording, recordingJobId]);
  
 
 
@@ -265,6 +271,8 @@ useEffect(() => {
     // This requires the backend /stop-recording endpoint to be robust.
     const response = await fetchWithRetry(`${API_URL}/stop-recording`, {
       method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ job_id: recordingJobId, include_base64: true }),
     });
 
     const data = await response.json();
@@ -324,6 +332,8 @@ useEffect(() => {
 
         const response = await fetchWithRetry(`${API_URL}/stop-recording`, {
           method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ job_id: recordingJobId, include_base64: true }),
         });
 
         const data = await response.json();
@@ -384,15 +394,6 @@ useEffect(() => {
         setLoading(true);
         console.log('Starting recording...');
 
-        // Check status first (as before)
-        const statusResponse = await fetchWithRetry(`${API_URL}/recording-status`);
-        const statusData = await statusResponse.json();
-
-        if (statusData.isRecording) {
-           // Maybe offer to stop the existing one? For now, throw error.
-           throw new Error('Another recording is already in progress on the server.');
-        }
-
         const response = await fetchWithRetry(`${API_URL}/start-recording`, {
           method: 'POST',
           headers: { 'Content-Type': 'application/json' },
@@ -406,6 +407,7 @@ useEffect(() => {
 
         if (data.success) {
           // Set state only AFTER successful start call
+          setRecordingJobId(data.job_id);
           setIsRecording(true);
           setStartTime(Date.now()); // Keep track of start time if needed
           Alert.alert('Recording Started', `Recording for ${duration} seconds...`);
@@ -0,0 +1,188 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# How long a cached reply is served, in seconds; 0 disables the cache
+CHAT_CACHE_TTL = int(os.getenv("CHAT_CACHE_TTL", 3600))
+# Entries kept in the in-process tier in front of Redis
+CHAT_CACHE_LOCAL_SIZE = int(os.getenv("CHAT_CACHE_LOCAL_SIZE", 1024))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Fold case and whitespace so trivially different prompts share an entry."""
+    return _WHITESPACE.sub(" ", prompt).strip().casefold()
+
+
+class ChatCache:
+    """Two-tier cache of chat replies: an in-process LRU backed by Redis.
+
+    Concurrent misses for the same key are coalesced, so a burst of
+    identical prompts costs a single upstream call.
+    """
+
+    def __init__(self, redis_conn, ttl: int = CHAT_CACHE_TTL, local_size: int = CHAT_CACHE_LOCAL_SIZE,
+                 prefix: str = "chat-cache:"):
+        self.redis = redis_conn
+        self.ttl = ttl
+        self.local_size = local_size
+        self.prefix = prefix
+        self._local = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}  # key -> asyncio.Future
+        self._stats = {"hits_local": 0, "hits_redis": 0, "misses": 0, "coalesced": 0,
+                       "tokens_saved": 0, "redis_errors": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def key(self, prompt: str, tone: Optional[str], language: Optional[str]) -> str:
+        material = json.dumps([normalize_prompt(prompt), (tone or "").casefold(), (language or "").casefold()])
+        return self.prefix + hashlib.sha256(material.encode()).hexdigest()
+
+    def _get_local(self, key: str) -> Optional[dict]:
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._local[key]
+            return None
+        self._local.move_to_end(key)
+        return value
+
+    def _set_local(self, key: str, value: dict, ttl: float):
+        self._local[key] = (time.monotonic() + ttl, value)
+        self._local.move_to_end(key)
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+    async def _lookup(self, key: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        value = self._get_local(key)
+        if value is not None:
+            self._stats["hits_local"] += 1
+        else:
+            try:
+                raw = await self.redis.get(key)
+                ttl = await self.redis.ttl(key) if raw is not None else 0
+            except Exception as e:
+                self._stats["redis_errors"] += 1
+                logger.warning(f"Chat cache read failed: {str(e)}")
+                return None
+            if raw is None:
+                return None
+            value = json.loads(raw)
+            self._set_local(key, value, ttl if ttl > 0 else self.ttl)
+            self._stats["hits_redis"] += 1
+        self._stats["tokens_saved"] += value.get("tokens_used", 0)
+        return value
+
+    async def get(self, key: str) -> Optional[dict]:
+        """Cached reply for ``key`` or None."""
+        value = await self._lookup(key)
+        if value is None and self.enabled:
+            self._stats["misses"] += 1
+        return value
+
+    async def set(self, key: str, value: dict):
+        if not self.enabled:
+            return
+        self._set_local(key, value, self.ttl)
+        try:
+            await self.redis.setex(key, self.ttl, json.dumps(value))
+        except Exception as e:
+            self._stats["redis_errors"] += 1
+            logger.warning(f"Chat cache write failed: {str(e)}")
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[dict]]) -> Tuple[dict, bool]:
+        """Return ``(value, cached)``, calling ``compute`` at most once per key at a time.
+
+        If the request computing the value is cancelled (client gone), the
+        requests waiting on it compute the value themselves instead.
+        """
+        if not self.enabled:
+            return await compute(), False
+        while True:
+            value = await self._lookup(key)
+            if value is not None:
+                return value, True
+
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            try:
+                value = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if pending.cancelled():
+                    continue  # the leader was cancelled, not us; take over
+                raise
+            self._stats["coalesced"] += 1
+            self._stats["tokens_saved"] += value.get("tokens_used", 0)
+            return value, True
+
+        self._stats["misses"] += 1
+        future = self.lead(key)
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            await self.settle(key, future)
+            raise
+        except Exception as e:
+            await self.settle(key, future, error=e)
+            raise
+        await self.settle(key, future, value)
+        return value, False
+
+    def lead(self, key: str) -> Optional[asyncio.Future]:
+        """Claim ``key`` for a caller producing the value itself, e.g. while streaming it.
+
+        Returns None when the cache is disabled or another request already
+        holds the claim. Until ``settle`` is called, ``get_or_compute`` calls
+        for ``key`` wait for this caller instead of going upstream.
+        """
+        if not self.enabled or key in self._inflight:
+            return None
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        return future
+
+    async def settle(self, key: str, future: asyncio.Future, value: Optional[dict] = None,
+                     error: Optional[Exception] = None):
+        """Release a claim from ``lead``: cache ``value``, or pass ``error`` to the waiting requests.
+
+        With neither, the claim is abandoned and the waiting requests compute
+        the value themselves.
+        """
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if value is not None:
+            future.set_result(value)
+            await self.set(key, value)
+        elif error is not None:
+            future.set_exception(error)
+            future.exception()  # mark retrieved when nobody was waiting
+        else:
+            future.cancel()
+
+    def stats(self) -> dict:
+        hits = self._stats["hits_local"] + self._stats["hits_redis"] + self._stats["coalesced"]
+        lookups = hits + self._stats["misses"]
+        return {
+            **self._stats,
+            "hits": hits,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "local_entries": len(self._local),
+            "inflight": len(self._inflight),
+            "ttl": self.ttl,
+        }
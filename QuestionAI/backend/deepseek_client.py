@@ -0,0 +1,211 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from typing import AsyncIterator, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Upstream endpoint; point at a local mock for tests and load runs
+DEEPSEEK_BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com/v1")
+# Connection pool: total connections, idle keep-alive connections kept open, and how long they idle
+DEEPSEEK_MAX_CONNECTIONS = int(os.getenv("DEEPSEEK_MAX_CONNECTIONS", 50))
+DEEPSEEK_MAX_KEEPALIVE = int(os.getenv("DEEPSEEK_MAX_KEEPALIVE", 20))
+DEEPSEEK_KEEPALIVE_EXPIRY = float(os.getenv("DEEPSEEK_KEEPALIVE_EXPIRY", 60))
+DEEPSEEK_HTTP2 = os.getenv("DEEPSEEK_HTTP2", "1") == "1"
+# Per-phase timeouts in seconds; read covers the wait for a long completion
+DEEPSEEK_CONNECT_TIMEOUT = float(os.getenv("DEEPSEEK_CONNECT_TIMEOUT", 5))
+DEEPSEEK_READ_TIMEOUT = float(os.getenv("DEEPSEEK_READ_TIMEOUT", 60))
+DEEPSEEK_WRITE_TIMEOUT = float(os.getenv("DEEPSEEK_WRITE_TIMEOUT", 10))
+DEEPSEEK_POOL_TIMEOUT = float(os.getenv("DEEPSEEK_POOL_TIMEOUT", 5))
+# Retries on 429/5xx and failed connection attempts, with full-jitter exponential backoff
+DEEPSEEK_MAX_RETRIES = int(os.getenv("DEEPSEEK_MAX_RETRIES", 3))
+DEEPSEEK_RETRY_BACKOFF = float(os.getenv("DEEPSEEK_RETRY_BACKOFF", 0.5))
+DEEPSEEK_RETRY_MAX_DELAY = float(os.getenv("DEEPSEEK_RETRY_MAX_DELAY", 8))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Failures before the request was sent, so retrying cannot double-bill. RemoteProtocolError is
+# left out: it is also raised when the upstream drops the connection after receiving the POST
+RETRY_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401  (installed by httpx[http2])
+        return True
+    except ImportError:
+        return False
+
+
+class DeepSeekClient:
+    """Application-lifetime HTTP client for the DeepSeek API.
+
+    One ``httpx.AsyncClient`` is shared by every request, so TCP/TLS
+    connections (HTTP/2 where available) are kept alive and reused instead
+    of being set up per chat message.
+    """
+
+    def __init__(self, base_url: str = DEEPSEEK_BASE_URL, api_key: Optional[str] = None,
+                 max_connections: int = DEEPSEEK_MAX_CONNECTIONS, max_keepalive: int = DEEPSEEK_MAX_KEEPALIVE,
+                 keepalive_expiry: float = DEEPSEEK_KEEPALIVE_EXPIRY, http2: bool = DEEPSEEK_HTTP2,
+                 max_retries: int = DEEPSEEK_MAX_RETRIES, backoff: float = DEEPSEEK_RETRY_BACKOFF,
+                 max_delay: float = DEEPSEEK_RETRY_MAX_DELAY, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive,
+                                   keepalive_expiry=keepalive_expiry)
+        self.timeout = httpx.Timeout(connect=DEEPSEEK_CONNECT_TIMEOUT, read=DEEPSEEK_READ_TIMEOUT,
+                                     write=DEEPSEEK_WRITE_TIMEOUT, pool=DEEPSEEK_POOL_TIMEOUT)
+        if http2 and transport is None and not _http2_available():
+            logger.warning("DEEPSEEK_HTTP2 is on but the h2 package is missing; using HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+        self._in_flight = 0
+        self._stats = {"requests": 0, "retries": 0, "failures": 0, "peak_in_flight": 0,
+                       "latency_total": 0.0, "latency_max": 0.0}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The shared client, created on first use if startup has not already done so."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(base_url=self.base_url, limits=self.limits, timeout=self.timeout,
+                                             http2=self.http2, transport=self._transport)
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _headers(self, api_key: Optional[str]) -> dict:
+        return {"Authorization": f"Bearer {api_key or self.api_key}", "Content-Type": "application/json"}
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_delay)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_delay, self.backoff * 2 ** attempt))
+
+    async def _send(self, method: str, path: str, api_key: Optional[str], stream: bool, **kwargs) -> httpx.Response:
+        attempt = 0
+        while True:
+            self._stats["requests"] += 1
+            request = self.client.build_request(method, path, headers=self._headers(api_key), **kwargs)
+            try:
+                response = await self.client.send(request, stream=stream)
+            except RETRY_EXCEPTIONS as e:
+                if attempt >= self.max_retries:
+                    self._stats["failures"] += 1
+                    raise
+                delay = self._retry_delay(attempt)
+                logger.warning(f"DeepSeek connection failed ({e.__class__.__name__}), retrying in {delay:.2f}s")
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    if response.is_error:
+                        self._stats["failures"] += 1
+                        if stream:
+                            await response.aread()
+                            await response.aclose()
+                    response.raise_for_status()
+                    return response
+                if stream:
+                    await response.aclose()
+                delay = self._retry_delay(attempt, response)
+                logger.warning(f"DeepSeek returned {response.status_code}, retrying in {delay:.2f}s")
+            attempt += 1
+            self._stats["retries"] += 1
+            await asyncio.sleep(delay)
+
+    def _begin(self) -> float:
+        self._in_flight += 1
+        self._stats["peak_in_flight"] = max(self._stats["peak_in_flight"], self._in_flight)
+        return time.perf_counter()
+
+    def _end(self, started: float):
+        self._in_flight -= 1
+        elapsed = time.perf_counter() - started
+        self._stats["latency_total"] += elapsed
+        self._stats["latency_max"] = max(self._stats["latency_max"], elapsed)
+
+    async def request(self, method: str, path: str, api_key: Optional[str] = None, **kwargs) -> httpx.Response:
+        """Send a request, retrying 429/5xx responses and connection failures.
+
+        Returns the final response; raises ``httpx.HTTPStatusError`` for an
+        error status that is not (or no longer) retried.
+        """
+        started = self._begin()
+        try:
+            return await self._send(method, path, api_key, False, **kwargs)
+        finally:
+            self._end(started)
+
+    async def chat_completion(self, payload: dict, api_key: Optional[str] = None) -> dict:
+        response = await self.request("POST", "/chat/completions", api_key=api_key, json=payload)
+        return response.json()
+
+    async def stream_chat_completion(self, payload: dict, api_key: Optional[str] = None) -> AsyncIterator[dict]:
+        """Yield completion chunks as the upstream streams them (``stream: true``).
+
+        Only the initial response is retried; once tokens flow, errors are
+        raised to the caller. Closing the generator closes the upstream
+        response, which cancels the generation.
+        """
+        payload = {**payload, "stream": True, "stream_options": {"include_usage": True}}
+        started = self._begin()
+        try:
+            response = await self._send("POST", "/chat/completions", api_key, True, json=payload)
+            try:
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    yield json.loads(data)
+            finally:
+                await response.aclose()
+        finally:
+            self._end(started)
+
+    def stats(self) -> dict:
+        """Request/retry counters and connection pool utilisation."""
+        calls = self._stats["requests"] - self._stats["retries"]
+        stats = {
+            "base_url": self.base_url,
+            "http2": self.http2,
+            "requests": self._stats["requests"],
+            "retries": self._stats["retries"],
+            "failures": self._stats["failures"],
+            "in_flight": self._in_flight,
+            "peak_in_flight": self._stats["peak_in_flight"],
+            "latency_avg": self._stats["latency_total"] / calls if calls else 0.0,
+            "latency_max": self._stats["latency_max"],
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+        }
+        stats.update(self._pool_stats())
+        return stats
+
+    def _pool_stats(self) -> dict:
+        # httpx does not expose its pool; read httpcore's connection list when it is there
+        try:
+            connections = self._client._transport._pool.connections
+        except AttributeError:
+            return {}
+        idle = sum(1 for conn in connections if conn.is_idle())
+        return {"connections_open": len(connections), "connections_idle": idle,
+                "connections_active": len(connections) - idle}
@@ -0,0 +1,93 @@
+"""Login burst load test.
+
+Fires a burst of concurrent /token logins (each a bcrypt verify) while
+probing cheap endpoints, and reports probe latency at idle and during the
+burst. With hashing on the event loop the probes queue behind every
+bcrypt call; with the hash pool they should stay close to idle latency.
+
+    python loadtest_login.py --url http://localhost:8000 --logins 50
+
+/token also writes the token to Redis; without Redis the logins fail
+after the password check, which still exercises bcrypt.
+
+Probes are plain GETs and carry no credentials unless --token is given, so
+probing an authenticated path without it only measures the 401 rejection.
+POST endpoints such as /api/chat cannot be probed.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+
+def summarize(samples):
+    if not samples:
+        return "no samples"
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return (f"n={len(ordered)} p50={statistics.median(ordered) * 1000:.1f}ms "
+            f"p95={p95 * 1000:.1f}ms max={ordered[-1] * 1000:.1f}ms")
+
+
+async def probe(client, path, interval, stop):
+    samples = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get(path)
+        samples.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+    return samples
+
+
+async def probe_for(client, paths, interval, seconds):
+    stop = asyncio.Event()
+    tasks = [asyncio.create_task(probe(client, path, interval, stop)) for path in paths]
+    await asyncio.sleep(seconds)
+    stop.set()
+    return dict(zip(paths, await asyncio.gather(*tasks)))
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.logins + len(args.probe) + 4)
+    async with httpx.AsyncClient(base_url=args.url, timeout=60, limits=limits) as client:
+        user = {"username": f"load-{uuid.uuid4().hex[:8]}", "password": "load-test-password"}
+        response = await client.post("/register", json=user)
+        response.raise_for_status()
+
+        # Logins only send the JSON body, so the token is set for the probes alone
+        prober = httpx.AsyncClient(base_url=args.url, timeout=60, limits=limits,
+                                   headers={"Authorization": f"Bearer {args.token}"} if args.token else None)
+        async with prober:
+            idle = await probe_for(prober, args.probe, args.interval, args.idle)
+
+            stop = asyncio.Event()
+            probes = [asyncio.create_task(probe(prober, path, args.interval, stop)) for path in args.probe]
+            started = time.perf_counter()
+            logins = await asyncio.gather(*[client.post("/token", json=user) for _ in range(args.logins)])
+            burst_seconds = time.perf_counter() - started
+            stop.set()
+            burst = dict(zip(args.probe, await asyncio.gather(*probes)))
+
+    statuses = {}
+    for response in logins:
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    print(f"{args.logins} logins in {burst_seconds:.2f}s, statuses {statuses}")
+    for path in args.probe:
+        print(f"{path:<16} idle  {summarize(idle[path])}")
+        print(f"{path:<16} burst {summarize(burst[path])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--logins", type=int, default=50, help="concurrent /token requests in the burst")
+    parser.add_argument("--probe", action="append", help="path probed for latency (repeatable, default /ping)")
+    parser.add_argument("--interval", type=float, default=0.02, help="seconds between probes")
+    parser.add_argument("--idle", type=float, default=2.0, help="seconds of idle baseline probing")
+    parser.add_argument("--token", help="bearer token sent with every probe, for authenticated GET paths")
+    args = parser.parse_args()
+    args.probe = args.probe or ["/ping"]
+    asyncio.run(main(args))
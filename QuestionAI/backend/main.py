@@ -1,21 +1,25 @@
 from fastapi import FastAPI, Request, HTTPException, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi_limiter import FastAPILimiter
 from fastapi_limiter.depends import RateLimiter
 import redis.asyncio as redis
 import logging
-from typing import Optional
+from typing import Awaitable, Callable, Optional
+from contextlib import aclosing
 import os
 import httpx
 from pydantic import BaseModel
 from dotenv import load_dotenv
 import asyncio
 import atexit
+import json
 from datetime import datetime, timedelta
 import jwt
-from passlib.context import CryptContext
+from deepseek_client import DeepSeekClient
+from chat_cache import ChatCache
+from password_hashing import pwd_context, hash_password, verify_password_async, shutdown as shutdown_password_hashing
 import logging
 logging.basicConfig(level=logging.DEBUG)
 
@@ -36,8 +40,14 @@ redis_conn = redis.Redis(
 )
 security = HTTPBearer()
 
+# Reply cache for repeated prompts (in-process LRU in front of Redis)
+chat_cache = ChatCache(redis_conn)
+
 app = FastAPI()
 
+# Shared DeepSeek client; keeps upstream connections alive across requests
+deepseek = DeepSeekClient(api_key=os.getenv("DEEPSEEK_API_KEY"))
+
 # Rate Limiter Setup
 @app.on_event("startup")
 async def startup():
@@ -46,6 +56,13 @@ async def startup():
         logging.info("Redis rate limiter initialized")
     except Exception as e:
         logging.error(f"Rate limiter init failed: {str(e)}")
+    deepseek.client  # open the pool up front rather than on the first chat request
+    logging.info(f"DeepSeek client ready ({deepseek.base_url}, http2={deepseek.http2})")
+
+@app.on_event("shutdown")
+async def close_resources():
+    await deepseek.aclose()
+    shutdown_password_hashing(wait=False)
 
 # Auth Utilities
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -68,9 +85,6 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             detail="Invalid credentials"
         )
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # Models
 class UserCreate(BaseModel):
     username: str
@@ -84,51 +98,131 @@ class ChatRequest(BaseModel):
     prompt: str
     tone: Optional[str] = "friendly"
     language: Optional[str] = "en"
+    stream: Optional[bool] = False
 
 class ChatResponse(BaseModel):
     response: str
     tokens_used: int
 
 # Helper function for DeepSeek API
-async def call_deepseek_api(prompt: str) -> dict:
-    """Call actual DeepSeek API with proper error handling"""
-    DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
-    if not DEEPSEEK_API_KEY:
-        raise ValueError("Missing DEEPSEEK_API_KEY in environment")
-
-    headers = {
-        "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
-    payload = {
+def deepseek_payload(prompt: str) -> dict:
+    return {
         "model": "deepseek-chat",
         "messages": [{"role": "user", "content": prompt}],
         "temperature": 0.7,
         "max_tokens": 2000
     }
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
+def deepseek_api_key() -> str:
+    DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
+    if not DEEPSEEK_API_KEY:
+        raise ValueError("Missing DEEPSEEK_API_KEY in environment")
+    return DEEPSEEK_API_KEY
+
+async def call_deepseek_api(prompt: str) -> dict:
+    """Call actual DeepSeek API with proper error handling"""
+    DEEPSEEK_API_KEY = deepseek_api_key()
+    payload = deepseek_payload(prompt)
+
+    try:
+        return await deepseek.chat_completion(payload, api_key=DEEPSEEK_API_KEY)
+    except httpx.HTTPStatusError as e:
+        logging.error(f"DeepSeek API error: {e.response.text}")
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail="DeepSeek API request failed"
+        )
+    except Exception as e:
+        logging.error(f"DeepSeek connection error: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="DeepSeek service unavailable"
+        )
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_cached_reply(cached: dict):
+    yield sse_event("delta", {"content": cached["response"]})
+    yield sse_event("done", {"tokens_used": cached["tokens_used"], "cached": True})
+
+async def stream_deepseek_api(request: Request, prompt: str, api_key: str, cache_key: Optional[str] = None,
+                              flight: Optional[asyncio.Future] = None):
+    """Forward DeepSeek deltas as SSE events, ending with a ``done`` event carrying tokens_used.
+
+    The upstream stream is closed as soon as the client goes away, so an
+    abandoned generation stops being produced (and billed). A completed
+    reply is stored under ``cache_key``, settling ``flight`` when given.
+    """
+    tokens_used = 0
+    parts = []
+    upstream = deepseek.stream_chat_completion(deepseek_payload(prompt), api_key=api_key)
+    try:
+        async for chunk in upstream:
+            if await request.is_disconnected():
+                logging.info("Client disconnected, cancelling DeepSeek stream")
+                return
+            if chunk.get("usage"):
+                tokens_used = chunk["usage"].get("total_tokens", tokens_used)
+            for choice in chunk.get("choices") or []:
+                content = (choice.get("delta") or {}).get("content")
+                if content:
+                    parts.append(content)
+                    yield sse_event("delta", {"content": content})
+        reply = {"response": "".join(parts), "tokens_used": tokens_used}
+        if flight is not None:
+            await chat_cache.settle(cache_key, flight, reply)
+        elif cache_key:
+            await chat_cache.set(cache_key, reply)
+        yield sse_event("done", {"tokens_used": tokens_used})
+    except httpx.HTTPStatusError as e:
+        logging.error(f"DeepSeek API error: {e.response.text}")
+        yield sse_event("error", {"status": e.response.status_code, "detail": "DeepSeek API request failed"})
+    except Exception as e:
+        logging.error(f"DeepSeek stream error: {str(e)}")
+        yield sse_event("error", {"status": 500, "detail": "DeepSeek service unavailable"})
+    finally:
+        await upstream.aclose()
+
+async def stream_chat_reply(request: Request, prompt: str, cache_key: str,
+                            complete: Callable[[], Awaitable[dict]]):
+    """SSE reply for a streaming chat request, sharing one generation between identical prompts.
+
+    The first request for a prompt streams DeepSeek's deltas live. Identical
+    requests arriving meanwhile wait for it and replay the finished reply; if
+    it is abandoned they fall back to ``complete``.
+    """
+    flight = chat_cache.lead(cache_key)
+    if flight is None and chat_cache.enabled:
         try:
-            response = await client.post(
-                "https://api.deepseek.com/v1/chat/completions",
-                headers=headers,
-                json=payload
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            logging.error(f"DeepSeek API error: {e.response.text}")
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail="DeepSeek API request failed"
-            )
+            reply, _ = await chat_cache.get_or_compute(cache_key, complete)
         except Exception as e:
-            logging.error(f"DeepSeek connection error: {str(e)}")
-            raise HTTPException(
-                status_code=500,
-                detail="DeepSeek service unavailable"
-            )
+            logging.error(f"Error processing chat request: {e}")
+            yield sse_event("error", {"status": 500, "detail": "Error processing request"})
+            return
+        async for event in stream_cached_reply(reply):
+            yield event
+        return
+
+    try:
+        cached = await chat_cache.get(cache_key)
+        if cached is not None:
+            async for event in stream_cached_reply(cached):
+                yield event
+            return
+        try:
+            api_key = deepseek_api_key()
+        except ValueError as e:
+            logging.error(f"Error processing chat request: {e}")
+            yield sse_event("error", {"status": 500, "detail": "Error processing request"})
+            return
+        async with aclosing(stream_deepseek_api(request, prompt, api_key, cache_key, flight)) as events:
+            async for event in events:
+                yield event
+    finally:
+        if flight is not None and not flight.done():
+            # Cached, failed or abandoned: waiting requests look up or compute the reply themselves
+            await chat_cache.settle(cache_key, flight)
 
 # Mock database (replace with real DB in production)
 users_db = {}
@@ -150,10 +244,19 @@ def authenticate_user(username: str, password: str):
         return None
     return user
 
+async def authenticate_user_async(username: str, password: str):
+    """authenticate_user with the bcrypt check run off the event loop"""
+    user = get_user(username)
+    if not user:
+        return None
+    if not await verify_password_async(password, user.hashed_password):
+        return None
+    return user
+
 @app.post("/token")
 async def login_for_access_token(user_data: UserCreate):
     try:
-        user = authenticate_user(user_data.username, user_data.password)
+        user = await authenticate_user_async(user_data.username, user_data.password)
         if not user:
             raise HTTPException(
                 status_code=401,
@@ -173,7 +276,7 @@ async def login_for_access_token(user_data: UserCreate):
 
 @app.post("/token")
 async def login_for_access_token(form_data: UserCreate):
-    user = authenticate_user(form_data.username, form_data.password)
+    user = await authenticate_user_async(form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -196,7 +299,7 @@ async def register_user(user: UserCreate):
     if user.username in users_db:
         raise HTTPException(status_code=400, detail="Username already registered")
     
-    hashed_password = pwd_context.hash(user.password)
+    hashed_password = await hash_password(user.password)
     users_db[user.username] = {
         "username": user.username,
         "hashed_password": hashed_password
@@ -232,31 +335,57 @@ async def redis_test():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/api/upstream-stats")
+async def upstream_stats():
+    """DeepSeek client counters and connection pool utilisation"""
+    return deepseek.stats()
+
+@app.get("/api/cache-stats")
+async def cache_stats():
+    """Chat reply cache hit/miss and tokens-saved counters"""
+    return chat_cache.stats()
+
 # Endpoints
 @app.post("/api/chat", response_model=ChatResponse, dependencies=[Depends(RateLimiter(times=10, minutes=1))])
 async def chat(
     chat_request: ChatRequest,
+    request: Request,
     user: dict = Depends(get_current_user)
 ):
     """
-    Main chat endpoint with rate limiting (10 requests per minute)
+    Main chat endpoint with rate limiting (10 requests per minute).
+    With ``stream: true`` the reply is sent as server-sent events instead.
     """
     # Optimize prompt with tone and language context
     optimized_prompt = f"""Respond in {chat_request.tone} tone. 
     Preferred language: {chat_request.language}.
     {chat_request.prompt}
     """
+    cache_key = chat_cache.key(chat_request.prompt, chat_request.tone, chat_request.language)
+
+    async def complete() -> dict:
+        api_response = await call_deepseek_api(optimized_prompt)
+        return {
+            "response": api_response["choices"][0]["message"]["content"],
+            "tokens_used": api_response["usage"]["total_tokens"]
+        }
+
+    if chat_request.stream:
+        return StreamingResponse(
+            stream_chat_reply(request, optimized_prompt, cache_key, complete),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
     
+
     try:
-        api_response = await call_deepseek_api(optimized_prompt)
-        response_text = api_response["choices"][0]["message"]["content"]
-        tokens_used = api_response["usage"]["total_tokens"]
+        result, cached = await chat_cache.get_or_compute(cache_key, complete)
         
-        logging.info(f"Processed prompt: {chat_request.prompt[:100]}...")
+        logging.info(f"Processed prompt{' (cached)' if cached else ''}: {chat_request.prompt[:100]}...")
         
         return ChatResponse(
-            response=response_text,
-            tokens_used=tokens_used
+            response=result["response"],
+            tokens_used=result["tokens_used"]
         )
     except Exception as e:
         logging.error(f"Error processing chat request: {e}")
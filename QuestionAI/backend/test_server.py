@@ -1,8 +1,11 @@
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.testclient import TestClient
+import asyncio
+import httpx
 import pytest
 from datetime import timedelta
+import main
 from main import (
     app, 
     authenticate_user, 
@@ -13,6 +16,9 @@ from main import (
     UserCreate,  
     UserInDB   
 )
+from deepseek_client import DeepSeekClient
+from chat_cache import ChatCache
+from password_hashing import hash_password, verify_password_async
 
 app = FastAPI()
 
@@ -106,6 +112,312 @@ def test_token_expiration():
     """Test token expiration"""
     pass
 
+# DeepSeek client tests (mock upstream)
+COMPLETION = {"choices": [{"message": {"content": "hi"}}], "usage": {"total_tokens": 3}}
+
+def mock_deepseek(statuses):
+    """DeepSeekClient whose upstream answers with the given statuses in turn, then 200"""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) <= len(statuses):
+            return httpx.Response(statuses[len(calls) - 1], headers={"Retry-After": "0"})
+        return httpx.Response(200, json=COMPLETION)
+
+    client = DeepSeekClient(base_url="http://upstream.test/v1", api_key="test-key",
+                            backoff=0, transport=httpx.MockTransport(handler))
+    return client, calls
+
+def test_deepseek_reuses_client():
+    """Sequential calls share one pooled client"""
+    client, calls = mock_deepseek([])
+
+    async def run():
+        first = client.client
+        for _ in range(3):
+            assert await client.chat_completion({"messages": []}) == COMPLETION
+        assert client.client is first
+        await client.aclose()
+
+    asyncio.run(run())
+    assert len(calls) == 3
+    assert calls[0].url == "http://upstream.test/v1/chat/completions"
+    assert calls[0].headers["Authorization"] == "Bearer test-key"
+
+def test_deepseek_retries_429_and_5xx():
+    """Throttling and server errors are retried"""
+    client, calls = mock_deepseek([429, 503])
+    assert asyncio.run(client.chat_completion({"messages": []})) == COMPLETION
+    assert len(calls) == 3
+    stats = client.stats()
+    assert stats["retries"] == 2
+    assert stats["failures"] == 0
+    assert stats["in_flight"] == 0
+
+def test_deepseek_does_not_retry_client_errors():
+    """A 400 is returned straight away"""
+    client, calls = mock_deepseek([400])
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(client.chat_completion({"messages": []}))
+    assert len(calls) == 1
+    assert client.stats()["failures"] == 1
+
+def test_deepseek_gives_up_after_max_retries():
+    """Persistent 5xx surfaces after the configured retries"""
+    client, calls = mock_deepseek([502] * 10)
+    client.max_retries = 2
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(client.chat_completion({"messages": []}))
+    assert len(calls) == 3
+
+def test_deepseek_stream_yields_chunks():
+    """Streamed SSE chunks are parsed up to [DONE], usage included"""
+    body = (
+        'data: {"choices": [{"delta": {"content": "Hel"}}]}\n\n'
+        'data: {"choices": [{"delta": {"content": "lo"}}]}\n\n'
+        'data: {"choices": [], "usage": {"total_tokens": 7}}\n\n'
+        'data: [DONE]\n\n'
+    )
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, text=body, headers={"Content-Type": "text/event-stream"})
+
+    client = DeepSeekClient(base_url="http://upstream.test/v1", api_key="test-key",
+                            backoff=0, transport=httpx.MockTransport(handler))
+
+    async def run():
+        return [chunk async for chunk in client.stream_chat_completion({"messages": []})]
+
+    chunks = asyncio.run(run())
+    assert [c["choices"][0]["delta"]["content"] for c in chunks[:2]] == ["Hel", "lo"]
+    assert chunks[2]["usage"]["total_tokens"] == 7
+    assert b'"stream": true' in requests[0].content
+    assert client.stats()["in_flight"] == 0
+
+# Chat cache tests
+class FakeRedis:
+    """The few async Redis calls ChatCache makes, kept in a dict"""
+    def __init__(self, fail=False):
+        self.data = {}
+        self.fail = fail
+
+    async def get(self, key):
+        if self.fail:
+            raise ConnectionError("redis down")
+        return self.data.get(key)
+
+    async def ttl(self, key):
+        return 60
+
+    async def setex(self, key, ttl, value):
+        if self.fail:
+            raise ConnectionError("redis down")
+        self.data[key] = value
+
+REPLY = {"response": "hello", "tokens_used": 12}
+
+def test_chat_cache_key_normalizes_prompt():
+    """Case and whitespace differences share a key; tone and language do not"""
+    cache = ChatCache(FakeRedis())
+    assert cache.key("Hello   World ", "friendly", "en") == cache.key("hello world", "Friendly", "EN")
+    assert cache.key("hello world", "formal", "en") != cache.key("hello world", "friendly", "en")
+    assert cache.key("hello world", "friendly", "fr") != cache.key("hello world", "friendly", "en")
+
+def test_chat_cache_coalesces_concurrent_misses():
+    """Identical concurrent prompts trigger one upstream call"""
+    cache = ChatCache(FakeRedis())
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return REPLY
+
+    async def run():
+        key = cache.key("hi", "friendly", "en")
+        results = await asyncio.gather(*[cache.get_or_compute(key, compute) for _ in range(5)])
+        later = await cache.get_or_compute(key, compute)
+        return results, later
+
+    results, later = asyncio.run(run())
+    assert len(calls) == 1
+    assert [cached for _, cached in results].count(False) == 1
+    assert later == (REPLY, True)
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["coalesced"] == 4
+    assert stats["tokens_saved"] == 5 * REPLY["tokens_used"]
+
+def test_chat_cache_waiters_recompute_when_leader_cancelled():
+    """A cancelled leader does not fail the requests coalesced onto it"""
+    cache = ChatCache(FakeRedis())
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return REPLY
+
+    async def run():
+        key = cache.key("hi", "friendly", "en")
+        leader = asyncio.create_task(cache.get_or_compute(key, compute))
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.create_task(cache.get_or_compute(key, compute)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await asyncio.gather(*waiters)
+
+    results = asyncio.run(run())
+    assert all(value == REPLY for value, _ in results)
+    assert len(calls) == 2
+
+def test_chat_cache_reads_through_redis():
+    """A reply stored by another process is served from Redis"""
+    redis_conn = FakeRedis()
+
+    async def run():
+        writer, reader = ChatCache(redis_conn), ChatCache(redis_conn)
+        key = writer.key("hi", "friendly", "en")
+        await writer.set(key, REPLY)
+        return await reader.get(key), reader.stats()
+
+    value, stats = asyncio.run(run())
+    assert value == REPLY
+    assert stats["hits_redis"] == 1
+
+def test_chat_cache_survives_redis_outage():
+    """Redis errors fall back to the local tier instead of failing the request"""
+    cache = ChatCache(FakeRedis(fail=True))
+
+    async def compute():
+        return REPLY
+
+    async def run():
+        key = cache.key("hi", "friendly", "en")
+        first = await cache.get_or_compute(key, compute)
+        second = await cache.get_or_compute(key, compute)
+        return first, second
+
+    assert asyncio.run(run()) == ((REPLY, False), (REPLY, True))
+    assert cache.stats()["redis_errors"] >= 1
+
+def test_chat_cache_lru_eviction():
+    """The local tier keeps at most local_size entries"""
+    cache = ChatCache(FakeRedis(fail=True), local_size=2)
+
+    async def run():
+        for prompt in ("a", "b", "c"):
+            await cache.set(cache.key(prompt, None, None), REPLY)
+        return await cache.get(cache.key("a", None, None))
+
+    assert asyncio.run(run()) is None
+    assert cache.stats()["local_entries"] == 2
+
+# Streaming chat coalescing tests
+STREAM_BODY = (
+    'data: {"choices": [{"delta": {"content": "Hel"}}]}\n\n'
+    'data: {"choices": [{"delta": {"content": "lo"}}]}\n\n'
+    'data: {"choices": [], "usage": {"total_tokens": 7}}\n\n'
+    'data: [DONE]\n\n'
+)
+
+class FakeRequest:
+    def __init__(self, disconnected=False):
+        self.disconnected = disconnected
+
+    async def is_disconnected(self):
+        return self.disconnected
+
+def slow_stream_upstream(monkeypatch):
+    """Point main at a fresh cache and an upstream that streams STREAM_BODY after a short delay"""
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, text=STREAM_BODY, headers={"Content-Type": "text/event-stream"})
+
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "test-key")
+    monkeypatch.setattr(main, "chat_cache", ChatCache(FakeRedis()))
+    monkeypatch.setattr(main, "deepseek", DeepSeekClient(base_url="http://upstream.test/v1", api_key="test-key",
+                                                         backoff=0, transport=httpx.MockTransport(handler)))
+    return calls
+
+async def collect(request, key, complete):
+    return "".join([event async for event in main.stream_chat_reply(request, "hi", key, complete)])
+
+def test_streaming_chat_coalesces_identical_prompts(monkeypatch):
+    """Concurrent identical streaming prompts share one upstream generation"""
+    calls = slow_stream_upstream(monkeypatch)
+
+    async def complete():
+        raise AssertionError("waiters replay the leader's reply")
+
+    async def run():
+        key = main.chat_cache.key("hi", "friendly", "en")
+        return await asyncio.gather(*[collect(FakeRequest(), key, complete) for _ in range(4)])
+
+    leader, *waiters = asyncio.run(run())
+    assert len(calls) == 1
+    assert 'data: {"content": "Hel"}' in leader
+    assert all('data: {"content": "Hello"}' in reply for reply in waiters)
+    stats = main.chat_cache.stats()
+    assert stats["misses"] == 1
+    assert stats["coalesced"] == 3
+
+def test_streaming_chat_waiters_recover_when_leader_disconnects(monkeypatch):
+    """An abandoned stream hands the prompt to a waiting request"""
+    slow_stream_upstream(monkeypatch)
+    computed = []
+
+    async def complete():
+        computed.append(1)
+        return REPLY
+
+    async def run():
+        key = main.chat_cache.key("hi", "friendly", "en")
+        return await asyncio.gather(collect(FakeRequest(disconnected=True), key, complete),
+                                    collect(FakeRequest(), key, complete))
+
+    leader, waiter = asyncio.run(run())
+    assert "done" not in leader
+    assert 'data: {"content": "hello"}' in waiter
+    assert computed == [1]
+    assert main.chat_cache.stats()["inflight"] == 0
+
+# Password hashing pool tests
+def test_hash_pool_matches_sync_context():
+    """Hashes made on the pool verify both ways, sync and async"""
+    async def run():
+        hashed = await hash_password(TEST_USER["password"])
+        return hashed, await verify_password_async(TEST_USER["password"], hashed), \
+            await verify_password_async("wrong", hashed)
+
+    hashed, valid, invalid = asyncio.run(run())
+    assert valid and not invalid
+    assert pwd_context.verify(TEST_USER["password"], hashed)
+
+def test_hash_pool_keeps_loop_responsive():
+    """The event loop keeps ticking while bcrypt runs"""
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.001)
+
+        task = asyncio.create_task(ticker())
+        await asyncio.gather(*[hash_password("password") for _ in range(4)])
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(run()) > 5
+
 # Existing endpoints
 @app.get("/test")
 async def test_endpoint():
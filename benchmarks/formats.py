@@ -0,0 +1,59 @@
+"""Compare screenshot output formats: encoded size and capture latency.
+
+Runs against a running server (python server.py) and bypasses the screenshot
+cache so every request renders:
+
+    python benchmarks/formats.py --url https://example.com --runs 5
+"""
+import argparse
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+
+CASES = [
+    {'format': 'png'},
+    {'format': 'jpeg', 'quality': 80},
+    {'format': 'jpeg', 'quality': 60},
+    {'format': 'webp', 'quality': 80},
+    {'format': 'avif', 'quality': 60},
+    {'format': 'jpeg', 'quality': 80, 'width': 400},
+    {'format': 'jpeg', 'quality': 80, 'device_scale_factor': 2},
+    {'format': 'jpeg', 'quality': 80, 'full_page': True},
+]
+
+
+def capture(server, body):
+    req = urllib.request.Request(
+        server.rstrip('/') + '/capture', data=json.dumps(body).encode('utf-8'),
+        headers={'Content-Type': 'application/json', 'Cache-Control': 'no-store, no-cache'})
+    started = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=120) as resp:
+        result = json.load(resp)
+    return time.perf_counter() - started, result['size']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--server', default='http://localhost:5001')
+    parser.add_argument('--url', default='https://example.com')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'case':<45} {'bytes':>10} {'p50 ms':>8} {'max ms':>8}")
+    for case in CASES:
+        label = ' '.join(f'{k}={v}' for k, v in case.items())
+        latencies, size = [], None
+        try:
+            for _ in range(args.runs):
+                elapsed, size = capture(args.server, dict(case, url=args.url))
+                latencies.append(elapsed * 1000)
+        except urllib.error.HTTPError as e:
+            print(f"{label:<45} skipped: {json.load(e).get('error', e.reason)}")
+            continue
+        print(f"{label:<45} {size:>10} {statistics.median(latencies):>8.0f} {max(latencies):>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,377 @@
+"""Capture and recording benchmark suite.
+
+Starts server.py on a free port against the static fixture site in
+benchmarks/fixtures, drives /capture and the recording endpoints at the
+requested concurrency, and reports throughput, latency percentiles, achieved
+recording fps, CPU time and peak RSS:
+
+    python benchmarks/run.py --concurrency 4 --requests 40 --output results.json
+    python benchmarks/run.py --baseline results.json --max-regression 0.15
+
+With --baseline the run exits with status 1 when a scenario's p95 latency or
+throughput is worse than the baseline by more than --max-regression.
+"""
+import argparse
+import functools
+import http.server
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import psutil
+except ImportError:  # optional: per-process-tree sampling; falls back to rusage of reaped children
+    psutil = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, 'benchmarks', 'fixtures')
+
+CAPTURE_SCENARIOS = {
+    'capture_light': {'page': 'light.html'},
+    'capture_heavy_js': {'page': 'heavy_js.html', 'wait_until': 'networkidle'},
+    'capture_tall_full_page': {'page': 'tall.html', 'full_page': True},
+    # Same asset-heavy page with and without resource blocking, to measure the savings
+    'capture_assets': {'page': 'assets.html'},
+    'capture_assets_fast': {'page': 'assets.html', 'profile': 'fast', 'block_urls': ['*/ads/*']},
+    'capture_assets_minimal': {'page': 'assets.html', 'profile': 'minimal', 'block_urls': ['*/ads/*']},
+}
+RECORDING_SCENARIOS = {
+    'record_screenshot': {'page': 'heavy_js.html', 'mode': 'screenshot'},
+    'record_screencast': {'page': 'heavy_js.html', 'mode': 'screencast'},
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = (len(ordered) - 1) * pct / 100.0
+    low, high = int(index), min(int(index) + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (index - low)
+
+
+def summarize(latencies, errors, elapsed):
+    return {
+        'requests': len(latencies) + errors,
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 3) if elapsed > 0 else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+    }
+
+
+def request_json(url, body=None, timeout=300, headers=None):
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    req = urllib.request.Request(url, data=data, headers=dict({'Content-Type': 'application/json'}, **(headers or {})))
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return json.load(resp)
+
+
+# ---------------------------------------------------------------------- #
+# Processes under test
+# ---------------------------------------------------------------------- #
+class FixtureSite:
+    """Static file server for the fixture pages, on a background thread."""
+
+    def __init__(self):
+        handler = functools.partial(_QuietHandler, directory=FIXTURES)
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', free_port()), handler)
+        self.base_url = f'http://127.0.0.1:{self.httpd.server_address[1]}/'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    """Serves the fixtures; /slow/ and /ads/ stand in for third-party assets with network latency."""
+
+    SLOW_PREFIXES = ('/slow/', '/ads/')
+    SLOW_DELAY = 0.3
+    # Smallest valid bodies are enough: the browser only has to fetch them
+    SLOW_BODIES = {
+        '.png': ('image/png', bytes.fromhex(
+            '89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c489'
+            '0000000b49444154789c6360000200000500017a5eab3f0000000049454e44ae426082')),
+        '.woff2': ('font/woff2', b''),
+        '.js': ('application/javascript', b'window.__tracked = (window.__tracked || 0) + 1;'),
+    }
+
+    def do_GET(self):
+        if not self.path.startswith(self.SLOW_PREFIXES):
+            return super().do_GET()
+        time.sleep(self.SLOW_DELAY)
+        extension = os.path.splitext(self.path.split('?', 1)[0])[1]
+        content_type, body = self.SLOW_BODIES.get(extension, ('application/octet-stream', b''))
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ServerProcess:
+    """server.py in a scratch working directory, so recordings, screenshots and databases stay isolated."""
+
+    def __init__(self, pool_size, startup_timeout=180):
+        self.port = free_port()
+        self.workdir = tempfile.mkdtemp(prefix='capture-bench-')
+        self.base_url = f'http://127.0.0.1:{self.port}'
+        env = dict(os.environ, PORT=str(self.port), FLASK_DEBUG='0', LOG_LEVEL='WARNING',
+                   BROWSER_POOL_SIZE=str(pool_size))
+        env.pop('CAPTURE_CACHE_DISK_DIR', None)
+        self.process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'server.py')], cwd=self.workdir,
+                                        env=env, stdout=subprocess.DEVNULL, stderr=open(self.log_path, 'wb'))
+        self.peak_rss = 0
+        self._sampling = True
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        self._wait_ready(startup_timeout)
+
+    @property
+    def log_path(self):
+        return os.path.join(self.workdir, 'server.log')
+
+    def _wait_ready(self, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"server.py exited with {self.process.returncode}, see {self.log_path}")
+            try:
+                stats = request_json(self.base_url + '/pool-stats', timeout=5)
+                if stats['idle'] >= 1:
+                    return
+            except (urllib.error.URLError, ConnectionError, OSError):
+                pass
+            time.sleep(0.5)
+        raise RuntimeError(f"server.py not ready after {timeout}s, see {self.log_path}")
+
+    def _tree(self):
+        root = psutil.Process(self.process.pid)
+        return [root] + root.children(recursive=True)
+
+    def _sample(self):
+        # Sum over the whole tree: chromedriver, Chrome and ffmpeg do most of the work
+        while psutil and self._sampling and self.process.poll() is None:
+            try:
+                self.peak_rss = max(self.peak_rss, sum(p.memory_info().rss for p in self._tree()))
+            except psutil.Error:
+                pass
+            time.sleep(0.25)
+
+    def cpu_seconds(self):
+        if not psutil:
+            return None
+        total = 0.0
+        for proc in self._tree():
+            try:
+                times = proc.cpu_times()
+                total += times.user + times.system
+            except psutil.Error:
+                pass
+        return total
+
+    def stop(self):
+        self._sampling = False
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+def measure(server, fn):
+    """Run ``fn`` and attach CPU seconds used by the server tree while it ran."""
+    cpu_before = server.cpu_seconds()
+    result = fn()
+    cpu_after = server.cpu_seconds()
+    if cpu_before is not None and cpu_after is not None:
+        result['cpu_seconds'] = round(cpu_after - cpu_before, 2)
+    return result
+
+
+# ---------------------------------------------------------------------- #
+# Scenarios
+# ---------------------------------------------------------------------- #
+def run_capture(server, site, scenario, requests, concurrency):
+    body = {k: v for k, v in scenario.items() if k != 'page'}
+    body['url'] = site.base_url + scenario['page']
+    # Bypass the screenshot cache so every request renders
+    headers = {'Cache-Control': 'no-store, no-cache'}
+
+    def one(_):
+        started = time.perf_counter()
+        try:
+            request_json(server.base_url + '/capture', body, headers=headers)
+        except Exception:
+            return None
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one, range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies = [r for r in results if r is not None]
+    return summarize(latencies, len(results) - len(latencies), elapsed)
+
+
+def run_recording(server, site, scenario, jobs, duration):
+    body = {'url': site.base_url + scenario['page'], 'duration': duration, 'mode': scenario['mode']}
+
+    def one(_):
+        started = time.perf_counter()
+        try:
+            job_id = request_json(server.base_url + '/start-recording', body)['job_id']
+            after, completed = 0, None
+            while completed is None:
+                poll = request_json(f"{server.base_url}/recording-events/{job_id}/poll?after={after}")
+                for event in poll['events']:
+                    after = event['id']
+                    if event['event'] == 'failed':
+                        raise RuntimeError(event['data'].get('error'))
+                    if event['event'] == 'completed':
+                        completed = event['data']
+            request_json(server.base_url + '/stop-recording', {'job_id': job_id})
+        except Exception:
+            return None
+        return time.perf_counter() - started, completed.get('fps', 0.0), completed.get('deduped', 0)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = list(executor.map(one, range(jobs)))
+    elapsed = time.perf_counter() - started
+    ok = [r for r in results if r is not None]
+    result = summarize([r[0] for r in ok], len(results) - len(ok), elapsed)
+    fps = [r[1] for r in ok]
+    result.update({
+        'duration': duration,
+        'fps_mean': round(sum(fps) / len(fps), 2) if fps else None,
+        'fps_min': round(min(fps), 2) if fps else None,
+        'deduped_frames': sum(r[2] for r in ok),
+    })
+    return result
+
+
+# ---------------------------------------------------------------------- #
+# Baseline comparison
+# ---------------------------------------------------------------------- #
+def compare(results, baseline, max_regression):
+    """Return human-readable regressions of p95 latency or throughput beyond ``max_regression``."""
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            continue
+        if previous.get('p95_ms') and current.get('p95_ms'):
+            change = current['p95_ms'] / previous['p95_ms'] - 1
+            if change > max_regression:
+                regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms (+{change:.0%})")
+        if previous.get('throughput_rps') and current.get('throughput_rps') is not None:
+            change = 1 - current['throughput_rps'] / previous['throughput_rps']
+            if change > max_regression:
+                regressions.append(f"{name}: throughput {previous['throughput_rps']} -> "
+                                   f"{current['throughput_rps']} rps (-{change:.0%})")
+        if current.get('errors', 0) > previous.get('errors', 0):
+            regressions.append(f"{name}: errors {previous.get('errors', 0)} -> {current['errors']}")
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenarios', default=','.join(list(CAPTURE_SCENARIOS) + list(RECORDING_SCENARIOS)),
+                        help='comma-separated scenario names')
+    parser.add_argument('--concurrency', type=int, default=4, help='parallel /capture requests')
+    parser.add_argument('--requests', type=int, default=20, help='/capture requests per scenario')
+    parser.add_argument('--pool-size', type=int, default=None, help='BROWSER_POOL_SIZE (default: --concurrency)')
+    parser.add_argument('--recording-jobs', type=int, default=2, help='concurrent recordings per scenario')
+    parser.add_argument('--recording-duration', type=int, default=5)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--baseline', help='results JSON of an earlier run to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.15)
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [n for n in names if n not in CAPTURE_SCENARIOS and n not in RECORDING_SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    site = FixtureSite()
+    server = ServerProcess(args.pool_size or args.concurrency)
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'args': vars(args),
+        },
+        'scenarios': {},
+    }
+    try:
+        for name in names:
+            if name in CAPTURE_SCENARIOS:
+                result = measure(server, lambda: run_capture(server, site, CAPTURE_SCENARIOS[name],
+                                                             args.requests, args.concurrency))
+            else:
+                result = measure(server, lambda: run_recording(server, site, RECORDING_SCENARIOS[name],
+                                                               args.recording_jobs, args.recording_duration))
+            results['scenarios'][name] = result
+            print(f"{name:<24} " + ' '.join(f'{k}={v}' for k, v in result.items()))
+    finally:
+        results['peak_rss_bytes'] = server.peak_rss or None
+        server.stop()
+        site.close()
+
+    if not psutil:
+        # Without psutil: totals for every reaped descendant, and the largest single process
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        results['cpu_seconds_total'] = round(usage.ru_utime + usage.ru_stime, 2)
+        results['peak_rss_bytes'] = usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    print(f"peak RSS: {(results['peak_rss_bytes'] or 0) / 2 ** 20:.0f} MiB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
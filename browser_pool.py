@@ -0,0 +1,223 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Raised when no browser session becomes available in time."""
+
+
+class _PooledDriver:
+    """A WebDriver plus the bookkeeping the pool needs to recycle it."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+        self.created_at = time.time()
+
+
+class BrowserPool:
+    """Bounded, thread-safe pool of warm headless Chrome sessions.
+
+    Drivers are created with ``factory`` (normally ``setup_driver``), handed out
+    one request at a time, reset on return and recycled after ``max_uses``
+    checkouts or as soon as they stop responding. ``reset_hooks`` are extra
+    ``fn(driver)`` callables run on return to undo per-request browser settings.
+    """
+
+    def __init__(self, factory, size=2, max_uses=50, acquire_timeout=30, reset_hooks=()):
+        self.factory = factory
+        self.reset_hooks = list(reset_hooks)
+        self.size = max(1, int(size))
+        self.max_uses = max(1, int(max_uses))
+        self.acquire_timeout = acquire_timeout
+
+        self._idle = []
+        self._total = 0  # idle + checked out + being created
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._stats = {
+            'checkouts': 0,
+            'created': 0,
+            'recycled': 0,
+            'crashed': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+        }
+
+    # ------------------------------------------------------------------ #
+    # Lifecycle
+    # ------------------------------------------------------------------ #
+    def start(self):
+        """Pre-launch drivers in the background until the pool is full."""
+        threading.Thread(target=self._fill, daemon=True).start()
+
+    def _fill(self):
+        while True:
+            with self._cond:
+                if self._closed or self._total >= self.size:
+                    return
+                self._total += 1
+            entry = self._create()
+            with self._cond:
+                if entry is None:
+                    return
+                self._idle.append(entry)
+                self._cond.notify()
+
+    def close(self):
+        """Quit every idle driver; checked-out drivers are quit on release."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+            self._cond.notify_all()
+        for entry in idle:
+            self._quit(entry)
+
+    # ------------------------------------------------------------------ #
+    # Checkout / return
+    # ------------------------------------------------------------------ #
+    def acquire(self, timeout=None):
+        """Check out a driver, launching one if the pool is below capacity."""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("Browser pool is closed")
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._total < self.size:
+                    self._total += 1
+                    entry = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"No browser available after {timeout}s")
+                self._cond.wait(remaining)
+
+        if entry is None:
+            entry = self._create()
+            if entry is None:
+                raise RuntimeError("Failed to launch a browser session")
+
+        waited = time.monotonic() - started
+        with self._cond:
+            self._stats['checkouts'] += 1
+            self._stats['wait_time_total'] += waited
+            self._stats['wait_time_max'] = max(self._stats['wait_time_max'], waited)
+
+        entry.uses += 1
+        return entry
+
+    def release(self, entry, broken=False):
+        """Return a driver to the pool, resetting or recycling it."""
+        recycle = broken or self._closed or entry.uses >= self.max_uses
+        if not recycle:
+            recycle = not self._reset(entry.driver)
+
+        if recycle:
+            self._quit(entry)
+            with self._cond:
+                self._total -= 1
+                self._stats['crashed' if broken else 'recycled'] += 1
+                self._cond.notify()
+            if not self._closed:
+                self.start()  # top the pool back up off the request path
+            return
+
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    @contextmanager
+    def session(self, timeout=None):
+        """Context manager yielding a pooled driver for a single request."""
+        entry = self.acquire(timeout)
+        broken = False
+        try:
+            yield entry.driver
+        except Exception:
+            broken = not self._is_alive(entry.driver)
+            raise
+        finally:
+            self.release(entry, broken=broken)
+
+    # ------------------------------------------------------------------ #
+    # Introspection
+    # ------------------------------------------------------------------ #
+    def stats(self):
+        """Return pool size, occupancy and checkout wait-time statistics."""
+        with self._cond:
+            checkouts = self._stats['checkouts']
+            return {
+                'size': self.size,
+                'total': self._total,
+                'idle': len(self._idle),
+                'in_use': self._total - len(self._idle),
+                'max_uses': self.max_uses,
+                'checkouts': checkouts,
+                'created': self._stats['created'],
+                'recycled': self._stats['recycled'],
+                'crashed': self._stats['crashed'],
+                'wait_time_avg': self._stats['wait_time_total'] / checkouts if checkouts else 0.0,
+                'wait_time_max': self._stats['wait_time_max'],
+            }
+
+    # ------------------------------------------------------------------ #
+    # Helpers
+    # ------------------------------------------------------------------ #
+    def _create(self):
+        try:
+            entry = _PooledDriver(self.factory())
+        except Exception as e:
+            logger.error(f"Browser pool failed to launch driver: {str(e)}")
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            return None
+        with self._cond:
+            self._stats['created'] += 1
+        return entry
+
+    def _reset(self, driver):
+        """Clear cookies/storage and per-request emulation, and park the driver on about:blank."""
+        try:
+            # CDP clears cookies for every domain, not just the current one
+            driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+            # Undo any device_scale_factor override set for the last capture
+            driver.execute_cdp_cmd('Emulation.clearDeviceMetricsOverride', {})
+            for hook in self.reset_hooks:
+                hook(driver)
+            driver.execute_script(
+                "try { window.localStorage.clear(); } catch (e) {}"
+                "try { window.sessionStorage.clear(); } catch (e) {}"
+            )
+            driver.get('about:blank')
+            return True
+        except Exception as e:
+            logger.warning(f"Browser pool reset failed, recycling driver: {str(e)}")
+            return False
+
+    @staticmethod
+    def _is_alive(driver):
+        try:
+            driver.window_handles
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _quit(entry):
+        try:
+            entry.driver.quit()
+        except Exception as e:
+            logger.debug(f"Minor error quitting pooled driver: {e}")
@@ -0,0 +1,97 @@
+import weakref
+
+# URL patterns (DevTools Network.setBlockedURLs wildcards) per blockable resource type
+_EXTENSIONS = {
+    'image': ('png', 'jpg', 'jpeg', 'gif', 'webp', 'avif', 'svg', 'ico', 'bmp'),
+    'font': ('woff', 'woff2', 'ttf', 'otf', 'eot'),
+    'media': ('mp4', 'webm', 'ogg', 'ogv', 'mp3', 'wav', 'm4a', 'm3u8', 'mpd'),
+    'stylesheet': ('css',),
+    'script': ('js', 'mjs'),
+}
+RESOURCE_PATTERNS = {
+    kind: [pattern for ext in extensions for pattern in (f'*.{ext}', f'*.{ext}?*')]
+    for kind, extensions in _EXTENSIONS.items()
+}
+# Common ad, analytics and tag-manager hosts
+RESOURCE_PATTERNS['ads'] = [
+    '*doubleclick.net*', '*googlesyndication.com*', '*googleadservices.com*', '*googletagservices.com*',
+    '*googletagmanager.com*', '*google-analytics.com*', '*adservice.google.*', '*amazon-adsystem.com*',
+    '*adnxs.com*', '*criteo.com*', '*criteo.net*', '*taboola.com*', '*outbrain.com*', '*pubmatic.com*',
+    '*rubiconproject.com*', '*moatads.com*', '*scorecardresearch.com*', '*quantserve.com*',
+    '*connect.facebook.net*', '*hotjar.com*', '*clarity.ms*', '*segment.io*', '*segment.com/analytics*',
+    '*mixpanel.com*', '*nr-data.net*', '*js-agent.newrelic.com*', '*optimizely.com*',
+]
+RESOURCE_TYPES = tuple(RESOURCE_PATTERNS)
+
+# Named presets; request options are added on top of the chosen profile
+PROFILES = {
+    'default': {'block': (), 'disable_animations': False},
+    'no_ads': {'block': ('ads',), 'disable_animations': False},
+    'fast': {'block': ('ads', 'font', 'media'), 'disable_animations': True},
+    'minimal': {'block': ('ads', 'font', 'media', 'image'), 'disable_animations': True},
+}
+
+_DISABLE_ANIMATIONS_JS = """
+(function () {
+  function inject() {
+    var style = document.createElement('style');
+    style.textContent = '*, *::before, *::after { animation: none !important; transition: none !important;'
+      + ' scroll-behavior: auto !important; caret-color: transparent !important; }';
+    (document.head || document.documentElement).appendChild(style);
+  }
+  if (document.documentElement) { inject(); } else { document.addEventListener('DOMContentLoaded', inject); }
+})();
+"""
+
+# Scripts registered on a driver, so reset() can unregister them when it goes back to the pool
+_registered_scripts = weakref.WeakKeyDictionary()
+
+
+def parse_resource_options(data):
+    """Resolve profile / block / block_urls / disable_images / disable_animations from a request body."""
+    name = data.get('profile', 'default')
+    if name not in PROFILES:
+        raise ValueError(f"Unknown profile '{name}', expected one of {', '.join(PROFILES)}")
+    profile = PROFILES[name]
+
+    block = data.get('block') or []
+    block_urls = data.get('block_urls') or []
+    if not isinstance(block, list) or not isinstance(block_urls, list):
+        raise ValueError("block and block_urls must be lists")
+    unknown = [kind for kind in block if kind not in RESOURCE_TYPES]
+    if unknown:
+        raise ValueError(f"Unknown resource type(s) {', '.join(map(str, unknown))}, "
+                         f"expected {', '.join(RESOURCE_TYPES)}")
+
+    kinds = set(profile['block']) | set(block)
+    if data.get('disable_images'):
+        kinds.add('image')
+    patterns = {pattern for kind in kinds for pattern in RESOURCE_PATTERNS[kind]}
+    patterns.update(str(pattern) for pattern in block_urls)
+
+    disable_animations = data.get('disable_animations')
+    return {
+        'profile': name,
+        'blocked_urls': sorted(patterns),
+        'disable_animations': profile['disable_animations'] if disable_animations is None else bool(disable_animations),
+    }
+
+
+def apply(driver, settings):
+    """Apply resolved resource settings to a driver before it navigates."""
+    if settings['blocked_urls']:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': settings['blocked_urls']})
+    if settings['disable_animations']:
+        driver.execute_cdp_cmd('Emulation.setEmulatedMedia', {
+            'features': [{'name': 'prefers-reduced-motion', 'value': 'reduce'}]})
+        result = driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': _DISABLE_ANIMATIONS_JS})
+        _registered_scripts.setdefault(driver, []).append(result['identifier'])
+
+
+def reset(driver):
+    """Undo apply(); used as a browser pool reset hook."""
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': []})
+    driver.execute_cdp_cmd('Emulation.setEmulatedMedia', {'features': []})
+    for identifier in _registered_scripts.pop(driver, []):
+        driver.execute_cdp_cmd('Page.removeScriptToEvaluateOnNewDocument', {'identifier': identifier})
@@ -0,0 +1,241 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_url(url):
+    """Canonical form of a URL for cache keys: lower-case scheme/host, no fragment."""
+    parts = urlsplit(url)
+    netloc = parts.netloc.lower()
+    scheme = parts.scheme.lower()
+    if (scheme, netloc.rsplit(':', 1)[-1]) in (('http', '80'), ('https', '443')):
+        netloc = netloc.rsplit(':', 1)[0]
+    return urlunsplit((scheme, netloc, parts.path or '/', parts.query, ''))
+
+
+def make_key(url, options):
+    """Cache key for a normalized URL plus every option that changes the rendered image."""
+    payload = json.dumps({'url': normalize_url(url), 'options': options}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def parse_cache_control(header):
+    """Return (max_age, no_cache, no_store) from a request Cache-Control header."""
+    max_age, no_cache, no_store = None, False, False
+    for directive in (header or '').split(','):
+        name, _, value = directive.strip().lower().partition('=')
+        if name == 'no-cache':
+            no_cache = True
+        elif name == 'no-store':
+            no_store = True
+        elif name == 'max-age':
+            try:
+                max_age = int(value.strip('"'))
+            except ValueError:
+                pass
+    if max_age == 0:
+        no_cache = True
+    return max_age, no_cache, no_store
+
+
+class CacheEntry:
+    def __init__(self, data, mimetype, meta=None, created_at=None):
+        self.data = data
+        self.mimetype = mimetype
+        self.meta = meta or {}
+        self.created_at = created_at or time.time()
+
+    @property
+    def age(self):
+        return time.time() - self.created_at
+
+
+class ScreenshotCache:
+    """TTL + size-bounded LRU cache of rendered screenshots.
+
+    The in-memory tier evicts least recently used entries once either
+    ``max_entries`` or ``max_bytes`` is exceeded. When ``disk_dir`` is set,
+    entries are also written there and memory misses fall back to disk, so
+    the cache survives restarts and can hold more than fits in memory. The
+    disk tier is swept at most every ``sweep_interval`` seconds on write:
+    expired entries are deleted, then the oldest until it fits
+    ``disk_max_bytes`` (0 for no size limit).
+    """
+
+    def __init__(self, ttl=300, max_entries=256, max_bytes=256 * 1024 * 1024, disk_dir=None,
+                 disk_max_bytes=1024 ** 3, sweep_interval=60):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.sweep_interval = sweep_interval
+        self._swept_at = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits_memory': 0, 'hits_disk': 0, 'misses': 0, 'evictions': 0, 'stores': 0,
+                       'disk_evictions': 0}
+
+    def get(self, key, max_age=None):
+        """Return a fresh entry or None. ``max_age`` can only tighten the TTL."""
+        limit = self.ttl if max_age is None else min(self.ttl, max_age)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.age <= limit:
+                    self._entries.move_to_end(key)
+                    self._stats['hits_memory'] += 1
+                    return entry
+                if entry.age > self.ttl:
+                    self._remove(key)
+
+        entry = self._read_disk(key)
+        if entry is not None and entry.age <= limit:
+            self._put_memory(key, entry)
+            with self._lock:
+                self._stats['hits_disk'] += 1
+            return entry
+
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+
+    def put(self, key, entry):
+        self._put_memory(key, entry)
+        with self._lock:
+            self._stats['stores'] += 1
+        self._write_disk(key, entry)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'disk': bool(self.disk_dir),
+                'disk_max_bytes': self.disk_max_bytes,
+            })
+        lookups = stats['hits_memory'] + stats['hits_disk'] + stats['misses']
+        stats['hit_ratio'] = round((lookups - stats['misses']) / lookups, 4) if lookups else 0.0
+        return stats
+
+    # ------------------------------------------------------------------ #
+    # Memory tier
+    # ------------------------------------------------------------------ #
+    def _put_memory(self, key, entry):
+        size = len(entry.data)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats['evictions'] += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry.data)
+
+    # ------------------------------------------------------------------ #
+    # Disk tier
+    # ------------------------------------------------------------------ #
+    def _disk_paths(self, key):
+        return os.path.join(self.disk_dir, key + '.bin'), os.path.join(self.disk_dir, key + '.json')
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        data_path, meta_path = self._disk_paths(key)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            if time.time() - meta['created_at'] > self.ttl:
+                for path in (data_path, meta_path):
+                    os.remove(path)
+                return None
+            with open(data_path, 'rb') as f:
+                data = f.read()
+        except (OSError, ValueError, KeyError):
+            return None
+        return CacheEntry(data, meta['mimetype'], meta.get('meta'), meta['created_at'])
+
+    def _write_disk(self, key, entry):
+        if not self.disk_dir:
+            return
+        data_path, meta_path = self._disk_paths(key)
+        try:
+            # Data first, metadata last: a reader never sees metadata without its data
+            with open(data_path + '.tmp', 'wb') as f:
+                f.write(entry.data)
+            os.replace(data_path + '.tmp', data_path)
+            with open(meta_path + '.tmp', 'w') as f:
+                json.dump({'mimetype': entry.mimetype, 'meta': entry.meta, 'created_at': entry.created_at}, f)
+            os.replace(meta_path + '.tmp', meta_path)
+        except OSError as e:
+            logger.warning(f"Failed to write screenshot cache entry {key}: {e}")
+
+        now = time.time()
+        with self._lock:
+            due = now - self._swept_at >= self.sweep_interval
+            if due:
+                self._swept_at = now
+        if due:
+            self.sweep_disk()
+
+    def sweep_disk(self):
+        """Delete expired disk entries, then the oldest until the tier fits ``disk_max_bytes``.
+
+        Entries are dated by their metadata file's mtime, which is written
+        last. Returns the number of entries removed.
+        """
+        if not self.disk_dir:
+            return 0
+        entries = []
+        for item in os.scandir(self.disk_dir):
+            if not item.name.endswith('.json'):
+                continue
+            key = item.name[:-len('.json')]
+            data_path, meta_path = self._disk_paths(key)
+            try:
+                size = os.path.getsize(data_path) + item.stat().st_size
+                entries.append((item.stat().st_mtime, size, key))
+            except OSError:
+                pass
+        entries.sort()
+
+        cutoff = time.time() - self.ttl
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for mtime, size, key in entries:
+            if mtime >= cutoff and not (self.disk_max_bytes and total > self.disk_max_bytes):
+                break
+            # Metadata first, so a concurrent reader never finds metadata without its data
+            for path in reversed(self._disk_paths(key)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            removed += 1
+        with self._lock:
+            self._stats['disk_evictions'] += removed
+        return removed
@@ -0,0 +1,27 @@
+import os
+import sqlite3
+import threading
+
+
+class LocalConnection:
+    """Callable returning this thread's SQLite connection to ``path``, opening it on first use.
+
+    Connections are per thread and per process: one inherited across fork
+    (gunicorn preload_app) is never shared with the parent, a fresh one is
+    opened in the child instead. Autocommit mode, WAL journal, ``Row`` rows.
+    """
+
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def __call__(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
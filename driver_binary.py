@@ -0,0 +1,68 @@
+import glob
+import logging
+import os
+import shutil
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Explicit chromedriver binary; skips webdriver-manager entirely when set
+CHROMEDRIVER_PATH = os.environ.get('CHROMEDRIVER_PATH')
+# Where webdriver-manager keeps downloaded drivers (shared across restarts)
+DRIVER_CACHE_DIR = os.environ.get('DRIVER_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.drivers'))
+# Days a cached driver is trusted before webdriver-manager probes for a new version
+DRIVER_CACHE_VALID_DAYS = int(os.environ.get('DRIVER_CACHE_VALID_DAYS', 7))
+
+_resolved_path = None
+_lock = threading.Lock()
+
+
+def _is_executable(path):
+    return bool(path) and os.path.isfile(path) and os.access(path, os.X_OK)
+
+
+def _find_cached_driver():
+    """Return the newest chromedriver already present in the local cache."""
+    names = ('chromedriver', 'chromedriver.exe')
+    candidates = [p for name in names
+                  for p in glob.glob(os.path.join(DRIVER_CACHE_DIR, '**', name), recursive=True)
+                  if _is_executable(p)]
+    if not candidates:
+        return None
+    return max(candidates, key=os.path.getmtime)
+
+
+def _resolve():
+    if CHROMEDRIVER_PATH:
+        if not _is_executable(CHROMEDRIVER_PATH):
+            raise FileNotFoundError(f"CHROMEDRIVER_PATH is not an executable file: {CHROMEDRIVER_PATH}")
+        logger.info(f"Using chromedriver from CHROMEDRIVER_PATH: {CHROMEDRIVER_PATH}")
+        return CHROMEDRIVER_PATH
+
+    try:
+        from webdriver_manager.chrome import ChromeDriverManager
+        os.makedirs(DRIVER_CACHE_DIR, exist_ok=True)
+        path = ChromeDriverManager(path=DRIVER_CACHE_DIR,
+                                   cache_valid_range=DRIVER_CACHE_VALID_DAYS).install()
+        logger.info(f"Resolved chromedriver via webdriver-manager: {path}")
+        return path
+    except Exception as e:
+        # Air-gapped nodes: fall back to whatever is already on disk
+        logger.warning(f"webdriver-manager could not resolve chromedriver ({str(e)}), trying local copies")
+
+    path = _find_cached_driver() or shutil.which('chromedriver')
+    if not path:
+        raise FileNotFoundError(
+            "No chromedriver available: set CHROMEDRIVER_PATH or pre-populate DRIVER_CACHE_DIR")
+    logger.info(f"Using local chromedriver: {path}")
+    return path
+
+
+def get_driver_path():
+    """Resolve the chromedriver binary once and return the cached path afterwards."""
+    global _resolved_path
+    if _resolved_path is None:
+        with _lock:
+            if _resolved_path is None:
+                _resolved_path = _resolve()
+    return _resolved_path
@@ -0,0 +1,138 @@
+import json
+import threading
+import time
+
+from db_connection import LocalConnection
+
+TERMINAL_EVENTS = ('completed', 'failed')
+
+
+class EventBus:
+    """In-process publish/subscribe of lifecycle events, one channel per job.
+
+    Each channel keeps a bounded history with increasing event IDs so a
+    client that reconnects (SSE ``Last-Event-ID``) or long-polls with
+    ``after`` receives everything it missed. Channels are dropped
+    ``retention`` seconds after their last event.
+    """
+
+    def __init__(self, history=200, retention=600):
+        self.history = history
+        self.retention = retention
+        self._channels = {}
+        self._cond = threading.Condition()
+        self.closed = False
+
+    def publish(self, channel, event, **data):
+        with self._cond:
+            self._prune()
+            state = self._channels.setdefault(channel, {'next_id': 1, 'events': [], 'updated': 0})
+            entry = {'id': state['next_id'], 'event': event, 'time': time.time(), 'data': data}
+            state['next_id'] += 1
+            state['events'] = state['events'][-(self.history - 1):] + [entry]
+            state['updated'] = entry['time']
+            self._cond.notify_all()
+            return entry
+
+    def exists(self, channel):
+        with self._cond:
+            return channel in self._channels
+
+    def wait(self, channel, after=0, timeout=25):
+        """Return events newer than ``after``, blocking up to ``timeout`` seconds for one."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                state = self._channels.get(channel)
+                events = [e for e in state['events'] if e['id'] > after] if state else []
+                remaining = deadline - time.monotonic()
+                if events or remaining <= 0 or self.closed:
+                    return events
+                self._cond.wait(remaining)
+
+    def close(self):
+        """Wake every waiter and make further waits return at once; used when the process shuts down."""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        for channel in [c for c, state in self._channels.items() if state['updated'] < cutoff]:
+            del self._channels[channel]
+
+
+class SQLiteEventBus(EventBus):
+    """EventBus whose event log lives in SQLite, shared by every worker process.
+
+    A job's events can then be streamed or polled from any worker, not only
+    the one running the job. Waiters are woken at once by publishes in the
+    same process and otherwise re-read the log every ``poll_interval``
+    seconds.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS events (
+        channel TEXT NOT NULL,
+        id INTEGER NOT NULL,
+        event TEXT NOT NULL,
+        time REAL NOT NULL,
+        data TEXT NOT NULL,
+        PRIMARY KEY (channel, id)
+    );
+    CREATE INDEX IF NOT EXISTS events_time ON events (time);
+    """
+
+    def __init__(self, path, history=200, retention=600, poll_interval=0.25):
+        super().__init__(history=history, retention=retention)
+        self.poll_interval = poll_interval
+        self._connect = LocalConnection(path)
+        self._pruned_at = 0
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def publish(self, channel, event, **data):
+        entry = {'event': event, 'time': time.time(), 'data': data}
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            entry['id'] = conn.execute(
+                "SELECT COALESCE(MAX(id), 0) + 1 FROM events WHERE channel = ?", (channel,)).fetchone()[0]
+            conn.execute("INSERT INTO events (channel, id, event, time, data) VALUES (?, ?, ?, ?, ?)",
+                         (channel, entry['id'], event, entry['time'], json.dumps(data)))
+            conn.execute("DELETE FROM events WHERE channel = ? AND id <= ?", (channel, entry['id'] - self.history))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        self._prune()
+        with self._cond:
+            self._cond.notify_all()
+        return entry
+
+    def exists(self, channel):
+        return self._connect().execute("SELECT 1 FROM events WHERE channel = ? LIMIT 1", (channel,)).fetchone() is not None
+
+    def wait(self, channel, after=0, timeout=25):
+        deadline = time.monotonic() + timeout
+        while True:
+            rows = self._connect().execute(
+                "SELECT id, event, time, data FROM events WHERE channel = ? AND id > ? ORDER BY id", (channel, after))
+            events = [{'id': row['id'], 'event': row['event'], 'time': row['time'], 'data': json.loads(row['data'])}
+                      for row in rows]
+            remaining = deadline - time.monotonic()
+            if events or remaining <= 0 or self.closed:
+                return events
+            with self._cond:
+                if not self.closed:
+                    self._cond.wait(min(remaining, self.poll_interval))
+
+    def _prune(self):
+        # Drop channels idle for longer than ``retention``; at most once a minute
+        now = time.time()
+        if now - self._pruned_at < 60:
+            return
+        self._pruned_at = now
+        self._connect().execute(
+            "DELETE FROM events WHERE channel IN "
+            "(SELECT channel FROM events GROUP BY channel HAVING MAX(time) < ?)", (now - self.retention,))
@@ -0,0 +1,39 @@
+import hashlib
+
+import cv2
+import numpy as np
+
+
+class FrameDeduper:
+    """Cheap detection of recording frames that did not change.
+
+    Two tiers: ``digest`` hashes the raw captured bytes, so byte-identical
+    captures are dropped before anything is decoded; ``signature`` reduces a
+    frame to a small grayscale thumbnail, and ``unchanged`` treats two
+    thumbnails whose mean absolute difference is at most ``threshold``
+    (0-255 scale) as the same picture.
+    """
+
+    def __init__(self, threshold=1.0, size=(64, 36)):
+        self.threshold = threshold
+        self.size = size
+
+    @staticmethod
+    def digest(payload):
+        return hashlib.blake2b(payload, digest_size=16).digest()
+
+    def signature(self, payload, frame=None):
+        """Thumbnail of a decoded BGR ``frame``, or of the JPEG/PNG ``payload`` when there is none."""
+        if isinstance(frame, np.ndarray):
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        else:
+            # JPEG is decoded at 1/8 scale straight from the DCT coefficients
+            gray = cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+            if gray is None:
+                return None
+        return cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA)
+
+    def unchanged(self, reference, signature):
+        if reference is None or signature is None:
+            return False
+        return float(cv2.absdiff(reference, signature).mean()) <= self.threshold
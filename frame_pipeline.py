@@ -0,0 +1,282 @@
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DROP_POLICIES = ('drop_oldest', 'block')
+FILL_POLICIES = ('duplicate', 'none')
+
+
+class StageTimer:
+    """Call count and cumulative/maximum duration of one pipeline stage.
+
+    ``observe(seconds)``, when given, also receives every sample (e.g. a metrics histogram).
+    """
+
+    def __init__(self, observe=None):
+        self.observe = observe
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+        if self.observe:
+            self.observe(seconds)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'count': self.count,
+                'avg_ms': round(self.total / self.count * 1000, 2) if self.count else 0.0,
+                'max_ms': round(self.max * 1000, 2),
+            }
+
+
+class FramePipeline:
+    """Grab -> process -> ordered write pipeline for recording frames.
+
+    One grabber thread calls ``grab()`` on a fixed cadence. It returns a list
+    of ``(timestamp, payload)`` pairs, which are queued for a pool of
+    ``process`` workers (decode/resize/convert). A single writer thread
+    restores capture order and hands frames to ``write``.
+
+    When workers fall behind, the bounded queue either drops the oldest
+    pending frame (``drop_oldest``) or makes the grabber wait (``block``).
+    With the ``duplicate`` fill policy each frame is placed on the
+    ``fps`` timeline by its timestamp and the previous frame is repeated
+    across any gap, so output holds a constant frame rate in real time.
+
+    With a ``deduper`` (see frame_dedup.FrameDeduper), captures whose bytes
+    match the previous capture are discarded before they are queued, and
+    frames that look the same as the last written frame are discarded by the
+    writer. Either way the timeline is left to the fill policy, so static
+    pages cost neither decoding nor fresh encoder input.
+
+    ``progress(stats)``, when given, is called from the grabber about every
+    ``progress_interval`` seconds. ``observe_stage(stage, seconds)`` receives
+    every grab/process/write timing.
+    """
+
+    def __init__(self, grab, process, write, fps, interval=None, workers=2, queue_size=8,
+                 drop_policy='drop_oldest', fill_policy='duplicate', deduper=None, progress=None,
+                 progress_interval=1.0, observe_stage=None):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy '{drop_policy}'")
+        if fill_policy not in FILL_POLICIES:
+            raise ValueError(f"Unknown fill policy '{fill_policy}'")
+        self.grab = grab
+        self.process = process
+        self.write = write
+        self.fps = fps
+        self.interval = 1.0 / fps if interval is None else interval
+        self.workers = max(1, int(workers))
+        self.drop_policy = drop_policy
+        self.fill_policy = fill_policy
+        self.deduper = deduper
+        self.progress = progress
+        self.progress_interval = progress_interval
+
+        self._pending = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._results = {}  # seq -> processed frame, or None when the frame was dropped
+        self._results_cond = threading.Condition()
+        self._grabbed = 0
+        self._grabbing_done = False
+        self._error = None
+
+        self.frames_written = 0
+        self.unique_frames = 0
+        self.dropped = 0
+        self.duplicated = 0
+        self.deduped_exact = 0  # identical capture bytes, skipped by the grabber
+        self.deduped_similar = 0  # visually unchanged, skipped by the writer
+        self.elapsed = 0.0
+        self._started = None
+        self.timers = {
+            stage: StageTimer((lambda seconds, stage=stage: observe_stage(stage, seconds)) if observe_stage else None)
+            for stage in ('grab', 'process', 'write')
+        }
+
+    def run(self, duration, wait_stop):
+        """Run until ``duration`` seconds pass or ``wait_stop(timeout)`` returns True.
+
+        Frames already grabbed are processed and written before returning.
+        Raises the first error hit by the process or write stages.
+        """
+        started = self._started = time.monotonic()
+        workers = [threading.Thread(target=self._process_loop, daemon=True) for _ in range(self.workers)]
+        writer = threading.Thread(target=self._write_loop, args=(started,), daemon=True)
+        for thread in workers:
+            thread.start()
+        writer.start()
+
+        try:
+            self._grab_loop(started, duration, wait_stop)
+        finally:
+            for _ in workers:
+                self._pending.put(None)
+            for thread in workers:
+                thread.join()
+            with self._results_cond:
+                self._grabbing_done = True
+                self._results_cond.notify_all()
+            writer.join()
+            self.elapsed = time.monotonic() - started
+
+        if self._error:
+            raise self._error
+
+    def stats(self):
+        elapsed = self.elapsed or (time.monotonic() - self._started if self._started else 0.0)
+        return {
+            'elapsed': round(elapsed, 2),
+            'fps': round(self.captured_frames / elapsed, 2) if elapsed > 0 else 0.0,
+            'frames_written': self.frames_written,
+            'unique_frames': self.unique_frames,
+            'dropped': self.dropped,
+            'duplicated': self.duplicated,
+            'deduped': self.deduped_exact + self.deduped_similar,
+            'deduped_exact': self.deduped_exact,
+            'deduped_similar': self.deduped_similar,
+            'stages': {name: timer.to_dict() for name, timer in self.timers.items()},
+        }
+
+    @property
+    def captured_frames(self):
+        """Frames that made it through capture, whether written or deduplicated."""
+        return self.unique_frames + self.deduped_exact + self.deduped_similar
+
+    # ------------------------------------------------------------------ #
+    # Stages
+    # ------------------------------------------------------------------ #
+    def _grab_loop(self, started, duration, wait_stop):
+        next_tick = started
+        next_progress = started + self.progress_interval
+        last_digest = None
+        while not self._error and time.monotonic() - started < duration:
+            t0 = time.monotonic()
+            try:
+                frames = self.grab()
+            except Exception as e:
+                # Browser gone or crashed: keep what was captured so far
+                logger.warning(f"Frame grab failed, ending capture: {str(e)}")
+                break
+            self.timers['grab'].add(time.monotonic() - t0)
+
+            for timestamp, payload in frames:
+                if self.deduper:
+                    digest = self.deduper.digest(payload)
+                    if digest == last_digest:
+                        self.deduped_exact += 1
+                        continue
+                    last_digest = digest
+                self._enqueue((self._grabbed, timestamp, payload))
+                self._grabbed += 1
+
+            if self.progress and time.monotonic() >= next_progress:
+                next_progress += self.progress_interval
+                self.progress(self.stats())
+
+            # Keep the cadence: only wait for whatever is left of this interval
+            next_tick = max(next_tick + self.interval, time.monotonic())
+            if wait_stop(max(0.0, next_tick - time.monotonic())):
+                break
+
+    def _enqueue(self, item):
+        if self.drop_policy == 'block':
+            self._pending.put(item)
+            return
+        while True:
+            try:
+                self._pending.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    seq = self._pending.get_nowait()[0]
+                except queue.Empty:
+                    continue
+                self._drop(seq)
+
+    def _process_loop(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            seq, timestamp, payload = item
+            t0 = time.monotonic()
+            try:
+                frame = self.process(payload)
+            except Exception as e:
+                logger.warning(f"Dropping frame {seq}, processing failed: {str(e)}")
+                self._drop(seq)
+                continue
+            signature = self.deduper.signature(payload, frame) if self.deduper else None
+            self.timers['process'].add(time.monotonic() - t0)
+            self._store(seq, (timestamp, frame, signature))
+
+    def _store(self, seq, result):
+        with self._results_cond:
+            self._results[seq] = result
+            self._results_cond.notify_all()
+
+    def _drop(self, seq):
+        with self._results_cond:
+            self.dropped += 1
+            self._results[seq] = None
+            self._results_cond.notify_all()
+
+    def _write_loop(self, started):
+        next_seq = 0
+        first_timestamp = None
+        last_frame = None
+        reference = None  # signature of the last frame actually written
+        try:
+            while True:
+                with self._results_cond:
+                    while next_seq not in self._results and not (
+                            self._grabbing_done and next_seq >= self._grabbed):
+                        self._results_cond.wait()
+                    if next_seq not in self._results:
+                        break
+                    result = self._results.pop(next_seq)
+                next_seq += 1
+                if result is None:
+                    continue
+
+                timestamp, frame, signature = result
+                # Compared against the last written frame, so slow gradual changes still add up
+                if self.deduper and self.deduper.unchanged(reference, signature):
+                    self.deduped_similar += 1
+                    continue
+                reference = signature
+                if first_timestamp is None:
+                    first_timestamp = timestamp
+                if self.fill_policy == 'duplicate':
+                    self._fill(last_frame, int((timestamp - first_timestamp) * self.fps))
+                self._write(frame)
+                self.unique_frames += 1
+                last_frame = frame
+
+            # Hold the final frame until the recording's wall-clock end
+            if self.fill_policy == 'duplicate':
+                self._fill(last_frame, int((time.monotonic() - started) * self.fps))
+        except Exception as e:
+            # The grabber checks this and stops; workers drain what is already queued
+            self._error = e
+
+    def _fill(self, frame, slot):
+        while frame is not None and self.frames_written < slot:
+            self._write(frame)
+            self.duplicated += 1
+
+    def _write(self, frame):
+        t0 = time.monotonic()
+        self.write(frame)
+        self.timers['write'].add(time.monotonic() - t0)
+        self.frames_written += 1
@@ -0,0 +1,50 @@
+import multiprocessing
+import os
+import signal
+
+# Recording state must be visible to every worker: a stop request can land on any of them
+os.environ.setdefault('RECORDING_STATE_BACKEND', 'file')
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', 5001)}")
+# Each worker keeps its own pool of BROWSER_POOL_SIZE Chrome sessions, so memory grows with workers
+workers = int(os.environ.get('GUNICORN_WORKERS', min(4, multiprocessing.cpu_count())))
+# Threads per worker: requests mostly wait on Chrome, and SSE/long-poll clients hold a thread each
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+# Import cv2/numpy/selenium and resolve chromedriver once in the master, then fork
+preload_app = True
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+# Time a stopping worker gets to finish requests and finalise in-flight recordings
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 120))
+keepalive = 5
+accesslog = None  # the app logs every request as JSON with its request ID
+
+
+def post_fork(server, worker):
+    # Threads do not survive fork, so browsers and task workers are started per worker
+    from server import start_background_services
+    start_background_services()
+
+
+def post_worker_init(worker):
+    # gthread only runs worker_exit after open requests finish (SSE streams, long-polls) or
+    # graceful_timeout passes, so start stopping recordings the moment SIGTERM arrives
+    handle_exit = signal.getsignal(signal.SIGTERM)
+
+    def handle_term(signum, frame):
+        from server import begin_shutdown
+        begin_shutdown()
+        handle_exit(signum, frame)
+
+    signal.signal(signal.SIGTERM, handle_term)
+
+
+def worker_int(worker):
+    from server import begin_shutdown
+    begin_shutdown()
+
+
+def worker_exit(server, worker):
+    from server import shutdown_background_services
+    # The budget runs from begin_shutdown(), so it ends before the arbiter's SIGKILL
+    shutdown_background_services(timeout=max(1, graceful_timeout - 5))
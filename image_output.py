@@ -0,0 +1,131 @@
+import functools
+import io
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Formats Chrome can encode itself via DevTools Page.captureScreenshot
+CHROME_FORMATS = ('png', 'jpeg', 'webp')
+
+MIMETYPES = {'png': 'image/png', 'jpeg': 'image/jpeg', 'webp': 'image/webp', 'avif': 'image/avif'}
+EXTENSIONS = {'png': '.png', 'jpeg': '.jpg', 'webp': '.webp', 'avif': '.avif'}
+
+DEFAULT_FORMAT = 'jpeg'
+DEFAULT_QUALITY = 80
+MAX_SCALE = 4.0
+
+
+@functools.lru_cache(maxsize=None)
+def avif_supported():
+    """AVIF needs Pillow built with libavif, or the pillow-avif-plugin package.
+
+    Probed once per process; installed codecs do not change at runtime.
+    """
+    try:
+        from PIL import features
+        if features.check('avif'):
+            return True
+    except (ImportError, ValueError):
+        pass
+    try:
+        import pillow_avif  # noqa: F401  (registers the AVIF codec with Pillow)
+        return True
+    except ImportError:
+        return False
+
+
+def available_formats():
+    return CHROME_FORMATS + (('avif',) if avif_supported() else ())
+
+
+def _number(data, name, cast, low, high):
+    value = data.get(name)
+    if value is None:
+        return None
+    try:
+        value = cast(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number")
+    if not low <= value <= high:
+        raise ValueError(f"{name} must be between {low} and {high}")
+    return value
+
+
+def parse_output_options(data):
+    """Extract format / quality / scale / width / device_scale_factor from a request body."""
+    fmt = str(data.get('format', DEFAULT_FORMAT)).lower()
+    if fmt == 'jpg':
+        fmt = 'jpeg'
+    formats = available_formats()
+    if fmt not in formats:
+        raise ValueError(f"Unsupported format '{fmt}', expected one of {', '.join(formats)}")
+
+    quality = _number(data, 'quality', int, 1, 100)
+    if fmt == 'png':
+        quality = None  # lossless, the setting does not apply
+    elif quality is None:
+        quality = DEFAULT_QUALITY
+
+    width = _number(data, 'width', int, 1, 16384)
+    scale = _number(data, 'scale', float, 0.01, MAX_SCALE)
+    if width and scale:
+        raise ValueError("Use only one of scale or width")
+
+    return {
+        'format': fmt,
+        'quality': quality,
+        'scale': scale or 1.0,
+        'width': width,
+        'device_scale_factor': _number(data, 'device_scale_factor', float, 0.5, MAX_SCALE) or 1.0,
+    }
+
+
+def native_format(output):
+    """Format to request from Chrome: the output format itself when Chrome can encode it."""
+    return output['format'] if output['format'] in CHROME_FORMATS else 'png'
+
+
+def output_scale(output, source_width):
+    """Resize factor that turns an image ``source_width`` pixels wide into the requested size."""
+    if output['width']:
+        return output['width'] / float(source_width)
+    return output['scale']
+
+
+def encode(image, output):
+    """Return the final image bytes for ``output``.
+
+    ``image`` is either bytes Chrome already encoded in ``native_format(output)``
+    at the requested size, which are passed through untouched, or a BGR array
+    (stitched tiles) that still has to be resized and encoded.
+    """
+    if not isinstance(image, np.ndarray):
+        if output['format'] == native_format(output):
+            return image
+        # AVIF: Chrome produced a PNG, Pillow does the final encode
+        return _encode_pil(Image.open(io.BytesIO(image)), output)
+
+    scale = output_scale(output, image.shape[1])
+    if scale != 1.0:
+        size = (max(1, int(round(image.shape[1] * scale))), max(1, int(round(image.shape[0] * scale))))
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+
+    fmt, quality = output['format'], output['quality']
+    if fmt == 'avif':
+        return _encode_pil(Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB)), output)
+    params = {
+        'png': [cv2.IMWRITE_PNG_COMPRESSION, 3],
+        'jpeg': [cv2.IMWRITE_JPEG_QUALITY, quality or DEFAULT_QUALITY],
+        'webp': [cv2.IMWRITE_WEBP_QUALITY, quality or DEFAULT_QUALITY],
+    }[fmt]
+    ok, encoded = cv2.imencode(EXTENSIONS[fmt], image, params)
+    if not ok:
+        raise ValueError(f"Failed to encode screenshot as {fmt}")
+    return encoded.tobytes()
+
+
+def _encode_pil(image, output):
+    img_io = io.BytesIO()
+    image.convert('RGB').save(img_io, output['format'].upper(), quality=output['quality'] or DEFAULT_QUALITY)
+    return img_io.getvalue()
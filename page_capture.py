@@ -0,0 +1,152 @@
+import base64
+
+import cv2
+import numpy as np
+
+from image_output import native_format, output_scale
+
+# Tallest region grabbed in one DevTools call; taller pages are captured in tiles
+# (Chrome's compositor cannot rasterise arbitrarily tall surfaces in one pass)
+TILE_HEIGHT = 4096
+# Rows kept before a capture over the pixel budget is narrowed rather than shortened
+MIN_BUDGET_ROWS = 1000
+
+_ELEMENT_RECT_JS = """
+var el = document.querySelector(arguments[0]);
+if (!el) { return null; }
+var r = el.getBoundingClientRect();
+return {x: r.left + window.scrollX, y: r.top + window.scrollY, width: r.width, height: r.height};
+"""
+
+
+def parse_region_options(data, max_height_limit, max_pixels=None):
+    """Extract full-page / element / clip options from a request body.
+
+    ``max_pixels`` bounds the device pixels (width x height x scale²) of a capture.
+    """
+    full_page = bool(data.get('full_page', False))
+    selector = data.get('selector')
+    clip = data.get('clip')
+    if sum(bool(x) for x in (full_page, selector, clip)) > 1:
+        raise ValueError("Use only one of full_page, selector or clip")
+    if clip is not None:
+        try:
+            clip = {k: float(clip[k]) for k in ('x', 'y', 'width', 'height')}
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("clip must be an object with numeric x, y, width and height")
+        if clip['width'] <= 0 or clip['height'] <= 0:
+            raise ValueError("clip width and height must be positive")
+    max_height = data.get('max_height', max_height_limit)
+    try:
+        valid = not isinstance(max_height, bool) and int(max_height) == float(max_height)
+    except (TypeError, ValueError, OverflowError):
+        valid = False
+    if not valid or not 1 <= int(max_height) <= max_height_limit:
+        raise ValueError(f"max_height must be an integer between 1 and {max_height_limit}")
+    max_height = int(max_height)
+    return {'full_page': full_page, 'selector': selector, 'clip': clip, 'max_height': max_height,
+            'max_pixels': max_pixels}
+
+
+def _capture(driver, clip=None, fmt='png', quality=None, scale=1.0):
+    """Image bytes of a CSS-pixel rectangle of the page (the viewport when ``clip`` is None).
+
+    Chrome encodes ``fmt`` and applies ``scale`` itself, so no decode is needed here.
+    """
+    params = {'format': fmt}
+    if clip is not None:
+        params.update(clip=dict(clip, scale=scale), captureBeyondViewport=True)
+    if quality is not None and fmt != 'png':
+        params['quality'] = quality
+    result = driver.execute_cdp_cmd('Page.captureScreenshot', params)
+    return base64.b64decode(result['data'])
+
+
+def _device_pixel_ratio(driver):
+    return float(driver.execute_script('return window.devicePixelRatio') or 1)
+
+
+def _content_size(driver):
+    metrics = driver.execute_cdp_cmd('Page.getLayoutMetrics', {})
+    size = metrics.get('cssContentSize') or metrics['contentSize']
+    return int(size['width']), int(size['height'])
+
+
+def fit_pixel_budget(width, height, scale, max_pixels):
+    """CSS ``(width, height)`` cut down so ``width * height * scale²`` fits ``max_pixels``.
+
+    The bottom is cut first; the width is only narrowed when fewer than
+    MIN_BUDGET_ROWS rows would be left.
+    """
+    if not max_pixels:
+        return width, height
+    budget = max_pixels / (scale * scale)  # CSS pixel area
+    if width * height <= budget:
+        return width, height
+    width = min(width, budget / min(height, MIN_BUDGET_ROWS))
+    return width, min(height, budget / width)
+
+
+def capture_region(driver, clip, max_height, output, max_pixels=None):
+    """Capture ``clip`` (CSS pixels), tiling when it is taller than TILE_HEIGHT.
+
+    Returns ``(image, truncated)`` where ``image`` is bytes already encoded
+    by Chrome in ``native_format(output)`` for a single tile, or an unscaled
+    BGR ``numpy`` array stitched from several tiles. Regions taller than
+    ``max_height``, or larger than ``max_pixels`` device pixels, are cut off
+    and reported as truncated.
+    """
+    scale = _device_pixel_ratio(driver)
+    width, height = fit_pixel_budget(clip['width'], min(clip['height'], max_height), scale, max_pixels)
+    truncated = width < clip['width'] or height < clip['height']
+    clip = dict(clip, width=width, height=height)
+
+    if clip['height'] <= TILE_HEIGHT:
+        return _capture(driver, clip, native_format(output), output['quality'],
+                        output_scale(output, clip['width'] * scale)), truncated
+
+    # Tiles are decoded straight into one preallocated buffer, so peak memory is
+    # the final image plus a single tile regardless of how tall the page is
+    buffer = np.zeros((int(round(clip['height'] * scale)), int(round(clip['width'] * scale)), 3), np.uint8)
+    offset = 0.0
+    while offset < clip['height']:
+        tile_clip = dict(clip, y=clip['y'] + offset, height=min(TILE_HEIGHT, clip['height'] - offset))
+        tile = cv2.imdecode(np.frombuffer(_capture(driver, tile_clip), np.uint8), cv2.IMREAD_COLOR)
+        if tile is None:
+            raise ValueError("Could not decode screenshot tile")
+        top = int(round(offset * scale))
+        rows = min(tile.shape[0], buffer.shape[0] - top)
+        cols = min(tile.shape[1], buffer.shape[1])
+        buffer[top:top + rows, :cols] = tile[:rows, :cols]
+        offset += tile_clip['height']
+    return buffer, truncated
+
+
+def capture_page(driver, region, output):
+    """Capture according to parsed region and output options.
+
+    Returns ``(image, truncated)`` like capture_region. Without a region the
+    current viewport is captured.
+    """
+    if region['full_page']:
+        width, height = _content_size(driver)
+        return capture_region(driver, {'x': 0, 'y': 0, 'width': width, 'height': height},
+                              region['max_height'], output, region['max_pixels'])
+    if region['selector']:
+        rect = driver.execute_script(_ELEMENT_RECT_JS, region['selector'])
+        if not rect or rect['width'] <= 0 or rect['height'] <= 0:
+            raise ValueError(f"No visible element matches selector '{region['selector']}'")
+        return capture_region(driver, rect, region['max_height'], output, region['max_pixels'])
+    if region['clip']:
+        return capture_region(driver, region['clip'], region['max_height'], output, region['max_pixels'])
+
+    fmt = native_format(output)
+    if output['scale'] == 1.0 and not output['width']:
+        return _capture(driver, fmt=fmt, quality=output['quality']), False
+    # Scaling needs an explicit clip; use the visible viewport
+    metrics = driver.execute_cdp_cmd('Page.getLayoutMetrics', {})
+    viewport = metrics.get('cssVisualViewport') or metrics['visualViewport']
+    clip = {'x': viewport['pageX'], 'y': viewport['pageY'],
+            'width': viewport['clientWidth'], 'height': viewport['clientHeight']}
+    scale = output_scale(output, clip['width'] * _device_pixel_ratio(driver))
+    return _capture(driver, clip, fmt, output['quality'], scale), False
@@ -0,0 +1,137 @@
+import json
+import time
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+STRATEGIES = ('domcontentloaded', 'load', 'networkidle', 'layoutstable', 'selector')
+DEFAULT_STRATEGY = 'load'
+DEFAULT_TIMEOUT = 15
+DEFAULT_IDLE_MS = 500
+POLL_INTERVAL = 0.05
+
+# Installs a layout-shift observer that records when the page last moved
+_LAYOUT_SHIFT_OBSERVER_JS = """
+if (!window.__wcLayoutObserver) {
+    window.__wcLastShift = performance.now();
+    try {
+        window.__wcLayoutObserver = new PerformanceObserver(function (list) {
+            window.__wcLastShift = performance.now();
+        });
+        window.__wcLayoutObserver.observe({type: 'layout-shift', buffered: true});
+    } catch (e) {
+        window.__wcLayoutObserver = true;
+    }
+}
+return performance.now() - window.__wcLastShift;
+"""
+
+
+def _non_negative(data, name, cast, default):
+    value = data.get(name, default)
+    error = ValueError(f"{name} must be a non-negative number")
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise error
+    try:
+        value = cast(value)
+    except (TypeError, ValueError, OverflowError):
+        raise error
+    if not 0 <= value < float('inf'):  # also rejects NaN
+        raise error
+    return value
+
+
+def parse_wait_options(data):
+    """Extract readiness options from a request body, validating the strategy."""
+    strategy = data.get('wait_until') or DEFAULT_STRATEGY
+    if not isinstance(strategy, str) or strategy.lower() not in STRATEGIES:
+        raise ValueError(f"Unknown wait_until '{strategy}', expected one of {', '.join(STRATEGIES)}")
+    strategy = strategy.lower()
+    selector = data.get('wait_selector')
+    if selector is not None and not isinstance(selector, str):
+        raise ValueError("wait_selector must be a CSS selector string")
+    if strategy == 'selector' and not selector:
+        raise ValueError("wait_until 'selector' requires wait_selector")
+    return {
+        'strategy': strategy,
+        'selector': selector,
+        'timeout': _non_negative(data, 'wait_timeout', float, DEFAULT_TIMEOUT),
+        'idle_ms': _non_negative(data, 'idle_ms', int, DEFAULT_IDLE_MS),
+    }
+
+
+def prepare(driver):
+    """Discard buffered DevTools events so network tracking starts at navigation."""
+    try:
+        driver.get_log('performance')
+    except WebDriverException:
+        pass
+
+
+def wait_until_ready(driver, strategy=DEFAULT_STRATEGY, timeout=DEFAULT_TIMEOUT,
+                     selector=None, idle_ms=DEFAULT_IDLE_MS):
+    """Block until the page satisfies ``strategy`` or ``timeout`` seconds pass.
+
+    Returns True when the page became ready and False when the timeout cap was
+    hit; callers capture whatever has rendered either way.
+    """
+    deadline = time.monotonic() + timeout
+    try:
+        if strategy == 'selector':
+            WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
+            return True
+        if strategy == 'domcontentloaded':
+            return _wait_ready_state(driver, ('interactive', 'complete'), deadline)
+        if not _wait_ready_state(driver, ('complete',), deadline):
+            return False
+        if strategy == 'networkidle':
+            return _wait_network_idle(driver, idle_ms, deadline)
+        if strategy == 'layoutstable':
+            return _wait_layout_stable(driver, idle_ms, deadline)
+        return True
+    except TimeoutException:
+        return False
+
+
+def _wait_ready_state(driver, states, deadline):
+    while time.monotonic() < deadline:
+        if driver.execute_script('return document.readyState') in states:
+            return True
+        time.sleep(POLL_INTERVAL)
+    return False
+
+
+def _wait_network_idle(driver, idle_ms, deadline):
+    """Track in-flight requests from DevTools Network events until none remain for idle_ms."""
+    in_flight = set()
+    idle_since = time.monotonic()
+    while time.monotonic() < deadline:
+        for entry in driver.get_log('performance'):
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, ValueError):
+                continue
+            method = message.get('method')
+            request_id = message.get('params', {}).get('requestId')
+            if method == 'Network.requestWillBeSent':
+                in_flight.add(request_id)
+            elif method in ('Network.loadingFinished', 'Network.loadingFailed'):
+                in_flight.discard(request_id)
+            else:
+                continue
+            idle_since = time.monotonic()
+        if not in_flight and (time.monotonic() - idle_since) * 1000 >= idle_ms:
+            return True
+        time.sleep(POLL_INTERVAL)
+    return False
+
+
+def _wait_layout_stable(driver, idle_ms, deadline):
+    while time.monotonic() < deadline:
+        if driver.execute_script(_LAYOUT_SHIFT_OBSERVER_JS) >= idle_ms:
+            return True
+        time.sleep(POLL_INTERVAL)
+    return False
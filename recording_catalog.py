@@ -0,0 +1,258 @@
+import logging
+import os
+import threading
+import time
+
+from db_connection import LocalConnection
+
+logger = logging.getLogger(__name__)
+
+
+class RecordingCatalog:
+    """SQLite index of finished recordings, so listings never scan the directory."""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS recordings (
+        id TEXT PRIMARY KEY,
+        filename TEXT NOT NULL,
+        url TEXT,
+        mode TEXT,
+        job_id TEXT,
+        size INTEGER NOT NULL,
+        duration REAL,
+        frames INTEGER,
+        created_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS recordings_created ON recordings (created_at);
+    CREATE INDEX IF NOT EXISTS recordings_url ON recordings (url);
+    CREATE INDEX IF NOT EXISTS recordings_job ON recordings (job_id);
+    """
+
+    def __init__(self, path, directory):
+        self.path = path
+        self.directory = directory
+        self._connect = LocalConnection(path)
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def file_path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    def add(self, filename, url=None, mode=None, job_id=None, duration=None, frames=None, created_at=None):
+        """Index a finished recording file and return its catalog entry."""
+        path = self.file_path(filename)
+        recording_id = os.path.splitext(filename)[0]
+        self._connect().execute(
+            "INSERT OR REPLACE INTO recordings (id, filename, url, mode, job_id, size, duration, frames, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (recording_id, filename, url, mode, job_id, os.path.getsize(path), duration, frames,
+             created_at or os.path.getmtime(path)))
+        return self.get(recording_id)
+
+    def get(self, recording_id):
+        row = self._connect().execute("SELECT * FROM recordings WHERE id = ?", (recording_id,)).fetchone()
+        return dict(row) if row else None
+
+    def find_by_job(self, job_id):
+        row = self._connect().execute("SELECT * FROM recordings WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list(self, url=None, mode=None, since=None, until=None, limit=50, offset=0):
+        """Return (entries, total) newest first; ``url`` matches as a substring."""
+        where, params = [], []
+        if url:
+            where.append("url LIKE ? ESCAPE '\\'")
+            params.append('%' + url.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+        if mode:
+            where.append("mode = ?")
+            params.append(mode)
+        if since is not None:
+            where.append("created_at >= ?")
+            params.append(float(since))
+        if until is not None:
+            where.append("created_at < ?")
+            params.append(float(until))
+        clause = (" WHERE " + " AND ".join(where)) if where else ''
+
+        conn = self._connect()
+        total = conn.execute("SELECT COUNT(*) FROM recordings" + clause, params).fetchone()[0]
+        rows = conn.execute("SELECT * FROM recordings" + clause + " ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                            (*params, int(limit), int(offset)))
+        return [dict(row) for row in rows], total
+
+    def totals(self):
+        row = self._connect().execute(
+            "SELECT COUNT(*) AS count, COALESCE(SUM(size), 0) AS bytes, MIN(created_at) AS oldest FROM recordings"
+        ).fetchone()
+        return dict(row)
+
+    def remove(self, recording_id):
+        """Delete a recording's file and its catalog entry."""
+        entry = self.get(recording_id)
+        if entry is None:
+            return False
+        try:
+            os.remove(self.file_path(entry['filename']))
+        except FileNotFoundError:
+            pass
+        self._connect().execute("DELETE FROM recordings WHERE id = ?", (recording_id,))
+        return True
+
+    def oldest(self, before=None, limit=100):
+        query, params = "SELECT * FROM recordings", []
+        if before is not None:
+            query += " WHERE created_at < ?"
+            params.append(before)
+        query += " ORDER BY created_at LIMIT ?"
+        params.append(int(limit))
+        return [dict(row) for row in self._connect().execute(query, params)]
+
+    def reconcile(self, extension='.mp4'):
+        """Bring the catalog in line with the directory after a restart.
+
+        Files nobody indexed (older versions, crashes between encode and
+        insert) are added with what the filesystem knows; entries whose file
+        is gone are dropped. Returns ``(added, removed)``.
+        """
+        on_disk = {entry.name for entry in os.scandir(self.directory)
+                   if entry.is_file() and entry.name.endswith(extension)}
+        known = {row['filename']: row['id'] for row in self._connect().execute("SELECT id, filename FROM recordings")}
+
+        added = 0
+        for filename in on_disk - set(known):
+            try:
+                self.add(filename)
+                added += 1
+            except OSError:
+                pass  # removed while we were scanning
+        removed = set(known) - on_disk
+        for filename in removed:
+            self._connect().execute("DELETE FROM recordings WHERE id = ?", (known[filename],))
+        return added, len(removed)
+
+
+def sweep_directory(directory, max_age=0, max_bytes=0):
+    """Delete files in ``directory`` older than ``max_age`` seconds, then oldest first down to ``max_bytes``.
+
+    Age is taken from the file's mtime. A limit of 0 disables it. Returns
+    ``(deleted, freed_bytes)``.
+    """
+    files = []
+    for entry in os.scandir(directory):
+        try:
+            if entry.is_file():
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            pass
+    files.sort()
+
+    cutoff = time.time() - max_age if max_age > 0 else None
+    total = sum(size for _, size, _ in files)
+    deleted = freed = 0
+    for mtime, size, path in files:
+        if not ((cutoff is not None and mtime < cutoff) or (max_bytes > 0 and total > max_bytes)):
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        else:
+            deleted += 1
+            freed += size
+        total -= size
+    return deleted, freed
+
+
+class RetentionService:
+    """Background thread deleting recordings past ``max_age`` seconds or beyond ``max_bytes`` in total.
+
+    The size quota evicts oldest first. A limit of 0 disables it.
+    ``directories`` lists extra ``(path, max_age, max_bytes)`` quotas swept
+    on the same schedule (e.g. saved screenshots), which need no catalog.
+    """
+
+    def __init__(self, catalog, max_age=86400, max_bytes=0, interval=300, directories=()):
+        self.catalog = catalog
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.directories = list(directories)
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_run = None
+        self.deleted = 0
+        self.freed_bytes = 0
+
+    def start(self):
+        added, removed = self.catalog.reconcile()
+        if added or removed:
+            logger.info(f"Recording catalog reconciled: {added} file(s) indexed, {removed} missing entry(ies) dropped")
+        self._thread = threading.Thread(target=self._loop, name='recording-retention', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.exception(f"Recording retention pass failed: {str(e)}")
+            self._stop.wait(self.interval)
+
+    def run_once(self):
+        """Apply the age limit, then the size quota, then the directory quotas. Returns the number of files deleted."""
+        deleted = 0
+        if self.max_age > 0:
+            cutoff = time.time() - self.max_age
+            while True:
+                expired = self.catalog.oldest(before=cutoff)
+                if not expired:
+                    break
+                for entry in expired:
+                    deleted += self._delete(entry)
+
+        if self.max_bytes > 0:
+            excess = self.catalog.totals()['bytes'] - self.max_bytes
+            while excess > 0:
+                batch = self.catalog.oldest()
+                if not batch:
+                    break
+                for entry in batch:
+                    if excess <= 0:
+                        break
+                    deleted += self._delete(entry)
+                    excess -= entry['size']
+
+        for directory, max_age, max_bytes in self.directories:
+            swept, freed = sweep_directory(directory, max_age, max_bytes)
+            deleted += swept
+            self.deleted += swept
+            self.freed_bytes += freed
+
+        self.last_run = time.time()
+        if deleted:
+            logger.info(f"Recording retention deleted {deleted} recording(s)", extra={'deleted': deleted})
+        return deleted
+
+    def _delete(self, entry):
+        if not self.catalog.remove(entry['id']):
+            return 0
+        self.deleted += 1
+        self.freed_bytes += entry['size']
+        return 1
+
+    def stats(self):
+        totals = self.catalog.totals()
+        totals.update({
+            'max_age': self.max_age,
+            'max_bytes': self.max_bytes,
+            'last_run': self.last_run,
+            'deleted': self.deleted,
+            'freed_bytes': self.freed_bytes,
+        })
+        return totals
@@ -0,0 +1,127 @@
+import threading
+import time
+import uuid
+
+
+class RecordingLimitReached(Exception):
+    """Raised when starting a recording would exceed the concurrency cap."""
+
+
+class RecordingJob:
+    """One recording: its own browser, writer thread and output path."""
+
+    def __init__(self, url, duration, output_file, job_id=None, mode='screenshot'):
+        self.job_id = job_id or uuid.uuid4().hex
+        self.url = url
+        self.duration = duration
+        self.mode = mode
+        self.output_file = output_file
+        self.driver = None
+        self.thread = None
+        self.status = 'starting'  # starting -> recording -> encoding -> completed | failed
+        self.error = None
+        self.completed_file = None
+        self.frame_count = 0
+        self.fps = 0.0  # unique frames captured per second of wall-clock time
+        self.pipeline = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    @property
+    def active(self):
+        return self.status in ('starting', 'recording', 'encoding')
+
+    def to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'url': self.url,
+            'duration': self.duration,
+            'mode': self.mode,
+            'status': self.status,
+            'error': self.error,
+            'frames': self.frame_count,
+            'fps': round(self.fps, 2),
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+            'pipeline': self.pipeline.stats() if self.pipeline else None,
+        }
+
+
+class RecordingJobManager:
+    """Thread-safe registry of recording jobs with a concurrency cap.
+
+    ``on_discard(job_id)`` is called once a job has finished and again if it
+    is pruned from history, so per-job state kept elsewhere can be dropped.
+    """
+
+    def __init__(self, max_concurrent=4, history=100, on_discard=None):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.history = history
+        self.on_discard = on_discard
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, url, duration, output_file_for, mode='screenshot'):
+        """Reserve a slot and register a new job.
+
+        ``output_file_for`` maps the new job ID to its output path.
+        """
+        with self._lock:
+            active = sum(1 for job in self._jobs.values() if job.active)
+            if active >= self.max_concurrent:
+                raise RecordingLimitReached(
+                    f"Maximum of {self.max_concurrent} concurrent recordings reached")
+            job_id = uuid.uuid4().hex
+            job = RecordingJob(url, duration, output_file_for(job_id), job_id=job_id, mode=mode)
+            self._jobs[job.job_id] = job
+            pruned = self._prune()
+        for pruned_id in pruned:
+            self._discard(pruned_id)
+        return job
+
+    def start(self, job, target):
+        """Run ``target(job)`` on the job's own writer thread."""
+        job.status = 'recording'
+        job.thread = threading.Thread(target=target, args=(job,), name=f"recording-{job.job_id[:8]}", daemon=True)
+        job.thread.start()
+
+    def finish(self, job, status, error=None):
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        self._discard(job.job_id)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def latest(self):
+        """Most recently created job, for clients that do not send a job ID."""
+        with self._lock:
+            if not self._jobs:
+                return None
+            return max(self._jobs.values(), key=lambda job: job.created_at)
+
+    def remove(self, job_id):
+        with self._lock:
+            return self._jobs.pop(job_id, None)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def active_count(self):
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.active)
+
+    def _prune(self):
+        finished = sorted((job for job in self._jobs.values() if not job.active),
+                          key=lambda job: job.created_at)
+        pruned = [job.job_id for job in finished[:max(0, len(finished) - self.history)]]
+        for job_id in pruned:
+            del self._jobs[job_id]
+        return pruned
+
+    def _discard(self, job_id):
+        if self.on_discard:
+            self.on_discard(job_id)
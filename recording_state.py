@@ -1,34 +1,176 @@
 import os
 import json
 import time
+import tempfile
+import threading
 
-STATE_FILE = 'recording_state.json'
+try:
+    import fcntl
+except ImportError:  # Windows: atomic replace still applies, just without the inter-process lock
+    fcntl = None
 
-def get_state():
-    """Get the current recording state."""
-    if os.path.exists(STATE_FILE):
+# 'memory' (default, single process) or 'file' (shared between worker processes)
+STATE_BACKEND = os.environ.get('RECORDING_STATE_BACKEND', 'memory')
+STATE_FILE = os.environ.get('RECORDING_STATE_FILE', 'recording_state.json')
+# How often the file backend re-reads the file while waiting on another process
+FILE_POLL_INTERVAL = 0.1
+
+_IDLE = {'is_recording': False, 'timestamp': 0}
+
+
+class MemoryStateBackend:
+    """Lock-protected in-process store; waiters are woken by a condition variable."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._cond = threading.Condition()
+
+    def get(self, job_id):
+        with self._cond:
+            return dict(self._jobs.get(job_id, _IDLE))
+
+    def all(self):
+        with self._cond:
+            return {job_id: dict(state) for job_id, state in self._jobs.items()}
+
+    def set(self, job_id, is_recording):
+        with self._cond:
+            self._jobs[job_id] = {'is_recording': is_recording, 'timestamp': time.time()}
+            self._cond.notify_all()
+
+    def clear(self, job_id=None):
+        with self._cond:
+            if job_id is None:
+                self._jobs.clear()
+            else:
+                self._jobs.pop(job_id, None)
+            self._cond.notify_all()
+
+    def wait_for_stop(self, job_id, timeout):
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not self._jobs.get(job_id, _IDLE)['is_recording'], timeout)
+
+
+class FileStateBackend:
+    """JSON file shared between processes, written atomically under a file lock."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock_path = path + '.lock'
+        self._local = threading.Condition()
+
+    def _locked(self, fn):
+        with self._local:
+            with open(self._lock_path, 'a') as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    return fn()
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self):
         try:
-            with open(STATE_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            return {'is_recording': False, 'timestamp': 0}
-    return {'is_recording': False, 'timestamp': 0}
-
-def set_state(is_recording):
-    """Set the current recording state."""
-    state = {
-        'is_recording': is_recording,
-        'timestamp': time.time()
-    }
-    with open(STATE_FILE, 'w') as f:
-        json.dump(state, f)
-
-def is_recording():
-    """Check if a recording is in progress."""
-    state = get_state()
-    return state['is_recording']
-
-def clear_state():
-    """Clear the recording state."""
-    if os.path.exists(STATE_FILE):
-        os.remove(STATE_FILE) 
\ No newline at end of file
+            with open(self.path, 'r') as f:
+                state = json.load(f)
+            if isinstance(state.get('jobs'), dict):
+                return state
+        except (OSError, ValueError):
+            pass
+        return {'jobs': {}}
+
+    def _save(self, state):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.recording_state.')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def get(self, job_id):
+        # os.replace makes writes atomic, so readers never need the lock
+        return dict(self._load()['jobs'].get(job_id, _IDLE))
+
+    def all(self):
+        return self._load()['jobs']
+
+    def set(self, job_id, is_recording):
+        def update():
+            state = self._load()
+            state['jobs'][job_id] = {'is_recording': is_recording, 'timestamp': time.time()}
+            self._save(state)
+        self._locked(update)
+        with self._local:
+            self._local.notify_all()
+
+    def clear(self, job_id=None):
+        def update():
+            state = self._load()
+            if job_id is None:
+                state['jobs'].clear()
+            else:
+                state['jobs'].pop(job_id, None)
+            self._save(state)
+        self._locked(update)
+        with self._local:
+            self._local.notify_all()
+
+    def wait_for_stop(self, job_id, timeout):
+        # Same-process stops wake us immediately; other processes are picked up by polling
+        deadline = time.monotonic() + timeout
+        while True:
+            if not self.get(job_id)['is_recording']:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            with self._local:
+                self._local.wait(min(remaining, FILE_POLL_INTERVAL))
+
+
+def create_backend(name=STATE_BACKEND):
+    if name == 'memory':
+        return MemoryStateBackend()
+    if name == 'file':
+        return FileStateBackend(STATE_FILE)
+    raise ValueError(f"Unknown RECORDING_STATE_BACKEND '{name}', expected 'memory' or 'file'")
+
+
+_backend = create_backend()
+
+
+def get_state(job_id=None):
+    """Get the recording state of one job, or of every job when job_id is None."""
+    if job_id is None:
+        return _backend.all()
+    return _backend.get(job_id)
+
+
+def set_state(is_recording, job_id):
+    """Set the recording state of a job."""
+    _backend.set(job_id, is_recording)
+
+
+def is_recording(job_id=None):
+    """Check if a job (or any job, when job_id is None) is recording."""
+    if job_id is None:
+        return any(job['is_recording'] for job in get_state().values())
+    return get_state(job_id)['is_recording']
+
+
+def clear_state(job_id=None):
+    """Clear the state of one job, or of every job when job_id is None."""
+    _backend.clear(job_id)
+
+
+def wait_for_stop(job_id, timeout):
+    """Block until the job stops recording or timeout seconds pass.
+
+    Returns True if the job is no longer recording.
+    """
+    return _backend.wait_for_stop(job_id, timeout)
@@ -0,0 +1,60 @@
+import base64
+import json
+
+from selenium.common.exceptions import WebDriverException
+
+
+class ScreencastSource:
+    """Push-based JPEG frames from Chrome's ``Page.startScreencast``.
+
+    Chrome emits a ``Page.screencastFrame`` event whenever the page repaints.
+    ChromeDriver surfaces those events through the performance log (enabled in
+    ``setup_driver``), so each ``poll`` drains the log, acknowledges every frame
+    so Chrome keeps sending them, and returns ``(timestamp, jpeg_bytes)`` pairs
+    stamped with the browser's own capture time.
+    """
+
+    def __init__(self, driver, width, height, quality=80):
+        self.driver = driver
+        self.width = width
+        self.height = height
+        self.quality = quality
+        self.started = False
+
+    def start(self):
+        try:
+            self.driver.get_log('performance')  # drop navigation events
+        except WebDriverException:
+            pass
+        self.driver.execute_cdp_cmd('Page.startScreencast', {
+            'format': 'jpeg',
+            'quality': self.quality,
+            'maxWidth': self.width,
+            'maxHeight': self.height,
+            'everyNthFrame': 1,
+        })
+        self.started = True
+
+    def poll(self):
+        """Return the frames Chrome pushed since the last poll, oldest first."""
+        frames = []
+        for entry in self.driver.get_log('performance'):
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, ValueError):
+                continue
+            if message.get('method') != 'Page.screencastFrame':
+                continue
+            params = message['params']
+            self.driver.execute_cdp_cmd('Page.screencastFrameAck', {'sessionId': params['sessionId']})
+            frames.append((params['metadata']['timestamp'], base64.b64decode(params['data'])))
+        return frames
+
+    def stop(self):
+        if not self.started:
+            return
+        self.started = False
+        try:
+            self.driver.execute_cdp_cmd('Page.stopScreencast', {})
+        except WebDriverException:
+            pass
@@ -1,35 +1,124 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, send_file, url_for, abort, Response, stream_with_context
 from flask_cors import CORS
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.chrome.options import Options
-import io
-from PIL import Image
 import base64
 import os
+import math
 import cv2
 import numpy as np
 import time
 from datetime import datetime
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import threading
-import subprocess
 import re
-from recording_state import get_state, set_state, is_recording, clear_state
+import uuid
+import json
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from recording_state import get_state, set_state, is_recording, clear_state, wait_for_stop, STATE_BACKEND
+from browser_pool import BrowserPool, PoolTimeout
+from driver_binary import get_driver_path
+import readiness
+from recording_jobs import RecordingJobManager, RecordingLimitReached
+from screencast import ScreencastSource
+from video_encoder import FFmpegWriter
+from frame_pipeline import FramePipeline
+from frame_dedup import FrameDeduper
+from task_queue import TaskStore, TaskScheduler, TaskDeferred, TASK_STATUSES
+from events import EventBus, SQLiteEventBus, TERMINAL_EVENTS
+from recording_catalog import RecordingCatalog, RetentionService
+from page_capture import parse_region_options, capture_page
+import image_output
+import browser_profiles
+from capture_cache import ScreenshotCache, CacheEntry, parse_cache_control, make_key as make_cache_key
+from metrics import REGISTRY, Counter, Gauge, Histogram
+from log_config import configure_logging, request_id_var
+
+configure_logging()
+logger = logging.getLogger('server')
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
 
+# Development server port, and whether to run it with the debugger and reloader
+PORT = int(os.environ.get('PORT', 5001))
+DEBUG = os.environ.get('FLASK_DEBUG', '1') == '1'
+
 # Directory to save recordings
 RECORDINGS_DIR = 'recordings'
 if not os.path.exists(RECORDINGS_DIR):
     os.makedirs(RECORDINGS_DIR)
 
-driver = None
-output_file = None
+# Recording catalog and retention: recordings older than MAX_AGE seconds, or beyond
+# MAX_BYTES in total (oldest first), are deleted every INTERVAL seconds; 0 disables a limit
+RECORDING_CATALOG_PATH = os.environ.get('RECORDING_CATALOG_PATH', 'recordings.db')
+RECORDING_RETENTION_MAX_AGE = float(os.environ.get('RECORDING_RETENTION_MAX_AGE', 86400))
+RECORDING_RETENTION_MAX_BYTES = int(os.environ.get('RECORDING_RETENTION_MAX_BYTES', 10 * 1024 ** 3))
+RECORDING_RETENTION_INTERVAL = float(os.environ.get('RECORDING_RETENTION_INTERVAL', 300))
+
+# Directory to save screenshots served from /screenshots/<id>
+SCREENSHOTS_DIR = os.environ.get('SCREENSHOTS_DIR', 'screenshots')
+os.makedirs(SCREENSHOTS_DIR, exist_ok=True)
+# Saved screenshots are swept with the recordings: older than MAX_AGE seconds, or oldest first beyond MAX_BYTES
+SCREENSHOT_RETENTION_MAX_AGE = float(os.environ.get('SCREENSHOT_RETENTION_MAX_AGE', 86400))
+SCREENSHOT_RETENTION_MAX_BYTES = int(os.environ.get('SCREENSHOT_RETENTION_MAX_BYTES', 1024 ** 3))
+
+# Recording and screenshot IDs are file stems; anything else could escape the directory
+MEDIA_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+
+# Warm browser pool used by /capture
+BROWSER_POOL_SIZE = int(os.environ.get('BROWSER_POOL_SIZE', 2))
+BROWSER_POOL_MAX_USES = int(os.environ.get('BROWSER_POOL_MAX_USES', 50))
+BROWSER_POOL_ACQUIRE_TIMEOUT = float(os.environ.get('BROWSER_POOL_ACQUIRE_TIMEOUT', 30))
+
+# Browser viewport in CSS pixels, matching --window-size in setup_driver
+VIEWPORT_WIDTH, VIEWPORT_HEIGHT = 1366, 768
+VIEWPORT = f'{VIEWPORT_WIDTH}x{VIEWPORT_HEIGHT}'
+
+# Full-page and region captures taller than this (CSS pixels) are cut off and flagged as truncated
+MAX_CAPTURE_HEIGHT = int(os.environ.get('MAX_CAPTURE_HEIGHT', 20000))
+# Largest capture in device pixels (width x height x scale²); ~150 MB as a decoded BGR image
+MAX_CAPTURE_PIXELS = int(os.environ.get('MAX_CAPTURE_PIXELS', 50_000_000))
+
+# Screenshot cache in front of /capture
+CAPTURE_CACHE_TTL = int(os.environ.get('CAPTURE_CACHE_TTL', 300))
+CAPTURE_CACHE_MAX_ENTRIES = int(os.environ.get('CAPTURE_CACHE_MAX_ENTRIES', 256))
+CAPTURE_CACHE_MAX_BYTES = int(os.environ.get('CAPTURE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+CAPTURE_CACHE_DISK_DIR = os.environ.get('CAPTURE_CACHE_DISK_DIR')  # unset keeps the cache in memory only
+CAPTURE_CACHE_DISK_MAX_BYTES = int(os.environ.get('CAPTURE_CACHE_DISK_MAX_BYTES', 1024 ** 3))
+
+# Batch captures: URLs rendered in parallel (shared by all batches) and per-batch limit
+BATCH_CAPTURE_WORKERS = int(os.environ.get('BATCH_CAPTURE_WORKERS', BROWSER_POOL_SIZE))
+BATCH_MAX_URLS = int(os.environ.get('BATCH_MAX_URLS', 500))
+
+# Asynchronous task queue: persistent backlog, worker threads and per-site concurrency
+TASK_DB_PATH = os.environ.get('TASK_DB_PATH', 'tasks.db')
+TASK_WORKERS = int(os.environ.get('TASK_WORKERS', 2))
+TASK_PER_HOST_LIMIT = int(os.environ.get('TASK_PER_HOST_LIMIT', 2))
+
+# Recording progress push channel
+SSE_HEARTBEAT_INTERVAL = 15
+LONG_POLL_TIMEOUT = 25
+# Event log shared by worker processes, used with the file state backend (multi-worker deployments)
+RECORDING_EVENTS_DB = os.environ.get('RECORDING_EVENTS_DB', 'recording_events.db')
+
+# Upper bound on simultaneous recordings, each holding its own Chrome instance
+MAX_CONCURRENT_RECORDINGS = int(os.environ.get('MAX_CONCURRENT_RECORDINGS', 4))
+# Seconds /stop-recording waits for a job to finish encoding its file
+RECORDING_STOP_TIMEOUT = float(os.environ.get('RECORDING_STOP_TIMEOUT', 90))
+# Output frame rate of recordings
+RECORDING_FPS = 20.0
+RECORDING_MODES = ('screenshot', 'screencast')
+# How often the screencast loop drains frames Chrome has pushed
+SCREENCAST_POLL_INTERVAL = 0.02
+# Recording pipeline: decode/resize workers, pending-frame queue and overload policies
+RECORDING_PROCESS_WORKERS = int(os.environ.get('RECORDING_PROCESS_WORKERS', 2))
+RECORDING_QUEUE_SIZE = int(os.environ.get('RECORDING_QUEUE_SIZE', 8))
+RECORDING_DROP_POLICY = os.environ.get('RECORDING_DROP_POLICY', 'drop_oldest')
+RECORDING_FILL_POLICY = os.environ.get('RECORDING_FILL_POLICY', 'duplicate')
+# Skip frames identical to, or within this mean pixel difference (0-255) of, the previous one; negative disables
+RECORDING_DEDUP_THRESHOLD = float(os.environ.get('RECORDING_DEDUP_THRESHOLD', 1.0))
 
 
 def is_valid_url(url):
@@ -42,6 +131,25 @@ def is_valid_url(url):
     return url
 
 
+def wants_base64(data):
+    """Whether the client opted in to an inline base64 payload instead of a download URL."""
+    flag = data.get('include_base64', request.args.get('base64', ''))
+    return flag is True or str(flag).lower() in ('1', 'true', 'yes')
+
+
+def send_media(directory, media_id, extension, mimetype):
+    """Stream a stored file with Range, ETag and Last-Modified support."""
+    if not MEDIA_ID_PATTERN.match(media_id):
+        abort(404)
+    path = os.path.join(os.path.abspath(directory), media_id + extension)
+    if not os.path.isfile(path):
+        abort(404)
+    # conditional=True answers Range and If-None-Match/If-Modified-Since requests;
+    # the file is passed to the server's wsgi.file_wrapper, which uses sendfile where available
+    return send_file(path, mimetype=mimetype, conditional=True, etag=True,
+                     download_name=media_id + extension, max_age=3600)
+
+
 def setup_driver():
     """Initialize Selenium WebDriver with Chrome options."""
     options = Options()
@@ -63,21 +171,199 @@ def setup_driver():
     options.add_experimental_option('useAutomationExtension', False)
     options.add_argument('--disable-web-security')
     options.add_argument('--disable-features=IsolateOrigins,site-per-process')
+    # Return from driver.get at DOMContentLoaded; the readiness engine decides how long to wait after that
+    options.page_load_strategy = 'eager'
+    # Expose DevTools Network/Page events for network-idle detection
+    options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
 
     try:
-        service = Service(ChromeDriverManager().install())
+        service = Service(get_driver_path())
         driver = webdriver.Chrome(service=service, options=options)
         driver.set_page_load_timeout(60)  # Increased timeout
         return driver
     except Exception as e:
-        print(f"Error setting up ChromeDriver: {str(e)}")
+        logger.error(f"Error setting up ChromeDriver: {str(e)}")
         raise
 
 
+browser_pool = BrowserPool(
+    setup_driver,
+    size=BROWSER_POOL_SIZE,
+    max_uses=BROWSER_POOL_MAX_USES,
+    acquire_timeout=BROWSER_POOL_ACQUIRE_TIMEOUT,
+    reset_hooks=[browser_profiles.reset],
+)
+
+screenshot_cache = ScreenshotCache(
+    ttl=CAPTURE_CACHE_TTL,
+    max_entries=CAPTURE_CACHE_MAX_ENTRIES,
+    max_bytes=CAPTURE_CACHE_MAX_BYTES,
+    disk_dir=CAPTURE_CACHE_DISK_DIR,
+    disk_max_bytes=CAPTURE_CACHE_DISK_MAX_BYTES,
+)
+
+# Threads that drive pooled browsers for /capture/batch; the pool itself caps live browsers
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_CAPTURE_WORKERS, thread_name_prefix='batch-capture')
+
+# A finished job's state entry is dropped; its file is found through the catalog
+recording_jobs = RecordingJobManager(max_concurrent=MAX_CONCURRENT_RECORDINGS, on_discard=clear_state)
+# Any worker can then stream a job's events, not only the one recording it
+event_bus = SQLiteEventBus(RECORDING_EVENTS_DB) if STATE_BACKEND == 'file' else EventBus()
+
+recording_catalog = RecordingCatalog(RECORDING_CATALOG_PATH, RECORDINGS_DIR)
+retention_service = RetentionService(
+    recording_catalog,
+    max_age=RECORDING_RETENTION_MAX_AGE,
+    max_bytes=RECORDING_RETENTION_MAX_BYTES,
+    interval=RECORDING_RETENTION_INTERVAL,
+    directories=[(SCREENSHOTS_DIR, SCREENSHOT_RETENTION_MAX_AGE, SCREENSHOT_RETENTION_MAX_BYTES)],
+)
+
+# ---------------------------------------------------------------------- #
+# Metrics (per process), exposed on /metrics
+# ---------------------------------------------------------------------- #
+HTTP_REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'HTTP request latency',
+                                 ['method', 'endpoint', 'status'])
+CAPTURE_STAGE_SECONDS = Histogram('capture_stage_duration_seconds',
+                                  'Time spent in each stage of a screenshot capture', ['stage'])
+CAPTURES = Counter('captures_total', 'Screenshot captures by outcome', ['result'])
+RECORDING_STAGE_SECONDS = Histogram('recording_stage_duration_seconds',
+                                    'Time spent in each stage of a recording (per frame for grab/process/write)',
+                                    ['stage'])
+RECORDING_FPS_ACHIEVED = Histogram('recording_fps', 'Capture frame rate achieved per recording', [],
+                                   buckets=(1, 2, 5, 10, 15, 20, 25, 30, 60))
+RECORDING_FRAMES = Counter('recording_frames_total', 'Recording frames by fate', ['kind'])
+RECORDINGS = Counter('recordings_total', 'Finished recording jobs by outcome', ['status'])
+
+Gauge('browser_pool_sessions', 'Pooled browser sessions by state', ['state'],
+      callback=lambda: {(state,): browser_pool.stats()[state] for state in ('idle', 'in_use')})
+Gauge('browser_pool_checkouts', 'Browser checkouts since start', callback=lambda: browser_pool.stats()['checkouts'])
+Gauge('screenshot_cache_entries', 'Screenshots held in memory', callback=lambda: screenshot_cache.stats()['entries'])
+Gauge('screenshot_cache_bytes', 'Memory used by cached screenshots', callback=lambda: screenshot_cache.stats()['bytes'])
+Gauge('screenshot_cache_lookups', 'Screenshot cache lookups since start by result', ['result'],
+      callback=lambda: {(result,): screenshot_cache.stats()[result]
+                        for result in ('hits_memory', 'hits_disk', 'misses')})
+Gauge('task_queue_tasks', 'Queued tasks by status', ['status'],
+      callback=lambda: {(status,): task_scheduler.store.counts().get(status, 0) for status in TASK_STATUSES})
+Gauge('recording_jobs_active', 'Recording jobs currently running', callback=lambda: recording_jobs.active_count())
+Gauge('recordings_stored_bytes', 'Size of catalogued recordings on disk',
+      callback=lambda: recording_catalog.totals()['bytes'])
+
+
+@app.before_request
+def assign_request_id():
+    """Tag the request (and every log line it produces) with an ID, reusing the client's X-Request-ID."""
+    request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+    request.environ['request_id'] = request_id
+    request.environ['request_started'] = time.perf_counter()
+    request_id_var.set(request_id)
+
+
+@app.after_request
+def record_request(response):
+    elapsed = time.perf_counter() - request.environ.get('request_started', time.perf_counter())
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    HTTP_REQUEST_SECONDS.observe(elapsed, method=request.method, endpoint=endpoint, status=response.status_code)
+    response.headers['X-Request-ID'] = request.environ.get('request_id', '')
+    logger.info(f"{request.method} {request.path} {response.status_code}",
+                extra={'status': response.status_code, 'duration_ms': round(elapsed * 1000, 1)})
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus text exposition of this process's metrics."""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+
+def capture_options(data):
+    """Rendering options of a capture request; all of them are part of the cache key."""
+    return {
+        'wait': readiness.parse_wait_options(data),
+        'resources': browser_profiles.parse_resource_options(data),
+        'region': parse_region_options(data, MAX_CAPTURE_HEIGHT, MAX_CAPTURE_PIXELS),
+        'viewport': VIEWPORT,
+        'output': image_output.parse_output_options(data),
+    }
+
+
+def render_screenshot(url, options):
+    """Load the URL in a pooled browser and return (image bytes, mimetype, metadata)."""
+    wait, output = options['wait'], options['output']
+    acquire_started = time.perf_counter()
+    with browser_pool.session() as driver:
+        CAPTURE_STAGE_SECONDS.observe(time.perf_counter() - acquire_started, stage='pool_acquire')
+        if output['device_scale_factor'] != 1.0:
+            # Cleared again by the pool when the driver is returned
+            driver.execute_cdp_cmd('Emulation.setDeviceMetricsOverride', {
+                'width': VIEWPORT_WIDTH, 'height': VIEWPORT_HEIGHT,
+                'deviceScaleFactor': output['device_scale_factor'], 'mobile': False,
+            })
+        # Blocked URLs and animation settings are undone by the pool when the driver is returned
+        browser_profiles.apply(driver, options['resources'])
+        readiness.prepare(driver)
+        with CAPTURE_STAGE_SECONDS.time(stage='page_load'):
+            driver.get(url)
+
+        # Wait only as long as the requested readiness strategy needs
+        with CAPTURE_STAGE_SECONDS.time(stage='readiness'):
+            ready = readiness.wait_until_ready(driver, **wait)
+        if not ready:
+            logger.warning(f"Page not ready after {wait['timeout']}s ({wait['strategy']}), capturing anyway: {url}")
+
+        # Chrome encodes the requested format directly; only tiled captures and AVIF are re-encoded here
+        with CAPTURE_STAGE_SECONDS.time(stage='screenshot'):
+            screenshot, truncated = capture_page(driver, options['region'], output)
+
+    with CAPTURE_STAGE_SECONDS.time(stage='encode'):
+        data = image_output.encode(screenshot, output)
+    return data, image_output.MIMETYPES[output['format']], {'truncated': truncated, 'format': output['format']}
+
+
+def save_screenshot(screenshot_id, data, image_format='jpeg'):
+    """Write a screenshot for /screenshots/<id>, unless it is already on disk."""
+    path = os.path.join(SCREENSHOTS_DIR, screenshot_id + image_output.EXTENSIONS[image_format])
+    if not os.path.exists(path):
+        with open(path, 'wb') as f:
+            f.write(data)
+
+
+def perform_capture(url, options, cache_control=None):
+    """Return (entry, cached) for a capture, rendering only on a cache miss.
+
+    ``cache_control`` is the request's Cache-Control header: ``no-cache``
+    forces a fresh render, ``no-store`` keeps the result out of the cache and
+    ``max-age`` bounds the age of an acceptable cached screenshot.
+    """
+    max_age, no_cache, no_store = parse_cache_control(cache_control)
+    key = make_cache_key(url, options)
+
+    entry = None if no_cache else screenshot_cache.get(key, max_age=max_age)
+    cached = entry is not None
+    if not cached:
+        try:
+            with CAPTURE_STAGE_SECONDS.time(stage='render'):
+                data, mimetype, meta = render_screenshot(url, options)
+        except Exception:
+            CAPTURES.inc(result='error')
+            raise
+        entry = CacheEntry(data, mimetype, dict(meta, id=uuid.uuid4().hex))
+        if not no_store:
+            screenshot_cache.put(key, entry)
+
+    # Cached entries outlive their files if screenshots are cleaned up, so restore on demand
+    with CAPTURE_STAGE_SECONDS.time(stage='save'):
+        save_screenshot(entry.meta['id'], entry.data, entry.meta.get('format', 'jpeg'))
+    CAPTURES.inc(result='hit' if cached else 'miss')
+    return entry, cached
+
+
 @app.route('/capture', methods=['POST'])
 def capture_screenshot():
-    """Capture a screenshot of the given URL."""
-    driver = None
+    """Capture a screenshot of the given URL.
+
+    With ``"async": true`` the capture is queued as a task and 202 is returned at once.
+    """
     try:
         data = request.get_json()
         url = is_valid_url(data.get('url', ''))
@@ -85,180 +371,402 @@ def capture_screenshot():
         if not url:
             return jsonify({'error': 'Invalid URL format'}), 400
 
-        driver = setup_driver()
-        driver.get(url)
+        try:
+            options = capture_options(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        if data.get('async'):
+            payload = dict(data, cache_control=request.headers.get('Cache-Control'))
+            return submit_task('capture', payload)
+
+        entry, cached = perform_capture(url, options, request.headers.get('Cache-Control'))
+
+        screenshot_id = entry.meta['id']
+        result = {
+            'id': screenshot_id,
+            'url': url_for('download_screenshot', screenshot_id=screenshot_id, _external=True),
+            'size': len(entry.data),
+            'format': entry.meta.get('format', 'jpeg'),
+            'cached': cached,
+            'truncated': entry.meta.get('truncated', False),
+        }
+        if wants_base64(data):
+            with CAPTURE_STAGE_SECONDS.time(stage='base64'):
+                result['base64'] = base64.b64encode(entry.data).decode('utf-8')
+
+        response = jsonify(result)
+        response.headers['X-Cache'] = 'HIT' if cached else 'MISS'
+        response.headers['Age'] = str(int(entry.age))
+        return response
+
+    except PoolTimeout as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 
-        # Wait for the page to load
-        WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-        time.sleep(2)  # Additional wait for dynamic content
+@app.route('/capture/batch', methods=['POST'])
+def capture_batch():
+    """Capture many URLs in parallel, streaming one NDJSON result line per URL as it finishes.
 
-        screenshot = driver.get_screenshot_as_png()
-        image = Image.open(io.BytesIO(screenshot))
-        img_io = io.BytesIO()
-        image.convert('RGB').save(img_io, 'JPEG', quality=80)
-        img_io.seek(0)
-        base64_image = base64.b64encode(img_io.getvalue()).decode('utf-8')
+    A final line with a ``summary`` key reports totals. Failures are reported
+    per URL and never abort the rest of the batch.
+    """
+    data = request.get_json(silent=True) or {}
+    urls = data.get('urls')
+    if not isinstance(urls, list) or not urls:
+        return jsonify({'error': "'urls' must be a non-empty list"}), 400
+    if len(urls) > BATCH_MAX_URLS:
+        return jsonify({'error': f'At most {BATCH_MAX_URLS} URLs per batch'}), 400
+
+    try:
+        options = capture_options(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    cache_control = request.headers.get('Cache-Control')
+    include_base64 = wants_base64(data)
+
+    def capture_one(index, raw_url):
+        started = time.time()
+        result = {'index': index, 'url': raw_url}
+        try:
+            url = is_valid_url(raw_url if isinstance(raw_url, str) else '')
+            if not url:
+                raise ValueError('Invalid URL format')
+            entry, cached = perform_capture(url, options, cache_control)
+            result.update({
+                'ok': True,
+                'id': entry.meta['id'],
+                'size': len(entry.data),
+                'format': entry.meta.get('format', 'jpeg'),
+                'cached': cached,
+            })
+            if include_base64:
+                result['base64'] = base64.b64encode(entry.data).decode('utf-8')
+        except Exception as e:
+            result.update({'ok': False, 'error': str(e)})
+        result['elapsed_ms'] = round((time.time() - started) * 1000, 1)
+        return result
+
+    def generate():
+        started = time.time()
+        # copy_context carries the request ID into the worker threads' log lines
+        futures = [batch_executor.submit(contextvars.copy_context().run, capture_one, i, u)
+                   for i, u in enumerate(urls)]
+        succeeded = 0
+        try:
+            for future in as_completed(futures):
+                result = future.result()
+                if result['ok']:
+                    succeeded += 1
+                    result['download_url'] = url_for('download_screenshot', screenshot_id=result['id'], _external=True)
+                yield json.dumps(result) + '\n'
+        finally:
+            # The client went away: don't keep rendering pages nobody will read
+            for future in futures:
+                future.cancel()
+        yield json.dumps({'summary': {
+            'total': len(urls),
+            'succeeded': succeeded,
+            'failed': len(urls) - succeeded,
+            'elapsed_ms': round((time.time() - started) * 1000, 1),
+        }}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@app.route('/screenshots/<screenshot_id>', methods=['GET'])
+def download_screenshot(screenshot_id):
+    """Stream a stored screenshot in whichever format it was captured."""
+    if MEDIA_ID_PATTERN.match(screenshot_id):
+        for image_format, extension in image_output.EXTENSIONS.items():
+            if os.path.isfile(os.path.join(SCREENSHOTS_DIR, screenshot_id + extension)):
+                return send_media(SCREENSHOTS_DIR, screenshot_id, extension, image_output.MIMETYPES[image_format])
+    abort(404)
+
+
+@app.route('/pool-stats', methods=['GET'])
+def get_pool_stats():
+    """Report browser pool occupancy and checkout wait times."""
+    return jsonify(browser_pool.stats())
+
+
+@app.route('/cache-stats', methods=['GET'])
+def get_cache_stats():
+    """Report screenshot cache hit/miss counts and occupancy."""
+    return jsonify(screenshot_cache.stats())
+
+
+def recording_output_file(job_id):
+    """Path of the MP4 a recording job writes to."""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return os.path.join(RECORDINGS_DIR, f'recording_{timestamp}_{job_id[:8]}.mp4')
+
+
+def parse_recording_request(data):
+    """Validate a recording request, returning (url, duration, mode, wait options)."""
+    url = is_valid_url(data.get('url', ''))
+    duration = int(data.get('duration', 5))  # Changed default to 5 seconds
+    mode = data.get('mode', 'screenshot')
+
+    if not url:
+        raise ValueError('Invalid URL')
+    if mode not in RECORDING_MODES:
+        raise ValueError(f"Invalid mode '{mode}', expected one of {', '.join(RECORDING_MODES)}")
+    return url, duration, mode, readiness.parse_wait_options(data)
+
+
+def launch_recording(url, duration, mode, wait):
+    """Open the page in a fresh browser and start a recording job on its own thread."""
+    job = recording_jobs.create(url, duration, recording_output_file, mode=mode)
+
+    try:
+        logger.info(f"Starting recording job {job.job_id} for URL: {url}, duration: {duration}, mode: {mode}",
+                    extra={'job_id': job.job_id})
+
+        # Ensure the recordings directory exists
+        os.makedirs(RECORDINGS_DIR, exist_ok=True)
 
-        return jsonify({'base64': base64_image})
+        with RECORDING_STAGE_SECONDS.time(stage='driver_start'):
+            job.driver = setup_driver()
+        readiness.prepare(job.driver)
+        with RECORDING_STAGE_SECONDS.time(stage='page_load'):
+            job.driver.get(url)
+
+        with RECORDING_STAGE_SECONDS.time(stage='readiness'):
+            ready = readiness.wait_until_ready(job.driver, **wait)
+        if not ready:
+            logger.warning(f"Page not ready after {wait['timeout']}s ({wait['strategy']}), recording anyway: {url}",
+                           extra={'job_id': job.job_id})
+
+        set_state(True, job.job_id)
+        event_bus.publish(job.job_id, 'started', url=url, duration=duration, mode=mode)
+        recording_jobs.start(job, record_screen)
+        return job
 
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
-    finally:
-        if driver:
-            driver.quit()
+        # Clean up on error
+        if job.driver:
+            try: job.driver.quit()
+            except: pass
+            job.driver = None
+        recording_jobs.finish(job, 'failed', str(e))
+        clear_state(job.job_id)
+        event_bus.publish(job.job_id, 'failed', error=str(e))
+        raise
 
 
 @app.route('/start-recording', methods=['POST'])
 def start_recording():
-    """Start screen recording for a specified duration."""
-    global driver, output_file
+    """Start a screen recording job for a specified duration.
 
+    With ``"async": true`` the job is queued as a task and 202 is returned at once.
+    """
     try:
-        # Always clean up any existing recording first
-        if driver:
-            driver.quit()
-            driver = None
-        output_file = None
-        clear_state()
-        time.sleep(1)  # Wait for cleanup
-
         data = request.get_json()
-        url = is_valid_url(data.get('url', ''))
-        duration = int(data.get('duration', 5))  # Changed default to 5 seconds
 
-        if not url:
-            return jsonify({'error': 'Invalid URL'}), 400
+        try:
+            url, duration, mode, wait = parse_recording_request(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
-        print(f"Starting new recording for URL: {url}, duration: {duration}")
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        output_file = os.path.join(RECORDINGS_DIR, f'recording_{timestamp}.mp4')
-        
-        # Ensure the recordings directory exists
-        os.makedirs(RECORDINGS_DIR, exist_ok=True)
-        
-        # Ensure the output file path is valid
-        if not output_file or not isinstance(output_file, str):
-            raise ValueError("Invalid output file path")
-
-        driver = setup_driver()
-        driver.get(url)
-
-        WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+        if data.get('async'):
+            return submit_task('recording', data)
 
-        set_state(True)
-        threading.Thread(target=record_screen, args=(duration,)).start()
+        try:
+            job = launch_recording(url, duration, mode, wait)
+        except RecordingLimitReached as e:
+            return jsonify({'error': str(e)}), 429
 
-        return jsonify({'success': True})
+        return jsonify({'success': True, 'job_id': job.job_id})
 
     except Exception as e:
-        print(f"Error in start_recording: {str(e)}")
-        # Clean up on error
-        if driver:
-            driver.quit()
-            driver = None
-        output_file = None
-        clear_state()
+        logger.exception(f"Error in start_recording: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
+def find_recording_job(job_id):
+    """Look up a job by ID, falling back to the latest job for older clients."""
+    if job_id:
+        return recording_jobs.get(job_id)
+    return recording_jobs.latest()
+
+
 @app.route('/stop-recording', methods=['POST'])
 def stop_recording():
-    """Stop screen recording (if running) and return the recorded file as base64."""
-    global driver, output_file, last_completed_file # Ensure access to globals
+    """Stop a recording job (if running) and return a download URL for its file.
 
-    file_to_return = None
-    filename_to_return = None
-    was_recording = is_recording() # Check state *before* potentially changing it
+    The file is inlined as base64 only when the client sends include_base64.
+    """
+    data = request.get_json(silent=True) or {}
+    job_id = data.get('job_id') or request.args.get('job_id')
+    job = find_recording_job(job_id)
 
-    try:
-        print("Stop/Fetch request received...")
-        if was_recording:
-            print("Recording is active, setting state to False.")
-            set_state(False)
-            # Give the recording thread a moment to react and finish file operations
-            time.sleep(2) # Adjust if needed
-        else:
-            print("Recording state is already False.")
+    if not job:
+        if job_id and (job_id in get_state() or recording_catalog.find_by_job(job_id)):
+            return stop_remote_recording(job_id, data)
+        if job_id:
+            return jsonify({'error': f'Unknown recording job: {job_id}'}), 404
+        return jsonify({'success': True, 'message': 'Recording stopped or was not active. No recording file found.'})
 
-        # Attempt to quit the driver if it exists (might have been quit by record_screen)
-        if driver:
-            print("Attempting to quit WebDriver instance...")
-            try:
-                driver.quit()
-                print("WebDriver quit successfully.")
-            except Exception as quit_err:
-                print(f"Minor error quitting driver (might already be closed): {quit_err}")
-            driver = None # Ensure driver reference is cleared
-
-        # --- Find the file to return ---
-        # Priority 1: Check the 'output_file' global (if record_screen hasn't cleared it)
-        if output_file and os.path.exists(output_file):
-            file_to_return = output_file
-            print(f"Found recording file via 'output_file' global: {file_to_return}")
-        # Priority 2: Check the 'last_completed_file' global (set by record_screen on success)
-        elif last_completed_file and os.path.exists(last_completed_file):
-            file_to_return = last_completed_file
-            print(f"Found recording file via 'last_completed_file' global: {file_to_return}")
+    try:
+        logger.info(f"Stop/Fetch request received for job {job.job_id}...", extra={'job_id': job.job_id})
+        if is_recording(job.job_id):
+            logger.debug("Recording is active, setting state to False.")
+            set_state(False, job.job_id)
         else:
-            print(f"No recording file found. Checked 'output_file' ('{output_file}') and 'last_completed_file' ('{last_completed_file}').")
-
-        # --- Process the found file (if any) ---
-        if file_to_return:
+            logger.debug("Recording state is already False.")
+
+        # The recorder wakes on the state change; wait for it to finish writing the file
+        if job.thread and job.thread.is_alive():
+            job.thread.join(RECORDING_STOP_TIMEOUT)
+
+        file_to_return = job.completed_file
+        if not file_to_return or not os.path.exists(file_to_return):
+            logger.info(f"No recording file found for job {job.job_id} (status: {job.status}).",
+                        extra={'job_id': job.job_id})
+            if not job.active:
+                recording_jobs.remove(job.job_id)
+                clear_state(job.job_id)
+            return jsonify({
+                'success': True,
+                'job_id': job.job_id,
+                'status': job.status,
+                'message': 'Recording stopped or was not active. No recording file found.'
+            })
+
+        filename_to_return = os.path.basename(file_to_return)
+        recording_id = os.path.splitext(filename_to_return)[0]
+        result = {
+            'success': True,
+            'job_id': job.job_id,
+            'recording_id': recording_id,
+            'filename': filename_to_return,
+            'url': url_for('download_recording', recording_id=recording_id, _external=True),
+            'size': os.path.getsize(file_to_return),
+        }
+
+        if wants_base64(data):
             try:
-                print(f"Reading file: {file_to_return}")
+                logger.debug(f"Reading file: {file_to_return}")
                 with open(file_to_return, 'rb') as video_file:
-                    video_base64 = base64.b64encode(video_file.read()).decode('utf-8')
-
-                filename_to_return = os.path.basename(file_to_return)
-                print(f"Successfully read and encoded file. Filename: {filename_to_return}")
-
-                # Clean up AFTER successful retrieval
-                temp_file_path = file_to_return # Store path before clearing globals
-                output_file = None
-                last_completed_file = None
-                # Optional: Delete the file from server storage after sending
-                # try:
-                #     os.remove(temp_file_path)
-                #     print(f"Deleted server file: {temp_file_path}")
-                # except OSError as e:
-                #     print(f"Error deleting server file {temp_file_path}: {e}")
-
-                return jsonify({
-                    'success': True,
-                    'base64': video_base64,
-                    'filename': filename_to_return
-                })
+                    result['base64'] = base64.b64encode(video_file.read()).decode('utf-8')
             except Exception as e:
-                print(f"Error reading or encoding recording file '{file_to_return}': {str(e)}")
-                # Clear potentially stale references on error
-                output_file = None
-                last_completed_file = None
+                logger.error(f"Error reading or encoding recording file '{file_to_return}': {str(e)}")
                 return jsonify({'error': f'Failed to read recording file: {str(e)}'}), 500
-        else:
-            # No file found, but the process might have stopped successfully or was already stopped.
-            # Ensure state is consistent
-            output_file = None
-            last_completed_file = None
-            clear_state() # Make sure state is definitely False
-            return jsonify({'success': True, 'message': 'Recording stopped or was not active. No recording file found.'})
+
+        # The job is done once its file has been handed over
+        recording_jobs.remove(job.job_id)
+        clear_state(job.job_id)
+
+        return jsonify(result)
 
     except Exception as e:
-        print(f"Unexpected error in stop_recording: {str(e)}")
-        # General cleanup on unexpected error
-        output_file = None
-        last_completed_file = None
-        if driver:
-             try: driver.quit()
-             except: pass
-             driver = None
-        clear_state()
+        logger.exception(f"Unexpected error in stop_recording: {str(e)}")
+        set_state(False, job.job_id)
         return jsonify({'error': str(e)}), 500
 
-def record_screen(duration):
-    """Record the screen for the given duration."""
-    global driver, output_file, last_completed_file # Access globals
-
-    temp_avi = None # Initialize temporary file path
+def stop_remote_recording(job_id, data):
+    """Stop a job owned by another worker process.
+
+    The shared state backend carries the stop signal to the owner, and the
+    owner's catalog entry tells us when the file is finished.
+    """
+    logger.info(f"Stopping job {job_id} owned by another worker", extra={'job_id': job_id})
+    set_state(False, job_id)
+    deadline = time.monotonic() + RECORDING_STOP_TIMEOUT
+    entry = recording_catalog.find_by_job(job_id)
+    while entry is None and time.monotonic() < deadline:
+        time.sleep(0.25)
+        entry = recording_catalog.find_by_job(job_id)
+
+    if entry is None:
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status': 'unknown',
+            'message': 'Recording stopped or was not active. No recording file found.'
+        })
+
+    clear_state(job_id)
+    path = recording_catalog.file_path(entry['filename'])
+    result = {
+        'success': True,
+        'job_id': job_id,
+        'recording_id': entry['id'],
+        'filename': entry['filename'],
+        'url': url_for('download_recording', recording_id=entry['id'], _external=True),
+        'size': entry['size'],
+    }
+    if wants_base64(data):
+        with open(path, 'rb') as video_file:
+            result['base64'] = base64.b64encode(video_file.read()).decode('utf-8')
+    return jsonify(result)
+
+
+def record_frames(job, out, frame_width, frame_height):
+    """Run the grab -> process -> ordered write pipeline for the job's capture mode."""
+    driver = job.driver
+    source = None
+
+    if job.mode == 'screencast':
+        source = ScreencastSource(driver, frame_width, frame_height)
+        source.start()
+        grab = source.poll
+        interval = SCREENCAST_POLL_INTERVAL
+
+        def process(jpeg):
+            # JPEG bytes go to ffmpeg untouched; it scales them to the output size
+            return jpeg
+    else:
+        interval = None  # one screenshot per output frame interval
+
+        def grab():
+            return [(time.monotonic(), driver.get_screenshot_as_png())]
+
+        def process(png):
+            frame = cv2.imdecode(np.frombuffer(png, np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                raise ValueError("Could not decode screenshot")
+            # Ensure frame matches the encoder's dimensions
+            if frame.shape[1] != frame_width or frame.shape[0] != frame_height:
+                frame = cv2.resize(frame, (frame_width, frame_height), interpolation=cv2.INTER_AREA)
+            return frame
+
+    pipeline = FramePipeline(
+        grab, process, out.write, RECORDING_FPS,
+        interval=interval,
+        workers=RECORDING_PROCESS_WORKERS,
+        queue_size=RECORDING_QUEUE_SIZE,
+        drop_policy=RECORDING_DROP_POLICY,
+        fill_policy=RECORDING_FILL_POLICY,
+        deduper=FrameDeduper(RECORDING_DEDUP_THRESHOLD) if RECORDING_DEDUP_THRESHOLD >= 0 else None,
+        progress=lambda stats: event_bus.publish(
+            job.job_id, 'progress', frames=stats['frames_written'], fps=stats['fps'], elapsed=stats['elapsed'],
+            deduped=stats['deduped']),
+        observe_stage=lambda stage, seconds: RECORDING_STAGE_SECONDS.observe(seconds, stage=stage),
+    )
+    job.pipeline = pipeline
+    try:
+        pipeline.run(job.duration, lambda timeout: wait_for_stop(job.job_id, timeout))
+    finally:
+        if source:
+            source.stop()
+        job.frame_count = pipeline.frames_written
+        job.fps = pipeline.captured_frames / pipeline.elapsed if pipeline.elapsed > 0 else 0.0
+        stats = pipeline.stats()
+        for kind in ('frames_written', 'dropped', 'duplicated', 'deduped'):
+            RECORDING_FRAMES.inc(stats[kind], kind=kind)
+        if pipeline.elapsed > 0:
+            RECORDING_FPS_ACHIEVED.observe(job.fps)
+
+
+def record_screen(job):
+    """Record the job's browser for its duration on the job's own thread."""
+    driver = job.driver
+    output_file = job.output_file
+    out = None
 
     try:
         if not driver:
@@ -266,151 +774,411 @@ def record_screen(duration):
         if not output_file or not isinstance(output_file, str):
             raise ValueError("Invalid output file path provided to record_screen.")
 
-        print(f"Record_screen thread started. Recording to {output_file} for {duration} seconds.")
-        temp_avi = output_file.replace('.mp4', '.avi')
-        # Ensure the directory exists for the temp file as well
-        os.makedirs(os.path.dirname(temp_avi), exist_ok=True)
+        logger.info(f"Record_screen thread started for job {job.job_id}. Recording to {output_file} for {job.duration} seconds.",
+                    extra={'job_id': job.job_id})
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
 
         # Use a standard size known to work with the driver setup
         frame_width, frame_height = 1366, 768
-        fourcc = cv2.VideoWriter_fourcc(*'XVID')
-        out = cv2.VideoWriter(temp_avi, fourcc, 20.0, (frame_width, frame_height))
-
-        if not out.isOpened():
-            raise ValueError(f"Failed to create video writer for {temp_avi}")
-
-        start_time = time.time()
-        frame_count = 0
+        # Frames are piped straight into ffmpeg, so the MP4 is finished as soon as capture stops.
+        # Screencast frames are already JPEG and go through without being decoded.
+        input_format = 'mjpeg' if job.mode == 'screencast' else 'rawvideo'
+        out = FFmpegWriter(output_file, frame_width, frame_height, RECORDING_FPS,
+                           input_format=input_format, pix_fmt='bgr24')
 
-        # Recording loop
-        while is_recording() and (time.time() - start_time) < duration:
-            try:
-                # Ensure driver is still valid before getting screenshot
-                if not driver or not driver.window_handles:
-                     print("Driver lost or closed unexpectedly during recording loop.")
-                     break # Exit loop if driver is gone
-
-                screenshot = driver.get_screenshot_as_png()
-                image = Image.open(io.BytesIO(screenshot))
-                # Ensure frame matches the VideoWriter's dimensions
-                frame = cv2.cvtColor(np.array(image.resize((frame_width, frame_height))), cv2.COLOR_RGB2BGR)
-                out.write(frame)
-                frame_count += 1
-                # Reduce sleep time slightly for smoother capture, adjust based on performance
-                time.sleep(0.04) # ~25fps target if possible, syncs better with 20fps video
-            except Exception as e:
-                # Handle screenshot/write errors (e.g., browser crash)
-                print(f"Error capturing/writing frame {frame_count}: {str(e)}")
-                # Decide if you want to break the loop on frame error
-                break # Break loop on error
+        record_frames(job, out, frame_width, frame_height)
 
-        print(f"Recording loop finished. Captured {frame_count} frames. Reason: {'Duration met' if not is_recording() else 'Stopped externally'}. State is now: {is_recording()}")
+        stopped_externally = not is_recording(job.job_id)
+        deduped = job.pipeline.stats()['deduped']
+        logger.info(f"Recording loop finished for job {job.job_id}. Captured {job.frame_count} frames ({job.fps:.1f} fps achieved, {deduped} unchanged frames skipped, mode: {job.mode}). Reason: {'Stopped externally' if stopped_externally else 'Duration met'}.",
+                    extra={'job_id': job.job_id, 'frames': job.frame_count, 'fps': round(job.fps, 2), 'deduped': deduped})
 
         # Ensure state is set to False if loop ended naturally by duration
-        if is_recording():
-             print("Setting recording state to False as duration ended.")
-             set_state(False)
-
-        out.release() # Release the AVI file writer
-        print(f"AVI file writer released ({temp_avi}).")
-
-        # --- Convert AVI to MP4 ---
-        if frame_count > 0 and os.path.exists(temp_avi): # Only convert if frames were captured
-             print(f"Converting {temp_avi} to {output_file} using ffmpeg...")
-             ffmpeg_cmd = [
-                 'ffmpeg', '-y', # Overwrite output without asking
-                 '-i', temp_avi,
-                 '-c:v', 'libx264', # Video codec
-                 '-preset', 'medium', # Encoding speed/quality tradeoff
-                 '-crf', '23', # Constant Rate Factor (quality, lower is better, 18-28 is common)
-                 '-c:a', 'aac', # Audio codec (even if silent, some players prefer an audio track)
-                 '-b:a', '128k', # Audio bitrate
-                 '-pix_fmt', 'yuv420p', # Pixel format for compatibility
-                 output_file
-             ]
-             try:
-                 # Use timeout for ffmpeg conversion
-                 result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True, timeout=60) # 60 second timeout
-                 print("FFmpeg stdout:", result.stdout)
-                 print("FFmpeg stderr:", result.stderr)
-                 result.check_returncode() # Raise error if ffmpeg failed
-
-                 if os.path.exists(output_file):
-                      print(f"Conversion successful: {output_file}")
-                      # *** Store the successful path ***
-                      last_completed_file = output_file
-                 else:
-                      print(f"Error: MP4 file {output_file} not found after conversion attempt.")
-                      last_completed_file = None # Ensure it's None if conversion failed
-
-             except subprocess.TimeoutExpired:
-                 print("Error: FFmpeg conversion timed out.")
-                 last_completed_file = None
-             except subprocess.CalledProcessError as e:
-                 print(f"Error: FFmpeg conversion failed with code {e.returncode}.")
-                 last_completed_file = None
-             except Exception as conv_e:
-                 print(f"Error during ffmpeg execution: {conv_e}")
-                 last_completed_file = None
-        else:
-             print("Skipping conversion: No frames captured or temporary AVI file missing.")
-             last_completed_file = None # No file was successfully created
+        if not stopped_externally:
+             logger.debug("Setting recording state to False as duration ended.")
+             set_state(False, job.job_id)
+
+        if job.frame_count == 0:
+            raise ValueError('No frames captured')
+
+        job.status = 'encoding'
+        event_bus.publish(job.job_id, 'encoding', frames=job.frame_count, fps=round(job.fps, 2), deduped=deduped)
+        encode_started = time.perf_counter()
+        out.close()
+        out = None
+        ffmpeg_seconds = time.perf_counter() - encode_started
+        RECORDING_STAGE_SECONDS.observe(ffmpeg_seconds, stage='ffmpeg_finalize')
+        logger.info(f"FFmpeg finalised {output_file} in {ffmpeg_seconds:.2f}s",
+                    extra={'job_id': job.job_id, 'ffmpeg_seconds': round(ffmpeg_seconds, 3)})
+
+        if not os.path.exists(output_file):
+             raise FileNotFoundError(f"MP4 file {output_file} not found after encoding.")
+
+        job.completed_file = output_file
+        try:
+            recording_catalog.add(os.path.basename(output_file), url=job.url, mode=job.mode, job_id=job.job_id,
+                                  duration=round(job.pipeline.elapsed, 2), frames=job.frame_count)
+        except Exception as e:
+            # The file is fine; the next boot's reconcile indexes it
+            logger.warning(f"Failed to add {output_file} to the recording catalog: {str(e)}")
+        recording_jobs.finish(job, 'completed')
+        RECORDINGS.inc(status='completed')
+        recording_id = os.path.splitext(os.path.basename(output_file))[0]
+        event_bus.publish(job.job_id, 'completed',
+                          recording_id=recording_id,
+                          filename=os.path.basename(output_file),
+                          frames=job.frame_count,
+                          fps=round(job.fps, 2),
+                          deduped=deduped,
+                          download_path=f'/recordings/{recording_id}')
 
     except Exception as e:
-        print(f"Error during record_screen execution: {str(e)}")
-        set_state(False) # Ensure state is false on any error
-        last_completed_file = None # Ensure no file path is stored on error
-        # Do not clear output_file here, let stop_recording handle it
+        logger.error(f"Error during record_screen execution: {str(e)}", extra={'job_id': job.job_id})
+        set_state(False, job.job_id) # Ensure state is false on any error
+        recording_jobs.finish(job, 'failed', str(e))
+        RECORDINGS.inc(status='failed')
+        event_bus.publish(job.job_id, 'failed', error=str(e))
 
     finally:
-        print("Record_screen thread entering finally block.")
-        # Clean up the temporary AVI file if it exists
-        if temp_avi and os.path.exists(temp_avi):
+        logger.debug("Record_screen thread entering finally block.")
+        # Kill ffmpeg and drop the partial MP4 if the recording did not complete
+        if out is not None:
+            out.abort()
+
+        # Each job owns its driver, so the thread that used it shuts it down
+        if driver:
             try:
-                os.remove(temp_avi)
-                print(f"Deleted temporary AVI file: {temp_avi}")
-            except OSError as e:
-                print(f"Error deleting temporary AVI file {temp_avi}: {e}")
-
-        # Quit the driver *within the thread* ONLY IF the main stop/fetch request hasn't already done so.
-        # This is tricky. A safer approach is to let /stop-recording always handle the final driver quit.
-        # So, comment out the driver quit here.
-        # if driver:
-        #     try:
-        #         driver.quit()
-        #         print("WebDriver quit successfully from record_screen finally block.")
-        #     except Exception as quit_err:
-        #         print(f"Minor error quitting driver in record_screen finally block: {quit_err}")
-        #     # DON'T set driver = None here, let stop_recording manage the global
-
-        # *** DO NOT set output_file = None here ***
-        print("Record_screen thread finished.")
+                driver.quit()
+                logger.debug("WebDriver quit successfully from record_screen finally block.")
+            except Exception as quit_err:
+                logger.debug(f"Minor error quitting driver in record_screen finally block: {quit_err}")
+        job.driver = None
+
+        logger.info(f"Record_screen thread finished for job {job.job_id}.", extra={'job_id': job.job_id})
+
+
+@app.route('/recordings/<recording_id>', methods=['GET'])
+def download_recording(recording_id):
+    """Stream a finished recording."""
+    return send_media(RECORDINGS_DIR, recording_id, '.mp4', 'video/mp4')
+
+
+def parse_pagination(args, default_limit=50, max_limit=500):
+    """``(limit, offset)`` from query args, with limit clamped to 1..max_limit and offset to >= 0."""
+    try:
+        limit = int(args.get('limit', default_limit))
+        offset = int(args.get('offset', 0))
+    except ValueError:
+        raise ValueError('limit and offset must be integers')
+    return max(1, min(limit, max_limit)), max(0, offset)
 
 
 @app.route('/recordings-info', methods=['GET'])
 def get_recordings_info():
-    """Retrieve information about recorded files."""
+    """List recordings from the catalog, newest first.
+
+    Supports ``?limit=&offset=`` pagination and ``?url=`` (substring), ``?mode=``,
+    ``?since=`` and ``?until=`` (epoch seconds) filters.
+    """
+    try:
+        limit, offset = parse_pagination(request.args)
+        since = request.args.get('since', type=float)
+        until = request.args.get('until', type=float)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     try:
-        recordings = [{'filename': f, 'path': os.path.abspath(os.path.join(RECORDINGS_DIR, f))}
-                      for f in os.listdir(RECORDINGS_DIR) if os.path.isfile(os.path.join(RECORDINGS_DIR, f))]
-        return jsonify({'recordings': recordings})
+        entries, total = recording_catalog.list(url=request.args.get('url'), mode=request.args.get('mode'),
+                                                since=since, until=until, limit=limit, offset=offset)
+        recordings = [dict(entry,
+                           path=os.path.abspath(recording_catalog.file_path(entry['filename'])),
+                           download_url=url_for('download_recording', recording_id=entry['id'], _external=True))
+                      for entry in entries]
+        return jsonify({
+            'recordings': recordings,
+            'total': total,
+            'limit': limit,
+            'offset': offset,
+            'retention': retention_service.stats(),
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/recording-status', methods=['GET'])
 def get_recording_status():
-    """Check if a recording is currently in progress."""
-    return jsonify({'isRecording': is_recording()})
-
-
-def cleanup_old_recordings():
-    current_time = time.time()
-    for filename in os.listdir(RECORDINGS_DIR):
-        filepath = os.path.join(RECORDINGS_DIR, filename)
-        if os.path.getmtime(filepath) < current_time - 86400:  # 24 மணி நேரத்திற்கு மேல்
-            os.remove(filepath)
+    """Check if a recording job (or any job, without job_id) is in progress."""
+    job_id = request.args.get('job_id')
+    if not job_id:
+        return jsonify({
+            'isRecording': is_recording(),
+            'active_jobs': recording_jobs.active_count(),
+            'max_concurrent': recording_jobs.max_concurrent,
+        })
+
+    job = recording_jobs.get(job_id)
+    if not job:
+        state = get_state().get(job_id)
+        # Owned by another worker process: report what the shared state and catalog know
+        entry = recording_catalog.find_by_job(job_id)
+        if state is None and entry is None:
+            return jsonify({'error': f'Unknown recording job: {job_id}'}), 404
+        recording = bool(state and state['is_recording'])
+        return jsonify({
+            'job_id': job_id,
+            'status': 'recording' if recording else ('completed' if entry else 'stopping'),
+            'isRecording': recording,
+            'recording_id': entry['id'] if entry else None,
+        })
+    status = job.to_dict()
+    status['isRecording'] = is_recording(job_id)
+    return jsonify(status)
+
+
+def run_capture_task(payload):
+    """Task handler for queued screenshots."""
+    url = is_valid_url(payload.get('url', ''))
+    if not url:
+        raise ValueError('Invalid URL format')
+    entry, cached = perform_capture(url, capture_options(payload), payload.get('cache_control'))
+    return {
+        'id': entry.meta['id'],
+        'size': len(entry.data),
+        'format': entry.meta.get('format', 'jpeg'),
+        'cached': cached,
+        'download_path': f"/screenshots/{entry.meta['id']}",
+    }
+
+
+def run_recording_task(payload):
+    """Task handler for queued recordings; runs the job to completion on the worker."""
+    url, duration, mode, wait = parse_recording_request(payload)
+    try:
+        job = launch_recording(url, duration, mode, wait)
+    except RecordingLimitReached as e:
+        raise TaskDeferred(str(e))
+
+    job.thread.join()
+    recording_jobs.remove(job.job_id)
+    clear_state(job.job_id)
+    if job.status != 'completed':
+        raise RuntimeError(job.error or 'Recording failed')
+
+    recording_id = os.path.splitext(os.path.basename(job.completed_file))[0]
+    return {
+        'recording_id': recording_id,
+        'filename': os.path.basename(job.completed_file),
+        'frames': job.frame_count,
+        'fps': round(job.fps, 2),
+        'download_path': f'/recordings/{recording_id}',
+    }
+
+
+def event_payload(event):
+    """Event as sent to clients, with an absolute download URL when it has one."""
+    data = dict(event['data'])
+    if 'download_path' in data:
+        data['download_url'] = request.host_url.rstrip('/') + data.pop('download_path')
+    return {'id': event['id'], 'event': event['event'], 'time': event['time'], 'data': data}
+
+
+@app.route('/recording-events/<job_id>', methods=['GET'])
+def stream_recording_events(job_id):
+    """Server-Sent Events stream of a recording's lifecycle.
+
+    Emits started, progress (frames/fps), encoding, then completed (with the
+    download URL) or failed, and closes after the final event. Reconnecting
+    clients resume from the Last-Event-ID header.
+    """
+    if not event_bus.exists(job_id) and not recording_jobs.get(job_id):
+        return jsonify({'error': f'Unknown recording job: {job_id}'}), 404
+    try:
+        after = int(request.args.get('after', 0))
+    except ValueError:
+        return jsonify({'error': 'after must be an integer'}), 400
+    try:
+        after = int(request.headers.get('Last-Event-ID') or after)
+    except ValueError:
+        pass  # a garbled Last-Event-ID just replays from ?after=
+
+    def generate():
+        last_id = after
+        yield 'retry: 2000\n\n'
+        while True:
+            events = event_bus.wait(job_id, after=last_id, timeout=SSE_HEARTBEAT_INTERVAL)
+            for event in events:
+                last_id = event['id']
+                payload = event_payload(event)
+                yield f"id: {payload['id']}\nevent: {payload['event']}\ndata: {json.dumps(payload['data'])}\n\n"
+                if event['event'] in TERMINAL_EVENTS:
+                    return
+            if event_bus.closed:
+                return  # worker shutting down; the client reconnects with Last-Event-ID
+            if not events:
+                yield ': keep-alive\n\n'  # stops proxies from closing an idle stream
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@app.route('/recording-events/<job_id>/poll', methods=['GET'])
+def poll_recording_events(job_id):
+    """Long-poll fallback for clients without EventSource.
+
+    Blocks until events newer than ?after= exist (or ?timeout= seconds pass)
+    and returns them with ``done`` set once the recording has finished.
+    """
+    if not event_bus.exists(job_id) and not recording_jobs.get(job_id):
+        return jsonify({'error': f'Unknown recording job: {job_id}'}), 404
+    try:
+        after = int(request.args.get('after', 0))
+        timeout = float(request.args.get('timeout', LONG_POLL_TIMEOUT))
+    except ValueError:
+        return jsonify({'error': 'after must be an integer and timeout a number'}), 400
+    if not math.isfinite(timeout):
+        return jsonify({'error': 'timeout must be a finite number'}), 400
+    timeout = min(max(timeout, 0.0), LONG_POLL_TIMEOUT)
+    events = [event_payload(event) for event in event_bus.wait(job_id, after=after, timeout=timeout)]
+    done = any(event['event'] in TERMINAL_EVENTS for event in events)
+    return jsonify({'events': events, 'done': done})
+
+
+task_scheduler = TaskScheduler(
+    TaskStore(TASK_DB_PATH),
+    {'capture': run_capture_task, 'recording': run_recording_task},
+    workers=TASK_WORKERS,
+    per_host_limit=TASK_PER_HOST_LIMIT,
+)
+
+
+def task_response(task):
+    """Task as returned to clients, with an absolute download URL once it has a result."""
+    result = task.get('result') or {}
+    if 'download_path' in result:
+        task['download_url'] = request.host_url.rstrip('/') + result['download_path']
+    task['status_url'] = url_for('get_task', task_id=task['id'], _external=True)
+    return task
+
+
+def submit_task(kind, data):
+    """Queue a capture or recording and answer 202 with the task's status URL."""
+    payload = {k: v for k, v in data.items() if k not in ('async', 'type', 'priority', 'webhook')}
+    if isinstance(payload.get('url'), str):
+        # Store the normalized URL so the task's host (and its per-host limit) is known
+        payload['url'] = is_valid_url(payload['url'])
+    try:
+        task_id = task_scheduler.submit(kind, payload, priority=int(data.get('priority', 0)),
+                                        webhook=data.get('webhook'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(task_response(task_scheduler.store.get(task_id))), 202
+
+
+@app.route('/tasks', methods=['POST'])
+def create_task():
+    """Queue a capture or recording task: {"type": "capture"|"recording", "priority", "webhook", ...}."""
+    data = request.get_json(silent=True) or {}
+    kind = data.get('type')
+    try:
+        if kind == 'capture':
+            if not is_valid_url(data.get('url', '')):
+                raise ValueError('Invalid URL format')
+            capture_options(data)
+        elif kind == 'recording':
+            parse_recording_request(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if kind == 'capture':
+        data = dict(data, cache_control=request.headers.get('Cache-Control'))
+    return submit_task(kind, data)
+
+
+@app.route('/tasks', methods=['GET'])
+def list_tasks():
+    """List tasks, newest first, optionally filtered by ?status=."""
+    status = request.args.get('status')
+    if status and status not in TASK_STATUSES:
+        return jsonify({'error': f"Invalid status '{status}'"}), 400
+    try:
+        limit, offset = parse_pagination(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    tasks = task_scheduler.store.list(status=status, limit=limit, offset=offset)
+    return jsonify({'tasks': [task_response(task) for task in tasks], 'stats': task_scheduler.stats()})
+
+
+@app.route('/tasks/<task_id>', methods=['GET'])
+def get_task(task_id):
+    """Status and, once finished, result of a queued task."""
+    task = task_scheduler.store.get(task_id)
+    if not task:
+        return jsonify({'error': f'Unknown task: {task_id}'}), 404
+    return jsonify(task_response(task))
+
+
+def start_background_services():
+    """Warm the browser pool and start task workers and recording retention for this serving process."""
+    browser_pool.start()
+    task_scheduler.start()
+    retention_service.start()
+
+
+# Set by begin_shutdown(): when this process was asked to stop, and the recordings it was running
+_shutdown_started = None
+_active_at_shutdown = []
+
+
+def begin_shutdown():
+    """Tell in-flight recordings to stop and release event stream clients.
+
+    Called as soon as the process is asked to stop (gunicorn SIGTERM/SIGINT
+    hooks), so recordings use the whole shutdown budget to finalise instead
+    of waiting behind open SSE and long-poll requests. Safe to call again.
+    """
+    global _shutdown_started, _active_at_shutdown
+    if _shutdown_started is not None:
+        return
+    _shutdown_started = time.monotonic()
+    _active_at_shutdown = [job for job in recording_jobs.jobs() if job.active]
+    if _active_at_shutdown:
+        logger.info(f"Finalising {len(_active_at_shutdown)} in-flight recording(s) before exit")
+    # Recorders wake on the state change, stop grabbing and close ffmpeg normally
+    for job in _active_at_shutdown:
+        set_state(False, job.job_id)
+    event_bus.close()
+
+
+def shutdown_background_services(timeout=RECORDING_STOP_TIMEOUT):
+    """Stop taking new work and let in-flight recordings finalise their MP4s.
+
+    Called when a serving process exits (gunicorn worker_exit); everything
+    must be done within ``timeout`` seconds of begin_shutdown().
+    """
+    begin_shutdown()
+    deadline = _shutdown_started + timeout
+
+    task_scheduler.stop(timeout=max(0.0, deadline - time.monotonic()))
+    # Task workers may have started a recording after begin_shutdown()
+    active = _active_at_shutdown + [job for job in recording_jobs.jobs()
+                                    if job.active and job not in _active_at_shutdown]
+    for job in active:
+        set_state(False, job.job_id)
+    for job in active:
+        if job.thread:
+            job.thread.join(max(0.0, deadline - time.monotonic()))
+        if job.active:
+            logger.warning(f"Recording job {job.job_id} did not finish before shutdown", extra={'job_id': job.job_id})
+
+    retention_service.stop(timeout=1)
+    browser_pool.close()
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', debug=True, port=5001)
\ No newline at end of file
+    # Resolve chromedriver at boot so no request ever pays for it
+    get_driver_path()
+    # With debug=True the reloader parent never serves requests, so only start services in the child
+    if not DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_services()
+    app.run(host='0.0.0.0', debug=DEBUG, port=PORT)
@@ -0,0 +1,258 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import urllib.request
+import uuid
+from collections import Counter
+from urllib.parse import urlsplit
+
+from db_connection import LocalConnection
+
+logger = logging.getLogger(__name__)
+
+TASK_STATUSES = ('queued', 'running', 'completed', 'failed')
+
+
+class TaskDeferred(Exception):
+    """Raised by a handler that cannot run yet; the task is requeued after ``delay`` seconds."""
+
+    def __init__(self, message, delay=5):
+        super().__init__(message)
+        self.delay = delay
+
+
+def _worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _pid_alive(worker):
+    host, _, pid = (worker or '').rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class TaskStore:
+    """SQLite-backed task backlog shared by every worker process on the node."""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS tasks (
+        id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        priority INTEGER NOT NULL DEFAULT 0,
+        host TEXT,
+        status TEXT NOT NULL,
+        result TEXT,
+        error TEXT,
+        webhook TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        worker TEXT,
+        not_before REAL NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL,
+        started_at REAL,
+        finished_at REAL
+    );
+    CREATE INDEX IF NOT EXISTS tasks_queue ON tasks (status, priority DESC, created_at);
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._connect = LocalConnection(path)
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def add(self, kind, payload, priority=0, webhook=None, host=None):
+        task_id = uuid.uuid4().hex
+        self._connect().execute(
+            "INSERT INTO tasks (id, kind, payload, priority, host, status, webhook, created_at) "
+            "VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)",
+            (task_id, kind, json.dumps(payload), int(priority), host, webhook, time.time()))
+        return task_id
+
+    def get(self, task_id):
+        row = self._connect().execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, status=None, limit=50, offset=0):
+        query, params = "SELECT * FROM tasks", []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
+        params.extend([int(limit), int(offset)])
+        return [self._to_dict(row) for row in self._connect().execute(query, params)]
+
+    def counts(self):
+        rows = self._connect().execute("SELECT status, COUNT(*) AS n FROM tasks GROUP BY status")
+        return {row['status']: row['n'] for row in rows}
+
+    def claim(self, saturated_hosts=()):
+        """Atomically mark the highest-priority runnable task as running and return it."""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            placeholders = ','.join('?' * len(saturated_hosts))
+            host_filter = f" AND (host IS NULL OR host NOT IN ({placeholders}))" if saturated_hosts else ''
+            row = conn.execute(
+                "SELECT * FROM tasks WHERE status = 'queued' AND not_before <= ?" + host_filter +
+                " ORDER BY priority DESC, created_at LIMIT 1",
+                (time.time(), *saturated_hosts)).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            conn.execute(
+                "UPDATE tasks SET status = 'running', worker = ?, started_at = ?, attempts = attempts + 1 "
+                "WHERE id = ?", (_worker_id(), time.time(), row['id']))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return self.get(row['id'])
+
+    def finish(self, task_id, status, result=None, error=None):
+        self._connect().execute(
+            "UPDATE tasks SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+            (status, json.dumps(result) if result is not None else None, error, time.time(), task_id))
+
+    def requeue(self, task_id, delay=0):
+        self._connect().execute(
+            "UPDATE tasks SET status = 'queued', worker = NULL, not_before = ? WHERE id = ?",
+            (time.time() + delay, task_id))
+
+    def requeue_orphans(self):
+        """Put back tasks left running by a worker process that no longer exists."""
+        conn = self._connect()
+        orphans = [row['id'] for row in conn.execute("SELECT id, worker FROM tasks WHERE status = 'running'")
+                   if not _pid_alive(row['worker'])]
+        for task_id in orphans:
+            self.requeue(task_id)
+        return len(orphans)
+
+    @staticmethod
+    def _to_dict(row):
+        task = dict(row)
+        task['payload'] = json.loads(task['payload'])
+        task['result'] = json.loads(task['result']) if task['result'] else None
+        return task
+
+
+class TaskScheduler:
+    """Worker threads that pull tasks from a TaskStore by priority.
+
+    ``handlers`` maps a task kind to ``fn(payload) -> result``. At most
+    ``per_host_limit`` tasks for the same target host run at once in this
+    process, so one slow site cannot occupy every worker.
+    """
+
+    def __init__(self, store, handlers, workers=2, per_host_limit=2, poll_interval=1.0):
+        self.store = store
+        self.handlers = handlers
+        self.workers = max(1, int(workers))
+        self.per_host_limit = max(1, int(per_host_limit))
+        self.poll_interval = poll_interval
+
+        self._running_hosts = Counter()
+        self._cond = threading.Condition()
+        self._claim_lock = threading.Lock()
+        self._threads = []
+        self._stopping = False
+
+    def start(self):
+        recovered = self.store.requeue_orphans()
+        if recovered:
+            logger.info(f"Requeued {recovered} task(s) interrupted by a previous shutdown")
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"task-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+    def submit(self, kind, payload, priority=0, webhook=None):
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown task type '{kind}', expected one of {', '.join(self.handlers)}")
+        host = urlsplit(payload.get('url') or '').hostname
+        task_id = self.store.add(kind, payload, priority=priority, webhook=webhook, host=host)
+        with self._cond:
+            self._cond.notify()
+        return task_id
+
+    def stats(self):
+        with self._cond:
+            running_hosts = dict(self._running_hosts)
+        return {'workers': self.workers, 'per_host_limit': self.per_host_limit,
+                'running_hosts': running_hosts, 'tasks': self.store.counts()}
+
+    def _work(self):
+        while True:
+            # Claims are serialised so the per-host counts stay exact, but the
+            # SQLite transaction runs outside _cond so submit(), stats() and
+            # finishing workers never wait behind disk I/O.
+            with self._claim_lock:
+                with self._cond:
+                    if self._stopping:
+                        return
+                    saturated = [host for host, n in self._running_hosts.items()
+                                 if host is not None and n >= self.per_host_limit]
+                task = self.store.claim(saturated)
+                if task is not None:
+                    with self._cond:
+                        self._running_hosts[task['host']] += 1
+            if task is None:
+                with self._cond:
+                    if not self._stopping:
+                        self._cond.wait(self.poll_interval)
+                continue
+
+            try:
+                self._run(task)
+            finally:
+                with self._cond:
+                    self._running_hosts[task['host']] -= 1
+                    if self._running_hosts[task['host']] <= 0:
+                        del self._running_hosts[task['host']]
+                    self._cond.notify_all()
+
+    def _run(self, task):
+        try:
+            result = self.handlers[task['kind']](task['payload'])
+        except TaskDeferred as e:
+            logger.info(f"Task {task['id']} deferred for {e.delay}s: {str(e)}", extra={'task_id': task['id']})
+            self.store.requeue(task['id'], delay=e.delay)
+            return
+        except Exception as e:
+            logger.error(f"Task {task['id']} ({task['kind']}) failed: {str(e)}", extra={'task_id': task['id']})
+            self.store.finish(task['id'], 'failed', error=str(e))
+        else:
+            self.store.finish(task['id'], 'completed', result=result)
+
+        if task['webhook']:
+            threading.Thread(target=self._notify, args=(task['id'], task['webhook']), daemon=True).start()
+
+    def _notify(self, task_id, webhook, attempts=3):
+        """POST the finished task to its webhook, retrying with backoff."""
+        body = json.dumps(self.store.get(task_id)).encode('utf-8')
+        for attempt in range(attempts):
+            try:
+                req = urllib.request.Request(webhook, data=body, headers={'Content-Type': 'application/json'})
+                with urllib.request.urlopen(req, timeout=10):
+                    return
+            except Exception as e:
+                logger.warning(f"Webhook for task {task_id} failed (attempt {attempt + 1}/{attempts}): {str(e)}")
+                time.sleep(2 ** attempt)
@@ -0,0 +1,123 @@
+import threading
+
+import pytest
+
+from browser_pool import BrowserPool, PoolTimeout
+
+
+class FakeDriver:
+    """Records the calls the pool makes; ``fail_reset`` makes the reset raise"""
+
+    def __init__(self):
+        self.commands = []
+        self.quit_called = False
+        self.fail_reset = False
+        self.alive = True
+
+    def execute_cdp_cmd(self, cmd, params):
+        if self.fail_reset:
+            raise RuntimeError('devtools gone')
+        self.commands.append(cmd)
+
+    def execute_script(self, script):
+        pass
+
+    def get(self, url):
+        self.commands.append(f'get {url}')
+
+    @property
+    def window_handles(self):
+        if not self.alive:
+            raise RuntimeError('session deleted')
+        return ['main']
+
+    def quit(self):
+        self.quit_called = True
+
+
+def make_pool(**kwargs):
+    drivers = []
+
+    def factory():
+        driver = FakeDriver()
+        drivers.append(driver)
+        return driver
+
+    return BrowserPool(factory, **kwargs), drivers
+
+
+def test_session_reuses_driver_and_resets_it():
+    """A returned driver is reset and handed out again"""
+    hook_calls = []
+    pool, drivers = make_pool(size=1, reset_hooks=[hook_calls.append])
+
+    with pool.session() as first:
+        pass
+    with pool.session() as second:
+        pass
+
+    assert first is second
+    assert len(drivers) == 1
+    assert 'Network.clearBrowserCookies' in first.commands
+    assert 'get about:blank' in first.commands
+    assert hook_calls == [first, first]
+    assert pool.stats()['checkouts'] == 2
+
+
+def test_acquire_times_out_when_exhausted():
+    pool, _ = make_pool(size=1)
+    entry = pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire(timeout=0.05)
+    pool.release(entry)
+    assert pool.acquire(timeout=0.05).driver is entry.driver
+
+
+def test_waiter_gets_released_driver():
+    """A blocked acquire is served as soon as a driver comes back"""
+    pool, _ = make_pool(size=1)
+    entry = pool.acquire()
+    threading.Timer(0.05, pool.release, args=(entry,)).start()
+    assert pool.acquire(timeout=2).driver is entry.driver
+
+
+def test_driver_recycled_after_max_uses():
+    pool, drivers = make_pool(size=1, max_uses=2)
+    for _ in range(2):
+        with pool.session():
+            pass
+    assert drivers[0].quit_called
+    assert pool.stats()['recycled'] == 1
+    with pool.session() as driver:
+        assert driver is not drivers[0]
+
+
+def test_failed_reset_recycles_driver():
+    pool, drivers = make_pool(size=1)
+    with pool.session() as driver:
+        driver.fail_reset = True
+    assert driver.quit_called
+    assert pool.stats()['recycled'] == 1
+    with pool.session() as replacement:
+        assert replacement is not driver
+
+
+def test_crashed_driver_is_replaced():
+    """An error with a dead browser quits it instead of returning it to the pool"""
+    pool, drivers = make_pool(size=1)
+    with pytest.raises(RuntimeError):
+        with pool.session() as driver:
+            driver.alive = False
+            raise RuntimeError('chrome crashed')
+    assert driver.quit_called
+    assert pool.stats()['crashed'] == 1
+
+
+def test_close_quits_idle_drivers_and_refuses_checkouts():
+    pool, drivers = make_pool(size=2)
+    with pool.session():
+        pass
+    pool.close()
+    assert drivers[0].quit_called
+    with pytest.raises(PoolTimeout):
+        pool.acquire(timeout=0.05)
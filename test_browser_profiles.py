@@ -0,0 +1,98 @@
+import pytest
+
+import browser_profiles
+from browser_profiles import PROFILES, RESOURCE_PATTERNS, apply, parse_resource_options, reset
+
+
+class CdpDriver:
+    """Records execute_cdp_cmd calls and hands out script identifiers"""
+
+    def __init__(self):
+        self.commands = []
+
+    def execute_cdp_cmd(self, cmd, params):
+        self.commands.append((cmd, params))
+        if cmd == 'Page.addScriptToEvaluateOnNewDocument':
+            return {'identifier': str(len(self.commands))}
+        return {}
+
+
+def test_default_profile_blocks_nothing():
+    assert parse_resource_options({}) == {'profile': 'default', 'blocked_urls': [], 'disable_animations': False}
+
+
+def test_profile_presets():
+    fast = parse_resource_options({'profile': 'fast'})
+    assert fast['disable_animations'] is True
+    assert set(fast['blocked_urls']) == {pattern for kind in PROFILES['fast']['block']
+                                         for pattern in RESOURCE_PATTERNS[kind]}
+    assert '*.woff2' in fast['blocked_urls']
+    assert '*.png' not in fast['blocked_urls']
+    assert '*.png' in parse_resource_options({'profile': 'minimal'})['blocked_urls']
+
+
+def test_request_options_add_to_profile():
+    settings = parse_resource_options({'profile': 'no_ads', 'block': ['script'], 'disable_images': True,
+                                       'block_urls': ['*tracker.example*']})
+    assert '*doubleclick.net*' in settings['blocked_urls']
+    assert '*.js?*' in settings['blocked_urls']
+    assert '*.jpg' in settings['blocked_urls']
+    assert '*tracker.example*' in settings['blocked_urls']
+    assert settings['blocked_urls'] == sorted(settings['blocked_urls'])
+
+
+def test_disable_animations_overrides_profile():
+    assert parse_resource_options({'profile': 'fast', 'disable_animations': False})['disable_animations'] is False
+    assert parse_resource_options({'disable_animations': 1})['disable_animations'] is True
+
+
+@pytest.mark.parametrize('data', [
+    {'profile': 'turbo'},
+    {'block': 'image'},
+    {'block_urls': '*ads*'},
+    {'block': ['image', 'video']},
+])
+def test_rejects_bad_options(data):
+    with pytest.raises(ValueError):
+        parse_resource_options(data)
+
+
+def test_apply_without_settings_sends_nothing():
+    driver = CdpDriver()
+    apply(driver, parse_resource_options({}))
+    assert driver.commands == []
+
+
+def test_apply_blocks_urls_and_disables_animations():
+    driver = CdpDriver()
+    settings = parse_resource_options({'profile': 'fast'})
+    apply(driver, settings)
+
+    commands = dict(driver.commands)
+    assert 'Network.enable' in commands
+    assert commands['Network.setBlockedURLs'] == {'urls': settings['blocked_urls']}
+    assert commands['Emulation.setEmulatedMedia']['features'] == [{'name': 'prefers-reduced-motion',
+                                                                   'value': 'reduce'}]
+    assert 'animation: none' in commands['Page.addScriptToEvaluateOnNewDocument']['source']
+
+
+def test_reset_undoes_apply():
+    driver = CdpDriver()
+    settings = parse_resource_options({'profile': 'fast'})
+    apply(driver, settings)
+    apply(driver, settings)
+    identifiers = [str(i + 1) for i, (cmd, _) in enumerate(driver.commands)
+                   if cmd == 'Page.addScriptToEvaluateOnNewDocument']
+    driver.commands.clear()
+
+    reset(driver)
+    assert ('Network.setBlockedURLs', {'urls': []}) in driver.commands
+    assert ('Emulation.setEmulatedMedia', {'features': []}) in driver.commands
+    assert [params['identifier'] for cmd, params in driver.commands
+            if cmd == 'Page.removeScriptToEvaluateOnNewDocument'] == identifiers
+    assert driver not in browser_profiles._registered_scripts
+
+    # A second reset has no scripts left to remove
+    driver.commands.clear()
+    reset(driver)
+    assert all(cmd != 'Page.removeScriptToEvaluateOnNewDocument' for cmd, _ in driver.commands)
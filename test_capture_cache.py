@@ -0,0 +1,82 @@
+import os
+import time
+
+from capture_cache import ScreenshotCache, CacheEntry, make_key, normalize_url, parse_cache_control
+
+
+def entry(size=10, created_at=None):
+    return CacheEntry(b'x' * size, 'image/png', {'id': 'shot'}, created_at)
+
+
+def test_normalized_urls_share_a_key():
+    assert normalize_url('HTTPS://Example.com:443/a#frag') == 'https://example.com/a'
+    assert make_key('http://example.com', {'w': 1}) == make_key('HTTP://EXAMPLE.COM:80/', {'w': 1})
+    assert make_key('http://example.com', {'w': 1}) != make_key('http://example.com', {'w': 2})
+
+
+def test_parse_cache_control():
+    assert parse_cache_control(None) == (None, False, False)
+    assert parse_cache_control('max-age=30, no-store') == (30, False, True)
+    assert parse_cache_control('max-age=0') == (0, True, False)
+    assert parse_cache_control('no-cache') == (None, True, False)
+
+
+def test_ttl_expiry():
+    """Entries older than the TTL, or than a request's max-age, are misses"""
+    cache = ScreenshotCache(ttl=60)
+    cache.put('fresh', entry())
+    cache.put('stale', entry(created_at=time.time() - 120))
+    cache.put('aging', entry(created_at=time.time() - 30))
+
+    assert cache.get('fresh') is not None
+    assert cache.get('stale') is None
+    assert cache.get('aging') is not None
+    assert cache.get('aging', max_age=10) is None
+    assert cache.stats()['misses'] == 2
+
+
+def test_lru_eviction_by_count():
+    """The least recently used entry goes first"""
+    cache = ScreenshotCache(max_entries=2)
+    cache.put('a', entry())
+    cache.put('b', entry())
+    cache.get('a')  # a is now more recent than b
+    cache.put('c', entry())
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_lru_eviction_by_bytes():
+    cache = ScreenshotCache(max_bytes=25)
+    for key in 'abc':
+        cache.put(key, entry(size=10))
+    stats = cache.stats()
+    assert stats['entries'] == 2
+    assert stats['bytes'] == 20
+    assert cache.get('a') is None
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    """A new cache over the same directory serves earlier entries"""
+    ScreenshotCache(disk_dir=str(tmp_path)).put('k', entry())
+    cache = ScreenshotCache(disk_dir=str(tmp_path))
+    hit = cache.get('k')
+    assert hit is not None and hit.data == b'x' * 10
+    assert cache.stats()['hits_disk'] == 1
+
+
+def test_disk_sweep_enforces_size_and_ttl(tmp_path):
+    """The disk tier drops expired entries, then the oldest beyond its size cap"""
+    cache = ScreenshotCache(ttl=60, disk_dir=str(tmp_path), disk_max_bytes=0, sweep_interval=3600)
+    for key in ('old', 'a', 'b', 'c'):
+        cache.put(key, entry(size=1000))
+    expired = time.time() - 120
+    os.utime(tmp_path / 'old.json', (expired, expired))
+    for i, key in enumerate('abc'):
+        os.utime(tmp_path / f'{key}.json', (time.time() - 10 + i, time.time() - 10 + i))
+
+    cache.disk_max_bytes = 2500
+    assert cache.sweep_disk() == 2
+    assert sorted(os.listdir(tmp_path)) == ['b.bin', 'b.json', 'c.bin', 'c.json']
@@ -0,0 +1,171 @@
+import importlib
+import json
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+for module in ('flask', 'flask_cors', 'selenium', 'cv2', 'numpy'):
+    pytest.importorskip(module)
+
+import cv2
+import numpy as np
+
+from capture_cache import CacheEntry
+from metrics import Histogram
+from recording_jobs import RecordingJob
+from recording_state import set_state, clear_state
+
+
+@pytest.fixture(scope='module')
+def server(tmp_path_factory):
+    """Import server with its recordings/screenshots/databases in a scratch directory"""
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('server'))
+    try:
+        yield importlib.import_module('server')
+    finally:
+        os.chdir(cwd)
+
+
+def metric(text, sample):
+    """Value of one sample line in a Prometheus text exposition, or None"""
+    for line in text.splitlines():
+        name, _, value = line.rpartition(' ')
+        if name == sample:
+            return float(value)
+    return None
+
+
+class ScreenshotDriver:
+    """Stands in for a recording browser; every screenshot is a small black PNG"""
+
+    def __init__(self):
+        self.png = cv2.imencode('.png', np.zeros((45, 80, 3), np.uint8))[1].tobytes()
+
+    def get_screenshot_as_png(self):
+        return self.png
+
+
+def test_metrics_endpoint(server):
+    """/metrics renders every registered metric in the Prometheus text format"""
+    client = server.app.test_client()
+    client.get('/metrics')
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    for name, kind in (('http_request_duration_seconds', 'histogram'), ('captures_total', 'counter'),
+                       ('recording_fps', 'histogram'), ('browser_pool_sessions', 'gauge')):
+        assert f'# TYPE {name} {kind}' in text
+    assert metric(text, 'browser_pool_sessions{state="idle"}') == 0
+    assert metric(text, 'http_request_duration_seconds_count{method="GET",endpoint="/metrics",status="200"}') >= 1
+
+
+def test_recording_fps_setting_is_not_the_histogram(server):
+    """The achieved-fps histogram must not shadow the output frame rate"""
+    assert isinstance(server.RECORDING_FPS, float) and server.RECORDING_FPS > 0
+    assert isinstance(server.RECORDING_FPS_ACHIEVED, Histogram)
+
+
+def test_record_frames_runs_at_recording_fps(server):
+    """A screenshot recording writes resized frames at RECORDING_FPS and reports the achieved rate"""
+    job = RecordingJob('https://example.com', 0.5, 'unused.mp4')
+    job.driver = ScreenshotDriver()
+    set_state(True, job.job_id)
+    written = []
+    try:
+        server.record_frames(job, SimpleNamespace(write=written.append), 160, 90)
+    finally:
+        clear_state(job.job_id)
+
+    assert written and all(frame.shape == (90, 160, 3) for frame in written)
+    assert abs(len(written) - job.pipeline.elapsed * server.RECORDING_FPS) <= 2
+    assert job.frame_count == len(written)
+    assert job.fps > 0
+    text = server.app.test_client().get('/metrics').get_data(as_text=True)
+    assert metric(text, 'recording_fps_count') >= 1
+    assert metric(text, 'recording_frames_total{kind="frames_written"}') >= len(written)
+
+
+def test_task_host_comes_from_normalized_url(server):
+    """A URL without a scheme still counts against its host's concurrency limit"""
+    response = server.app.test_client().post('/tasks', json={'type': 'capture', 'url': 'example.com/page'})
+    assert response.status_code == 202
+    task = server.task_scheduler.store.get(response.get_json()['id'])
+    assert task['host'] == 'example.com'
+    assert task['payload']['url'] == 'https://example.com/page'
+
+
+def test_abandoned_batch_cancels_pending_captures(server, monkeypatch):
+    """Closing a batch stream early stops the captures that have not started"""
+    started = []
+
+    def slow_capture(url, options, cache_control):
+        started.append(url)
+        time.sleep(0.05)
+        return CacheEntry(b'jpeg', 'image/jpeg', {'id': 'shot', 'format': 'jpeg'}), False
+
+    monkeypatch.setattr(server, 'perform_capture', slow_capture)
+    urls = [f'https://example.com/{i}' for i in range(50)]
+    response = server.app.test_client().post('/capture/batch', json={'urls': urls}, buffered=False)
+    first = json.loads(next(response.response))
+    assert first['ok']
+    response.close()
+
+    server.batch_executor.submit(lambda: None).result(timeout=10)  # queued after every batch capture
+    assert len(started) < len(urls)
+
+
+@pytest.mark.parametrize('options', [{'wait_until': 5}, {'wait_timeout': None}, {'idle_ms': [100]}, {'wait_timeout': -1}])
+def test_bad_wait_options_are_client_errors(server, options):
+    response = server.app.test_client().post('/capture', json=dict(options, url='example.com'))
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('max_height', [None, 0, -10, 'tall'])
+def test_bad_max_height_is_a_client_error(server, max_height):
+    response = server.app.test_client().post('/capture', json={'url': 'example.com', 'full_page': True,
+                                                                'max_height': max_height})
+    assert response.status_code == 400
+
+
+@pytest.fixture
+def finished_job(server):
+    job_id = 'events-' + os.urandom(4).hex()
+    server.event_bus.publish(job_id, 'started', url='https://example.com')
+    server.event_bus.publish(job_id, 'progress', frames=10)
+    server.event_bus.publish(job_id, 'completed', frames=20)
+    return job_id
+
+
+def sse_ids(body):
+    return [int(line[len('id: '):]) for line in body.splitlines() if line.startswith('id: ')]
+
+
+@pytest.mark.parametrize('headers, query, expected', [
+    ({}, '', [1, 2, 3]),
+    ({'Last-Event-ID': '2'}, '', [3]),
+    ({}, '?after=1', [2, 3]),
+    ({'Last-Event-ID': 'garbled'}, '?after=1', [2, 3]),
+])
+def test_event_stream_replays_and_ends_on_terminal_event(server, finished_job, headers, query, expected):
+    response = server.app.test_client().get(f'/recording-events/{finished_job}{query}', headers=headers)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    body = response.get_data(as_text=True)
+    assert sse_ids(body) == expected
+    assert body.rstrip().endswith('data: {"frames": 20}')
+
+
+def test_event_poll(server, finished_job):
+    client = server.app.test_client()
+    result = client.get(f'/recording-events/{finished_job}/poll?after=1&timeout=0').get_json()
+    assert [event['id'] for event in result['events']] == [2, 3]
+    assert result['done']
+    for query in ('after=x', 'timeout=soon', 'timeout=nan'):
+        assert client.get(f'/recording-events/{finished_job}/poll?{query}').status_code == 400
+    assert client.get('/recording-events/no-such-job/poll').status_code == 404
+    assert client.get('/recording-events/no-such-job').status_code == 404
@@ -0,0 +1,94 @@
+import os
+import sys
+import types
+
+import pytest
+
+import driver_binary
+
+
+def make_driver(path, mtime=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write('#!/bin/sh\n')
+    os.chmod(path, 0o755)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch, tmp_path):
+    """Empty cache dir, no env override, no chromedriver on PATH and webdriver-manager unavailable"""
+    monkeypatch.setattr(driver_binary, '_resolved_path', None)
+    monkeypatch.setattr(driver_binary, 'CHROMEDRIVER_PATH', None)
+    monkeypatch.setattr(driver_binary, 'DRIVER_CACHE_DIR', str(tmp_path / 'drivers'))
+    monkeypatch.setenv('PATH', str(tmp_path / 'bin'))
+    monkeypatch.setitem(sys.modules, 'webdriver_manager.chrome', None)
+
+
+def fake_manager(monkeypatch, path, calls):
+    class ChromeDriverManager:
+        def __init__(self, **kwargs):
+            calls.append(kwargs)
+
+        def install(self):
+            return path
+
+    monkeypatch.setitem(sys.modules, 'webdriver_manager.chrome',
+                        types.SimpleNamespace(ChromeDriverManager=ChromeDriverManager))
+
+
+def test_explicit_path_wins(monkeypatch, tmp_path):
+    path = make_driver(str(tmp_path / 'custom' / 'chromedriver'))
+    monkeypatch.setattr(driver_binary, 'CHROMEDRIVER_PATH', path)
+    calls = []
+    fake_manager(monkeypatch, 'unused', calls)
+
+    assert driver_binary.get_driver_path() == path
+    assert calls == []
+
+
+def test_explicit_path_must_be_executable(monkeypatch, tmp_path):
+    monkeypatch.setattr(driver_binary, 'CHROMEDRIVER_PATH', str(tmp_path / 'missing'))
+    with pytest.raises(FileNotFoundError):
+        driver_binary.get_driver_path()
+
+
+def test_webdriver_manager_uses_cache_dir(monkeypatch):
+    calls = []
+    fake_manager(monkeypatch, '/opt/chromedriver', calls)
+
+    assert driver_binary.get_driver_path() == '/opt/chromedriver'
+    assert calls == [{'path': driver_binary.DRIVER_CACHE_DIR,
+                      'cache_valid_range': driver_binary.DRIVER_CACHE_VALID_DAYS}]
+    assert os.path.isdir(driver_binary.DRIVER_CACHE_DIR)
+
+
+def test_falls_back_to_newest_cached_driver():
+    cache = driver_binary.DRIVER_CACHE_DIR
+    make_driver(os.path.join(cache, '120.0', 'chromedriver'), mtime=1000)
+    newest = make_driver(os.path.join(cache, '121.0', 'linux64', 'chromedriver'), mtime=2000)
+    # Not executable, so never picked even though it is newer
+    with open(os.path.join(cache, 'chromedriver'), 'w'):
+        pass
+
+    assert driver_binary.get_driver_path() == newest
+
+
+def test_falls_back_to_path(tmp_path):
+    path = make_driver(str(tmp_path / 'bin' / 'chromedriver'))
+    assert driver_binary.get_driver_path() == path
+
+
+def test_nothing_available_raises():
+    with pytest.raises(FileNotFoundError, match='CHROMEDRIVER_PATH'):
+        driver_binary.get_driver_path()
+
+
+def test_resolved_once(monkeypatch):
+    calls = []
+    fake_manager(monkeypatch, '/opt/chromedriver', calls)
+
+    assert driver_binary.get_driver_path() == driver_binary.get_driver_path() == '/opt/chromedriver'
+    assert len(calls) == 1
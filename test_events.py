@@ -0,0 +1,71 @@
+import threading
+import time
+
+import pytest
+
+from events import EventBus, SQLiteEventBus
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def bus(request, tmp_path):
+    if request.param == 'memory':
+        return EventBus(history=3)
+    return SQLiteEventBus(str(tmp_path / 'events.db'), history=3, poll_interval=0.01)
+
+
+def test_ids_increase_per_channel(bus):
+    assert [bus.publish('a', 'progress', n=i)['id'] for i in range(3)] == [1, 2, 3]
+    assert bus.publish('b', 'started')['id'] == 1
+    assert bus.exists('a') and not bus.exists('c')
+
+
+def test_wait_returns_events_after_id(bus):
+    for i in range(3):
+        bus.publish('job', 'progress', frames=i)
+    events = bus.wait('job', after=1, timeout=0)
+    assert [(e['id'], e['event'], e['data']) for e in events] == [(2, 'progress', {'frames': 1}),
+                                                                  (3, 'progress', {'frames': 2})]
+
+
+def test_history_is_bounded(bus):
+    for i in range(5):
+        bus.publish('job', 'progress', frames=i)
+    assert [e['id'] for e in bus.wait('job', timeout=0)] == [3, 4, 5]
+
+
+def test_wait_blocks_until_publish(bus):
+    threading.Timer(0.05, bus.publish, args=('job', 'completed')).start()
+    started = time.monotonic()
+    events = bus.wait('job', timeout=5)
+    assert [e['event'] for e in events] == ['completed']
+    assert time.monotonic() - started < 2
+
+
+def test_wait_times_out_empty(bus):
+    assert bus.wait('job', timeout=0.05) == []
+
+
+def test_close_wakes_waiters(bus):
+    threading.Timer(0.05, bus.close).start()
+    started = time.monotonic()
+    assert bus.wait('job', timeout=5) == []
+    assert time.monotonic() - started < 2
+    assert bus.closed
+
+
+def test_sqlite_bus_is_shared_between_instances(tmp_path):
+    """A job's events reach waiters in another worker process"""
+    path = str(tmp_path / 'events.db')
+    owner, other = SQLiteEventBus(path, poll_interval=0.01), SQLiteEventBus(path, poll_interval=0.01)
+    threading.Timer(0.05, owner.publish, args=('job', 'started'), kwargs={'url': 'https://example.com'}).start()
+    events = other.wait('job', timeout=5)
+    assert [(e['event'], e['data']) for e in events] == [('started', {'url': 'https://example.com'})]
+    assert other.exists('job')
+
+
+def test_idle_channels_expire():
+    bus = EventBus(retention=0)
+    bus.publish('old', 'completed')
+    time.sleep(0.01)
+    bus.publish('new', 'started')
+    assert not bus.exists('old') and bus.exists('new')
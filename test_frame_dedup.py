@@ -0,0 +1,112 @@
+import itertools
+import time
+
+import cv2
+import numpy as np
+
+from frame_dedup import FrameDeduper
+from frame_pipeline import FramePipeline
+
+
+def solid(value, shape=(360, 640, 3)):
+    return np.full(shape, value, np.uint8)
+
+
+def encode(frame, ext='.jpg'):
+    return cv2.imencode(ext, frame)[1].tobytes()
+
+
+def never_stop(timeout):
+    time.sleep(timeout)
+    return False
+
+
+def test_digest_matches_identical_bytes_only():
+    assert FrameDeduper.digest(b'frame') == FrameDeduper.digest(b'frame')
+    assert FrameDeduper.digest(b'frame') != FrameDeduper.digest(b'frame!')
+    assert len(FrameDeduper.digest(b'frame')) == 16
+
+
+def test_signature_from_decoded_frame():
+    deduper = FrameDeduper(size=(32, 18))
+    signature = deduper.signature(b'', solid(200))
+    assert signature.shape == (18, 32)
+    assert signature.dtype == np.uint8
+
+
+def test_signature_from_jpeg_and_png_payloads():
+    deduper = FrameDeduper()
+    for ext in ('.jpg', '.png'):
+        signature = deduper.signature(encode(solid(120), ext))
+        assert signature.shape == (36, 64)
+        assert abs(int(signature.mean()) - 120) <= 2
+
+
+def test_undecodable_payload_has_no_signature():
+    assert FrameDeduper().signature(b'not an image') is None
+
+
+def test_unchanged_within_threshold():
+    deduper = FrameDeduper(threshold=1.0)
+    reference = deduper.signature(b'', solid(100))
+    assert deduper.unchanged(reference, deduper.signature(b'', solid(101)))
+    assert not deduper.unchanged(reference, deduper.signature(b'', solid(110)))
+
+
+def test_small_change_still_counts_as_unchanged():
+    """A change covering a sliver of the page averages out below the threshold"""
+    deduper = FrameDeduper(threshold=1.0)
+    frame = solid(255)
+    changed = frame.copy()
+    changed[:4, :4] = 0
+    assert deduper.unchanged(deduper.signature(b'', frame), deduper.signature(b'', changed))
+
+
+def test_missing_signature_is_never_unchanged():
+    deduper = FrameDeduper()
+    signature = deduper.signature(b'', solid(0))
+    assert not deduper.unchanged(None, signature)
+    assert not deduper.unchanged(signature, None)
+    assert not deduper.unchanged(None, None)
+
+
+def test_pipeline_skips_identical_captures():
+    """Byte-identical captures are dropped before processing"""
+    payload = encode(solid(50))
+    processed = []
+
+    def process(data):
+        processed.append(data)
+        return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+    pipeline = FramePipeline(lambda: [(time.monotonic(), payload)], process, lambda frame: None, fps=50,
+                             fill_policy='none', deduper=FrameDeduper())
+    pipeline.run(0.3, never_stop)
+
+    stats = pipeline.stats()
+    assert len(processed) == pipeline.unique_frames == 1
+    assert stats['deduped_exact'] > 0
+    assert stats['deduped'] == stats['deduped_exact'] + stats['deduped_similar']
+
+
+def test_pipeline_skips_visually_unchanged_frames():
+    """Captures that differ in bytes but not in picture are dropped by the writer"""
+    counter = itertools.count()
+
+    def grab():
+        frame = solid(80)
+        frame[0, 0] = next(counter) % 256  # new bytes every capture, same picture
+        return [(time.monotonic(), encode(frame, '.png'))]
+
+    def process(data):
+        return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+    written = []
+    pipeline = FramePipeline(grab, process, written.append, fps=50, drop_policy='block',
+                             fill_policy='none', deduper=FrameDeduper())
+    pipeline.run(0.3, never_stop)
+
+    assert len(written) == pipeline.unique_frames == 1
+    assert pipeline.deduped_exact == 0
+    assert pipeline.deduped_similar > 0
+    assert pipeline.captured_frames == 1 + pipeline.deduped_similar
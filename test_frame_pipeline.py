@@ -0,0 +1,119 @@
+import itertools
+import random
+import threading
+import time
+
+import pytest
+
+from frame_pipeline import FramePipeline
+
+
+def counting_grab():
+    """grab() returning one (timestamp, sequence number) frame per call"""
+    counter = itertools.count()
+    return lambda: [(time.monotonic(), next(counter))]
+
+
+def never_stop(timeout):
+    time.sleep(timeout)
+    return False
+
+
+def test_frames_written_in_capture_order():
+    """Out-of-order processing still writes frames in capture order"""
+    written = []
+
+    def process(n):
+        time.sleep(random.uniform(0, 0.005))
+        return n
+
+    pipeline = FramePipeline(counting_grab(), process, written.append, fps=200, workers=4,
+                             drop_policy='block', fill_policy='none')
+    pipeline.run(0.3, never_stop)
+
+    assert written == list(range(len(written)))
+    assert pipeline.dropped == 0
+    assert pipeline.frames_written == len(written) > 10
+
+
+def test_drop_oldest_when_workers_fall_behind():
+    """A slow process stage drops pending frames instead of stalling capture"""
+    written = []
+    grab = counting_grab()
+    grabbed = []
+
+    def process(n):
+        time.sleep(0.02)
+        return n
+
+    def counted_grab():
+        frames = grab()
+        grabbed.extend(frames)
+        return frames
+
+    pipeline = FramePipeline(counted_grab, process, written.append, fps=500, workers=1, queue_size=1,
+                             drop_policy='drop_oldest', fill_policy='none')
+    pipeline.run(0.3, never_stop)
+
+    assert pipeline.dropped > 0
+    assert written == sorted(written)
+    assert pipeline.frames_written + pipeline.dropped == len(grabbed)
+
+
+def test_duplicate_fill_holds_constant_frame_rate():
+    """Gaps in capture are filled by repeating the previous frame"""
+    written = []
+    grabbed = []
+
+    def grab():
+        # Only the first call yields a frame; the page then "stops changing"
+        if grabbed:
+            return []
+        grabbed.append(1)
+        return [(time.monotonic(), 'frame')]
+
+    pipeline = FramePipeline(grab, lambda frame: frame, written.append, fps=20, fill_policy='duplicate')
+    pipeline.run(0.5, never_stop)
+
+    assert pipeline.unique_frames == 1
+    assert pipeline.duplicated == len(written) - 1
+    assert abs(len(written) - pipeline.elapsed * 20) <= 1
+
+
+def test_stop_ends_capture_early():
+    """wait_stop returning True stops the run before its duration"""
+    stop = threading.Event()
+    threading.Timer(0.1, stop.set).start()
+    pipeline = FramePipeline(counting_grab(), lambda n: n, lambda frame: None, fps=50, fill_policy='none')
+
+    started = time.monotonic()
+    pipeline.run(10, stop.wait)
+    assert time.monotonic() - started < 2
+
+
+def test_write_error_is_raised():
+    """An encoder failure ends the run and surfaces to the caller"""
+    def write(frame):
+        raise IOError("ffmpeg went away")
+
+    pipeline = FramePipeline(counting_grab(), lambda n: n, write, fps=50, fill_policy='none')
+    with pytest.raises(IOError):
+        pipeline.run(5, never_stop)
+
+
+def test_failed_frames_are_dropped_not_fatal():
+    """A frame that fails processing is dropped and capture continues"""
+    written = []
+
+    def process(n):
+        if n % 3 == 0:
+            raise ValueError("bad frame")
+        return n
+
+    pipeline = FramePipeline(counting_grab(), process, written.append, fps=100, drop_policy='block',
+                             fill_policy='none')
+    pipeline.run(0.2, never_stop)
+
+    assert written and all(n % 3 for n in written)
+    assert written == sorted(written)
+    assert pipeline.dropped > 0
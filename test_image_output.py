@@ -0,0 +1,80 @@
+import io
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+import image_output
+from image_output import encode, native_format, output_scale, parse_output_options
+
+
+def decode(data):
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+def test_defaults():
+    assert parse_output_options({}) == {'format': 'jpeg', 'quality': 80, 'scale': 1.0, 'width': None,
+                                        'device_scale_factor': 1.0}
+
+
+def test_png_ignores_quality_and_jpg_is_jpeg():
+    assert parse_output_options({'format': 'png', 'quality': 50})['quality'] is None
+    assert parse_output_options({'format': 'JPG', 'quality': '55'})['format'] == 'jpeg'
+    assert parse_output_options({'format': 'jpg', 'quality': '55'})['quality'] == 55
+
+
+@pytest.mark.parametrize('data', [
+    {'format': 'bmp'},
+    {'quality': 0},
+    {'quality': 'high'},
+    {'quality': [80]},
+    {'scale': 10},
+    {'width': 0},
+    {'scale': 0.5, 'width': 100},
+    {'device_scale_factor': 0.1},
+])
+def test_rejects_bad_options(data):
+    with pytest.raises(ValueError):
+        parse_output_options(data)
+
+
+def test_avif_only_offered_when_supported(monkeypatch):
+    monkeypatch.setattr(image_output, 'avif_supported', lambda: False)
+    with pytest.raises(ValueError):
+        parse_output_options({'format': 'avif'})
+    monkeypatch.setattr(image_output, 'avif_supported', lambda: True)
+    assert parse_output_options({'format': 'avif'})['format'] == 'avif'
+
+
+def test_avif_support_is_probed_once():
+    image_output.avif_supported()
+    image_output.avif_supported()
+    assert image_output.avif_supported.cache_info().hits >= 1
+
+
+def test_native_format_and_scale():
+    assert native_format(parse_output_options({'format': 'webp'})) == 'webp'
+    assert native_format({'format': 'avif'}) == 'png'
+    assert output_scale(parse_output_options({'width': 300}), 1200) == 0.25
+    assert output_scale(parse_output_options({'scale': 2}), 1200) == 2.0
+
+
+def test_chrome_bytes_pass_through():
+    output = parse_output_options({'format': 'png'})
+    assert encode(b'already encoded', output) == b'already encoded'
+
+
+@pytest.mark.parametrize('fmt, magic', [('png', b'\x89PNG'), ('jpeg', b'\xff\xd8'), ('webp', b'RIFF')])
+def test_arrays_are_resized_and_encoded(fmt, magic):
+    image = np.zeros((40, 80, 3), np.uint8)
+    data = encode(image, parse_output_options({'format': fmt, 'width': 20}))
+    assert data.startswith(magic)
+    assert decode(data).shape == (10, 20, 3)
+
+
+@pytest.mark.skipif(not image_output.avif_supported(), reason='Pillow has no AVIF codec here')
+def test_avif_encode_from_chrome_png():
+    png = cv2.imencode('.png', np.zeros((8, 8, 3), np.uint8))[1].tobytes()
+    data = encode(png, parse_output_options({'format': 'avif'}))
+    assert Image.open(io.BytesIO(data)).size == (8, 8)
@@ -0,0 +1,61 @@
+import pytest
+
+from metrics import Registry, Counter, Gauge, Histogram
+
+
+def test_counter_renders_per_label():
+    registry = Registry()
+    captures = Counter('captures_total', 'Captures', ['result'], registry=registry)
+    captures.inc(result='hit')
+    captures.inc(2, result='miss')
+
+    text = registry.render()
+    assert '# TYPE captures_total counter' in text
+    assert 'captures_total{result="hit"} 1' in text
+    assert 'captures_total{result="miss"} 2' in text
+
+
+def test_labels_must_match():
+    counter = Counter('c', 'c', ['result'], registry=None)
+    with pytest.raises(ValueError):
+        counter.inc(status='x')
+
+
+def test_gauge_callback_and_failing_callback():
+    registry = Registry()
+    Gauge('pool', 'Pool', ['state'], callback=lambda: {('idle',): 2, ('in_use',): 1}, registry=registry)
+    Gauge('broken', 'Broken', callback=lambda: 1 / 0, registry=registry)
+
+    text = registry.render()
+    assert 'pool{state="idle"} 2' in text
+    assert 'pool{state="in_use"} 1' in text
+    assert '# TYPE broken gauge' in text  # a failing source does not break the scrape
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = Histogram('latency', 'Latency', buckets=(0.1, 1), registry=registry)
+    for value in (0.05, 0.5, 5):
+        latency.observe(value)
+
+    text = registry.render()
+    assert 'latency_bucket{le="0.1"} 1' in text
+    assert 'latency_bucket{le="1"} 2' in text
+    assert 'latency_bucket{le="+Inf"} 3' in text
+    assert 'latency_count 3' in text
+    assert 'latency_sum 5.55' in text
+
+
+def test_histogram_time_observes_on_error():
+    latency = Histogram('t', 't', ['stage'], registry=None)
+    with pytest.raises(RuntimeError):
+        with latency.time(stage='load'):
+            raise RuntimeError
+    (count,) = [value for name, labels, value in latency.samples() if name == 't_count']
+    assert count == 1
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    Counter('c', 'c', ['url'], registry=registry).inc(url='a"b\nc')
+    assert 'c{url="a\\"b\\nc"} 1' in registry.render()
@@ -0,0 +1,101 @@
+import base64
+
+import cv2
+import numpy as np
+import pytest
+
+import page_capture
+from image_output import parse_output_options
+from page_capture import capture_region, fit_pixel_budget, parse_region_options
+
+
+class TileDriver:
+    """Returns a PNG of the requested clip at the device pixel ratio, like Chrome.
+
+    Each tile is filled with its y offset, so the stitching order shows.
+    """
+
+    def __init__(self, ratio=1.0):
+        self.ratio = ratio
+        self.clips = []
+
+    def execute_script(self, script):
+        return self.ratio
+
+    def execute_cdp_cmd(self, cmd, params):
+        clip = params['clip']
+        self.clips.append(clip)
+        scale = clip['scale'] * self.ratio
+        tile = np.full((int(round(clip['height'] * scale)), int(round(clip['width'] * scale)), 3),
+                       int(clip['y']) % 256, np.uint8)
+        return {'data': base64.b64encode(cv2.imencode('.png', tile)[1].tobytes()).decode('ascii')}
+
+
+@pytest.fixture
+def small_tiles(monkeypatch):
+    monkeypatch.setattr(page_capture, 'TILE_HEIGHT', 100)
+
+
+def test_fit_pixel_budget_cuts_the_bottom_first():
+    assert fit_pixel_budget(1000, 500, 1.0, 0) == (1000, 500)
+    assert fit_pixel_budget(1000, 500, 1.0, 1_000_000) == (1000, 500)
+    assert fit_pixel_budget(1000, 5000, 1.0, 2_000_000) == (1000, 2000)
+    # Device pixels count: at 2x the same budget covers a quarter of the CSS area
+    assert fit_pixel_budget(1000, 5000, 2.0, 8_000_000) == (1000, 2000)
+
+
+def test_fit_pixel_budget_narrows_very_wide_regions():
+    width, height = fit_pixel_budget(100_000, 5000, 1.0, 10_000_000)
+    assert height == page_capture.MIN_BUDGET_ROWS
+    assert width * height <= 10_000_000
+
+
+def test_short_region_is_one_encoded_capture():
+    driver = TileDriver()
+    image, truncated = capture_region(driver, {'x': 0, 'y': 0, 'width': 50, 'height': 80}, 1000,
+                                      parse_output_options({'format': 'png'}))
+    assert isinstance(image, bytes) and not truncated
+    assert len(driver.clips) == 1
+
+
+def test_tall_region_is_stitched_from_tiles(small_tiles):
+    driver = TileDriver(ratio=2.0)
+    image, truncated = capture_region(driver, {'x': 0, 'y': 0, 'width': 40, 'height': 250}, 1000,
+                                      parse_output_options({'format': 'png'}))
+    assert not truncated
+    assert [clip['y'] for clip in driver.clips] == [0, 100, 200]
+    assert image.shape == (500, 80, 3)
+    assert (image[:200] == 0).all() and (image[200:400] == 100).all() and (image[400:] == 200).all()
+
+
+def test_region_is_truncated_by_height_and_pixel_budget(small_tiles):
+    output = parse_output_options({'format': 'png'})
+    image, truncated = capture_region(TileDriver(), {'x': 0, 'y': 0, 'width': 40, 'height': 250}, 150, output)
+    assert truncated and image.shape == (150, 40, 3)
+
+    # Under MIN_BUDGET_ROWS the region is narrowed rather than shortened
+    image, truncated = capture_region(TileDriver(ratio=2.0), {'x': 0, 'y': 0, 'width': 40, 'height': 250}, 1000,
+                                      output, max_pixels=32_000)
+    assert truncated and image.shape == (500, 64, 3)
+
+
+def test_parse_region_options():
+    region = parse_region_options({'full_page': True, 'max_height': '500'}, 1000, 5_000_000)
+    assert region == {'full_page': True, 'selector': None, 'clip': None, 'max_height': 500, 'max_pixels': 5_000_000}
+    assert parse_region_options({}, 1000)['max_height'] == 1000
+
+
+@pytest.mark.parametrize('data', [
+    {'full_page': True, 'selector': '#main'},
+    {'clip': {'x': 0, 'y': 0, 'width': 10}},
+    {'clip': {'x': 0, 'y': 0, 'width': 0, 'height': 10}},
+    {'max_height': None},
+    {'max_height': 0},
+    {'max_height': -1},
+    {'max_height': 1001},
+    {'max_height': 2.5},
+    {'max_height': 'tall'},
+])
+def test_parse_region_options_rejects_bad_input(data):
+    with pytest.raises(ValueError):
+        parse_region_options(data, 1000)
@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+import readiness
+from readiness import parse_wait_options, wait_until_ready
+
+
+class PageDriver:
+    """Answers readiness probes from scripted readyState, DevTools log and layout-shift values"""
+
+    def __init__(self, ready_states=('complete',), logs=(), shift_ms=()):
+        self.ready_states = list(ready_states)
+        self.logs = [list(batch) for batch in logs]
+        self.shift_ms = list(shift_ms)
+
+    def execute_script(self, script):
+        if script == 'return document.readyState':
+            return self.ready_states.pop(0) if len(self.ready_states) > 1 else self.ready_states[0]
+        return self.shift_ms.pop(0) if len(self.shift_ms) > 1 else self.shift_ms[0]
+
+    def get_log(self, kind):
+        return self.logs.pop(0) if self.logs else []
+
+
+def network(method, request_id):
+    return {'message': json.dumps({'message': {'method': method, 'params': {'requestId': request_id}}})}
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(readiness, 'POLL_INTERVAL', 0.001)
+
+
+def test_parse_defaults():
+    assert parse_wait_options({}) == {'strategy': 'load', 'selector': None, 'timeout': 15.0, 'idle_ms': 500}
+    assert parse_wait_options({'wait_until': 'NetworkIdle', 'wait_timeout': '2.5', 'idle_ms': 100}) == {
+        'strategy': 'networkidle', 'selector': None, 'timeout': 2.5, 'idle_ms': 100}
+
+
+@pytest.mark.parametrize('data', [
+    {'wait_until': 'eventually'},
+    {'wait_until': 5},
+    {'wait_until': 'selector'},
+    {'wait_until': 'selector', 'wait_selector': ['#app']},
+    {'wait_timeout': None},
+    {'wait_timeout': [1]},
+    {'wait_timeout': -1},
+    {'wait_timeout': 'nan'},
+    {'idle_ms': 'soon'},
+    {'idle_ms': True},
+    {'idle_ms': -5},
+])
+def test_parse_rejects_bad_input(data):
+    with pytest.raises(ValueError):
+        parse_wait_options(data)
+
+
+def test_domcontentloaded_accepts_interactive():
+    driver = PageDriver(ready_states=('loading', 'interactive'))
+    assert wait_until_ready(driver, 'domcontentloaded', timeout=1)
+
+
+def test_load_times_out_on_a_page_that_never_completes():
+    assert not wait_until_ready(PageDriver(ready_states=('interactive',)), 'load', timeout=0.05)
+
+
+def test_networkidle_waits_for_requests_to_finish():
+    driver = PageDriver(logs=[
+        [network('Network.requestWillBeSent', 'a'), network('Network.requestWillBeSent', 'b')],
+        [network('Network.loadingFinished', 'a')],
+        [network('Network.loadingFailed', 'b')],
+    ])
+    assert wait_until_ready(driver, 'networkidle', timeout=1, idle_ms=10)
+    assert not driver.logs
+
+
+def test_networkidle_times_out_with_a_request_in_flight():
+    driver = PageDriver(logs=[[network('Network.requestWillBeSent', 'a')]])
+    assert not wait_until_ready(driver, 'networkidle', timeout=0.05, idle_ms=10)
+
+
+def test_layoutstable_waits_for_quiet_layout():
+    driver = PageDriver(shift_ms=(0, 20, 600))
+    assert wait_until_ready(driver, 'layoutstable', timeout=1, idle_ms=500)
+    assert not wait_until_ready(PageDriver(shift_ms=(0,)), 'layoutstable', timeout=0.05, idle_ms=500)
@@ -0,0 +1,153 @@
+import os
+import time
+
+import pytest
+
+from recording_catalog import RecordingCatalog, RetentionService, sweep_directory
+
+
+def write_file(path, size, mtime=None):
+    with open(path, 'wb') as f:
+        f.write(b'\0' * size)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    directory = tmp_path / 'recordings'
+    directory.mkdir()
+    return RecordingCatalog(str(tmp_path / 'recordings.db'), str(directory))
+
+
+def add(catalog, name, size, created_at, **fields):
+    write_file(catalog.file_path(name), size)
+    return catalog.add(name, created_at=created_at, **fields)
+
+
+def test_add_and_lookup(catalog):
+    entry = add(catalog, 'abc.mp4', 100, 1000.0, url='https://example.com', mode='cdp', job_id='job-1',
+                duration=5, frames=150)
+    assert entry['id'] == 'abc'
+    assert entry['size'] == 100
+    assert entry['created_at'] == 1000.0
+    assert catalog.get('abc') == entry
+    assert catalog.find_by_job('job-1') == entry
+    assert catalog.find_by_job('job-2') is None
+    assert catalog.file_path('abc.mp4') == os.path.join(catalog.directory, 'abc.mp4')
+
+
+def test_list_filters_and_pages_newest_first(catalog):
+    add(catalog, 'a.mp4', 10, 1000.0, url='https://example.com/a_b', mode='cdp')
+    add(catalog, 'b.mp4', 10, 2000.0, url='https://example.com/axb', mode='screenshot')
+    add(catalog, 'c.mp4', 10, 3000.0, url='https://other.org', mode='cdp')
+
+    entries, total = catalog.list()
+    assert total == 3
+    assert [entry['id'] for entry in entries] == ['c', 'b', 'a']
+
+    # "_" is a literal, not a LIKE wildcard
+    entries, total = catalog.list(url='a_b')
+    assert total == 1 and entries[0]['id'] == 'a'
+    assert catalog.list(mode='cdp')[1] == 2
+    assert [entry['id'] for entry in catalog.list(since=2000, until=3000)[0]] == ['b']
+
+    entries, total = catalog.list(limit=1, offset=1)
+    assert total == 3
+    assert [entry['id'] for entry in entries] == ['b']
+
+
+def test_totals_and_remove(catalog):
+    assert catalog.totals() == {'count': 0, 'bytes': 0, 'oldest': None}
+    add(catalog, 'a.mp4', 10, 1000.0)
+    add(catalog, 'b.mp4', 30, 2000.0)
+    assert catalog.totals() == {'count': 2, 'bytes': 40, 'oldest': 1000.0}
+
+    assert catalog.remove('a')
+    assert not os.path.exists(catalog.file_path('a.mp4'))
+    assert catalog.get('a') is None
+    assert not catalog.remove('a')
+
+
+def test_reconcile_indexes_new_files_and_drops_missing(catalog):
+    add(catalog, 'gone.mp4', 10, 1000.0)
+    add(catalog, 'kept.mp4', 10, 1000.0)
+    os.remove(catalog.file_path('gone.mp4'))
+    write_file(catalog.file_path('unindexed.mp4'), 25)
+    write_file(catalog.file_path('notes.txt'), 5)
+
+    assert catalog.reconcile() == (1, 1)
+    assert catalog.get('gone') is None
+    assert catalog.get('unindexed')['size'] == 25
+    assert catalog.get('notes') is None
+    assert catalog.reconcile() == (0, 0)
+
+
+def test_retention_deletes_expired_recordings(catalog):
+    now = time.time()
+    add(catalog, 'old.mp4', 10, now - 7200)
+    add(catalog, 'new.mp4', 10, now)
+    retention = RetentionService(catalog, max_age=3600)
+
+    assert retention.run_once() == 1
+    assert catalog.get('old') is None
+    assert catalog.get('new') is not None
+    stats = retention.stats()
+    assert stats['deleted'] == 1
+    assert stats['freed_bytes'] == 10
+    assert stats['last_run'] is not None
+
+
+def test_retention_size_quota_evicts_oldest_first(catalog):
+    now = time.time()
+    for i, name in enumerate(('a', 'b', 'c', 'd')):
+        add(catalog, f'{name}.mp4', 100, now + i)
+    retention = RetentionService(catalog, max_age=0, max_bytes=250)
+
+    assert retention.run_once() == 2
+    assert [entry['id'] for entry in catalog.list()[0]] == ['d', 'c']
+    assert catalog.totals()['bytes'] == 200
+    assert retention.run_once() == 0
+
+
+def test_retention_sweeps_extra_directories(catalog, tmp_path):
+    screenshots = tmp_path / 'screenshots'
+    screenshots.mkdir()
+    write_file(str(screenshots / 'old.png'), 50, time.time() - 7200)
+    write_file(str(screenshots / 'new.png'), 50)
+    retention = RetentionService(catalog, max_age=0, directories=[(str(screenshots), 3600, 0)])
+
+    assert retention.run_once() == 1
+    assert os.listdir(screenshots) == ['new.png']
+    assert retention.freed_bytes == 50
+
+
+def test_retention_start_reconciles_and_stop_joins(catalog):
+    write_file(catalog.file_path('unindexed.mp4'), 10)
+    retention = RetentionService(catalog, max_age=0, interval=60)
+    retention.start()
+    retention.stop(timeout=5)
+
+    assert not retention._thread.is_alive()
+    assert catalog.get('unindexed') is not None
+    assert retention.last_run is not None
+
+
+def test_sweep_directory_age_then_size(tmp_path):
+    now = time.time()
+    write_file(str(tmp_path / 'expired'), 10, now - 7200)
+    write_file(str(tmp_path / 'older'), 20, now - 60)
+    write_file(str(tmp_path / 'newer'), 30, now - 30)
+    write_file(str(tmp_path / 'newest'), 40, now)
+
+    assert sweep_directory(str(tmp_path), max_age=3600, max_bytes=80) == (2, 30)
+    assert sorted(os.listdir(tmp_path)) == ['newer', 'newest']
+
+
+def test_sweep_directory_without_limits_keeps_everything(tmp_path):
+    write_file(str(tmp_path / 'old'), 10, time.time() - 10 ** 6)
+    (tmp_path / 'subdir').mkdir()
+
+    assert sweep_directory(str(tmp_path)) == (0, 0)
+    assert sorted(os.listdir(tmp_path)) == ['old', 'subdir']
@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+
+from recording_jobs import RecordingJobManager
+from recording_state import MemoryStateBackend, FileStateBackend, create_backend
+
+
+@pytest.fixture(params=['memory', 'file'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryStateBackend()
+    return FileStateBackend(str(tmp_path / 'recording_state.json'))
+
+
+def test_unknown_job_is_idle(backend):
+    assert backend.get('nope') == {'is_recording': False, 'timestamp': 0}
+    assert backend.all() == {}
+
+
+def test_set_clear_and_all(backend):
+    backend.set('a', True)
+    backend.set('b', False)
+    assert backend.get('a')['is_recording'] is True
+    assert set(backend.all()) == {'a', 'b'}
+
+    backend.clear('a')
+    assert set(backend.all()) == {'b'}
+    backend.clear()
+    assert backend.all() == {}
+
+
+def test_wait_for_stop_wakes_on_stop(backend):
+    backend.set('job', True)
+    assert backend.wait_for_stop('job', 0.05) is False
+    threading.Timer(0.05, backend.set, args=('job', False)).start()
+    assert backend.wait_for_stop('job', 5) is True
+
+
+def test_file_backend_is_shared_between_instances(tmp_path):
+    """Two worker processes each open the same file"""
+    path = str(tmp_path / 'recording_state.json')
+    owner, other = FileStateBackend(path), FileStateBackend(path)
+    owner.set('job', True)
+    assert other.get('job')['is_recording'] is True
+    threading.Timer(0.05, other.set, args=('job', False)).start()
+    assert owner.wait_for_stop('job', 5) is True
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_backend('redis')
+
+
+def test_finished_and_pruned_jobs_leave_no_state(backend):
+    """State entries go with their jobs, so the store stays bounded"""
+    jobs = RecordingJobManager(max_concurrent=10, history=1, on_discard=backend.clear)
+    first = jobs.create('https://example.com', 5, lambda job_id: job_id + '.mp4')
+    backend.set(first.job_id, True)
+    jobs.finish(first, 'completed')
+    assert backend.all() == {}
+
+    # A late stop signal re-creates the entry; pruning the job drops it again
+    backend.set(first.job_id, False)
+    for _ in range(2):
+        jobs.finish(jobs.create('https://example.com', 5, lambda job_id: job_id + '.mp4'), 'failed')
+    assert jobs.get(first.job_id) is None
+    assert backend.all() == {}
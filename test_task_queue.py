@@ -0,0 +1,130 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from task_queue import TaskStore, TaskScheduler, TaskDeferred
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TaskStore(str(tmp_path / 'tasks.db'))
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_claim_by_priority_then_age(store):
+    """Higher priority first, oldest first within a priority"""
+    low = store.add('capture', {'n': 1})
+    high = store.add('capture', {'n': 2}, priority=5)
+    low_later = store.add('capture', {'n': 3})
+
+    assert [store.claim()['id'] for _ in range(3)] == [high, low, low_later]
+    assert store.claim() is None
+
+
+def test_claim_skips_saturated_hosts(store):
+    """Tasks for a host at its concurrency limit wait"""
+    busy = store.add('capture', {}, host='busy.example')
+    free = store.add('capture', {}, host='free.example')
+
+    assert store.claim(saturated_hosts=['busy.example'])['id'] == free
+    assert store.claim()['id'] == busy
+
+
+def test_requeue_orphans_after_worker_crash(store):
+    """A task left running by a dead worker process is queued again"""
+    task_id = store.add('capture', {'url': 'http://example.com'})
+    assert store.claim()['status'] == 'running'
+    # Simulate the claiming worker process having died
+    store._connect().execute("UPDATE tasks SET worker = ? WHERE id = ?",
+                             (f"{socket.gethostname()}:999999999", task_id))
+
+    assert store.requeue_orphans() == 1
+    assert store.get(task_id)['status'] == 'queued'
+    task = store.claim()
+    assert task['id'] == task_id
+    assert task['attempts'] == 2
+
+
+def test_running_task_of_live_worker_is_not_requeued(store):
+    """Our own in-flight tasks are left alone"""
+    store.add('capture', {})
+    store.claim()
+    assert store.requeue_orphans() == 0
+
+
+def test_scheduler_runs_and_records_results(store):
+    """Handlers run on worker threads; results and failures are stored"""
+    def handler(payload):
+        if payload.get('fail'):
+            raise RuntimeError('boom')
+        return {'echo': payload['n']}
+
+    scheduler = TaskScheduler(store, {'capture': handler}, workers=2, poll_interval=0.05)
+    scheduler.start()
+    try:
+        ok = scheduler.submit('capture', {'n': 7})
+        bad = scheduler.submit('capture', {'n': 8, 'fail': True})
+        assert wait_for(lambda: store.get(ok)['status'] == 'completed' and store.get(bad)['status'] == 'failed')
+    finally:
+        scheduler.stop(timeout=2)
+    assert store.get(ok)['result'] == {'echo': 7}
+    assert store.get(bad)['error'] == 'boom'
+
+
+def test_scheduler_requeues_deferred_tasks(store):
+    """TaskDeferred puts the task back and it runs again later"""
+    calls = []
+
+    def handler(payload):
+        calls.append(1)
+        if len(calls) == 1:
+            raise TaskDeferred('busy', delay=0)
+        return 'done'
+
+    scheduler = TaskScheduler(store, {'capture': handler}, workers=1, poll_interval=0.05)
+    scheduler.start()
+    try:
+        task_id = scheduler.submit('capture', {})
+        assert wait_for(lambda: store.get(task_id)['status'] == 'completed')
+    finally:
+        scheduler.stop(timeout=2)
+    assert len(calls) == 2
+    assert store.get(task_id)['attempts'] == 2
+
+
+def test_submit_rejects_unknown_kind(store):
+    scheduler = TaskScheduler(store, {'capture': lambda payload: None})
+    with pytest.raises(ValueError):
+        scheduler.submit('recording', {})
+
+
+def test_per_host_limit(store):
+    """No more than per_host_limit tasks for one host run at once"""
+    running, peak, lock = [0], [0], threading.Lock()
+
+    def handler(payload):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+
+    scheduler = TaskScheduler(store, {'capture': handler}, workers=4, per_host_limit=1, poll_interval=0.02)
+    scheduler.start()
+    try:
+        ids = [scheduler.submit('capture', {'url': 'http://same.example/'}) for _ in range(4)]
+        assert wait_for(lambda: all(store.get(i)['status'] == 'completed' for i in ids))
+    finally:
+        scheduler.stop(timeout=2)
+    assert peak[0] == 1
@@ -0,0 +1,104 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from video_encoder import FFmpegWriter, EncoderError
+
+# Stands in for ffmpeg: records its arguments and how many bytes arrived on stdin in the output file
+FAKE_FFMPEG = f"""#!{sys.executable}
+import json, os, sys
+if os.environ.get('FAKE_FFMPEG_EXIT'):
+    sys.stderr.write('Invalid data found when processing input\\n')
+    sys.exit(int(os.environ['FAKE_FFMPEG_EXIT']))
+received = len(sys.stdin.buffer.read())
+with open(sys.argv[-1], 'w') as f:
+    json.dump({{'args': sys.argv[1:], 'bytes': received}}, f)
+"""
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    script = bin_dir / 'ffmpeg'
+    script.write_text(FAKE_FFMPEG)
+    script.chmod(0o755)
+    monkeypatch.setenv('PATH', f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    return tmp_path
+
+
+def run_writer(output, frames, **kwargs):
+    writer = FFmpegWriter(str(output), 6, 4, 20, **kwargs)
+    for frame in frames:
+        writer.write(frame)
+    writer.close()
+    with open(output) as f:
+        return writer, json.load(f)
+
+
+def test_rawvideo_frames_are_piped(fake_ffmpeg):
+    frames = [np.full((4, 6, 3), i, np.uint8) for i in range(3)]
+    writer, result = run_writer(fake_ffmpeg / 'out.mp4', frames, pix_fmt='bgr24')
+
+    assert writer.frames_written == 3
+    assert result['bytes'] == 3 * 4 * 6 * 3
+    args = ' '.join(result['args'])
+    assert '-f rawvideo -pix_fmt bgr24 -s 6x4 -r 20' in args
+    assert '-vf' not in result['args'] and '-movflags' not in result['args']
+
+
+def test_mjpeg_vfr_fragmented_arguments(fake_ffmpeg):
+    writer, result = run_writer(fake_ffmpeg / 'out.mp4', [b'\xff\xd8jpeg\xff\xd9'] * 2,
+                                input_format='mjpeg', vfr=True, fragmented=True)
+
+    assert result['bytes'] == 2 * 8
+    args = result['args']
+    assert args[args.index('-f') + 1] == 'image2pipe'
+    assert args[args.index('-vf') + 1] == 'scale=6:4,mpdecimate'
+    assert args[args.index('-vsync') + 1] == 'vfr'
+    assert 'frag_keyframe' in args[args.index('-movflags') + 1]
+
+
+def test_unsupported_input_format(fake_ffmpeg):
+    with pytest.raises(ValueError):
+        FFmpegWriter(str(fake_ffmpeg / 'out.mp4'), 6, 4, 20, input_format='gif')
+
+
+def test_failed_encode_reports_stderr(fake_ffmpeg, monkeypatch):
+    monkeypatch.setenv('FAKE_FFMPEG_EXIT', '1')
+    writer = FFmpegWriter(str(fake_ffmpeg / 'out.mp4'), 6, 4, 20)
+    writer._process.wait()
+    writer._stderr_thread.join(timeout=5)
+    # The pipe is gone, so writing (or at the latest closing) fails with ffmpeg's message
+    with pytest.raises(EncoderError, match='Invalid data'):
+        for _ in range(100):
+            writer.write(np.zeros((400, 600, 3), np.uint8))
+        writer.close()
+
+
+def test_abort_removes_partial_output(fake_ffmpeg):
+    output = fake_ffmpeg / 'out.mp4'
+    writer = FFmpegWriter(str(output), 6, 4, 20)
+    output.write_bytes(b'partial')
+    writer.abort()
+    assert not output.exists()
+    assert writer._process.poll() is not None
+
+
+@pytest.mark.skipif(not (shutil.which('ffmpeg') and shutil.which('ffprobe')), reason='ffmpeg is not installed')
+def test_real_ffmpeg_writes_a_playable_mp4(tmp_path):
+    output = tmp_path / 'out.mp4'
+    writer = FFmpegWriter(str(output), 64, 48, 10, pix_fmt='bgr24')
+    for i in range(10):
+        writer.write(np.full((48, 64, 3), i * 20, np.uint8))
+    writer.close()
+    frames = subprocess.run(['ffprobe', '-v', 'error', '-count_frames', '-select_streams', 'v:0',
+                             '-show_entries', 'stream=nb_read_frames,width,height', '-of', 'json', str(output)],
+                            capture_output=True, text=True, check=True)
+    stream = json.loads(frames.stdout)['streams'][0]
+    assert (stream['width'], stream['height'], int(stream['nb_read_frames'])) == (64, 48, 10)
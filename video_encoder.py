@@ -0,0 +1,114 @@
+import collections
+import os
+import subprocess
+import threading
+
+# x264 speed/quality tradeoff; faster presets keep the encoder ahead of capture
+FFMPEG_PRESET = os.environ.get('FFMPEG_PRESET', 'veryfast')
+# Constant Rate Factor (quality, lower is better, 18-28 is common)
+FFMPEG_CRF = int(os.environ.get('FFMPEG_CRF', 23))
+# Write fragmented MP4 so a partially written file is still playable
+FFMPEG_FRAGMENTED = os.environ.get('FFMPEG_FRAGMENTED', '0') == '1'
+# Variable frame rate: ffmpeg drops repeated frames (mpdecimate) and keeps the timestamps of the rest
+FFMPEG_VFR = os.environ.get('FFMPEG_VFR', '0') == '1'
+# Seconds to wait for ffmpeg to flush once the last frame has been written
+FFMPEG_FINALIZE_TIMEOUT = float(os.environ.get('FFMPEG_FINALIZE_TIMEOUT', 30))
+
+
+class EncoderError(Exception):
+    """Raised when the ffmpeg process fails or cannot keep up."""
+
+
+class FFmpegWriter:
+    """Streams frames into a long-lived ffmpeg process that writes the MP4 directly.
+
+    ``input_format`` is ``'rawvideo'`` for NumPy frames (``pix_fmt`` describes
+    their channel order) or ``'mjpeg'`` for already-encoded JPEG bytes, which
+    ffmpeg scales to ``width`` x ``height``. With ``vfr`` the output keeps
+    only frames that differ from their predecessor, so static stretches of a
+    recording cost almost nothing to encode or store.
+    """
+
+    def __init__(self, output_file, width, height, fps, input_format='rawvideo', pix_fmt='rgb24',
+                 preset=FFMPEG_PRESET, crf=FFMPEG_CRF, fragmented=FFMPEG_FRAGMENTED, vfr=FFMPEG_VFR):
+        self.output_file = output_file
+        self.width = width
+        self.height = height
+        self.frames_written = 0
+        self._stderr = collections.deque(maxlen=50)
+
+        if input_format == 'rawvideo':
+            input_args = ['-f', 'rawvideo', '-pix_fmt', pix_fmt, '-s', f'{width}x{height}', '-r', str(fps)]
+            filters = []
+        elif input_format == 'mjpeg':
+            input_args = ['-f', 'image2pipe', '-c:v', 'mjpeg', '-framerate', str(fps)]
+            filters = [f'scale={width}:{height}']
+        else:
+            raise ValueError(f"Unsupported input format: {input_format}")
+        if vfr:
+            filters.append('mpdecimate')
+        filter_args = ['-vf', ','.join(filters)] if filters else []
+        if vfr:
+            filter_args += ['-vsync', 'vfr']
+
+        # No +faststart: relocating the index would be a second pass over the file
+        container_args = ['-movflags', 'frag_keyframe+empty_moov+default_base_moof'] if fragmented else []
+        self.command = [
+            'ffmpeg', '-y', '-loglevel', 'error',
+            *input_args, '-i', 'pipe:0',
+            *filter_args,
+            '-c:v', 'libx264',
+            '-preset', preset,
+            '-crf', str(crf),
+            '-pix_fmt', 'yuv420p', # Pixel format for compatibility
+            *container_args,
+            output_file,
+        ]
+        self._process = subprocess.Popen(self.command, stdin=subprocess.PIPE,
+                                         stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        # Drain stderr continuously so a chatty ffmpeg never blocks on a full pipe
+        self._stderr_thread = threading.Thread(target=self._drain_stderr, daemon=True)
+        self._stderr_thread.start()
+
+    def _drain_stderr(self):
+        for line in self._process.stderr:
+            self._stderr.append(line.decode('utf-8', 'replace').rstrip())
+
+    def stderr_tail(self):
+        return '\n'.join(self._stderr)
+
+    def write(self, frame):
+        """Write one frame: a NumPy array for rawvideo input or JPEG bytes for mjpeg."""
+        data = frame if isinstance(frame, (bytes, bytearray)) else frame.tobytes()
+        try:
+            self._process.stdin.write(data)
+        except (BrokenPipeError, ValueError) as e:
+            raise EncoderError(f"ffmpeg exited while encoding: {self.stderr_tail() or e}")
+        self.frames_written += 1
+
+    def close(self, timeout=FFMPEG_FINALIZE_TIMEOUT):
+        """Finish the stream and wait for ffmpeg to finalise the MP4."""
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        try:
+            returncode = self._process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+            raise EncoderError(f"ffmpeg did not finish within {timeout}s")
+        self._stderr_thread.join(timeout=1)
+        if returncode != 0:
+            raise EncoderError(f"ffmpeg failed with code {returncode}: {self.stderr_tail()}")
+
+    def abort(self):
+        """Kill ffmpeg and remove the partial output file."""
+        if self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+        if os.path.exists(self.output_file):
+            try:
+                os.remove(self.output_file)
+            except OSError:
+                pass
@@ -0,0 +1,13 @@
+"""Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+
+Importing this module loads server.py and with it OpenCV, NumPy and Selenium,
+and resolves chromedriver once. With preload_app this happens in the gunicorn
+master, so every worker forks warm. Background services (browser pool, task
+workers, retention) are started per worker in gunicorn.conf.py's post_fork.
+"""
+from driver_binary import get_driver_path
+from server import app
+
+get_driver_path()
+
+__all__ = ['app']